@@ -7,6 +7,7 @@ from flask_session import Session
 from routes.main_routes import main_bp
 from routes.game_routes import game_bp
 from routes.api_routes import api_bp
+from routes import session_state
 
 # [v_REFACTOR]
 # app.py 现在是项目的入口点
@@ -19,10 +20,18 @@ app.secret_key = os.urandom(24)
 
 # --- 服务器端会话配置 ---
 app.config["SESSION_TYPE"] = "filesystem"
-app.config["SESSION_FILE_DIR"] = tempfile.mkdtemp()
+# [v_STORE] 设置 SESSION_FILE_DIR 后 session 在重启后保留，并可由多个 worker 共享
+app.config["SESSION_FILE_DIR"] = os.environ.get("SESSION_FILE_DIR") or tempfile.mkdtemp()
 app.config["SESSION_PERMANENT"] = False
 Session(app)
 
+# --- [NEW] 对局状态存储 (LRU 热层 + 持久层，见 routes/session_state.py) ---
+# session 中只保存对局的日志键；多个 worker 共享状态时推荐 sqlite
+app.config["STATE_STORE_BACKEND"] = os.environ.get("STATE_STORE_BACKEND", "file")
+app.config["STATE_STORE_PATH"] = os.environ.get("STATE_STORE_PATH") or os.path.join(
+    app.config["SESSION_FILE_DIR"], "game_states.db" if app.config["STATE_STORE_BACKEND"] == "sqlite" else "game_states")
+session_state.init_app(app)
+
 # --- 注册蓝图 ---
 app.register_blueprint(main_bp)
 app.register_blueprint(game_bp)
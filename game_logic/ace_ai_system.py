@@ -1,15 +1,18 @@
-import random
-import copy
+import contextlib
+import contextvars
+import time
+
 from .game_logic import (
     _get_distance, _is_adjacent, get_ai_lock_status,
     _is_tile_locked_by_opponent, _get_orientation_to_target
 )
 from .ai_system import (
-    _evaluate_action_strength, _find_all_reachable_positions,
+    _evaluate_action_strength, _find_all_reachable_positions, _get_max_move_budget,
     _calculate_ai_attack_range, _find_best_move_position,
     _find_farthest_move_position, _get_action_cost
 )
 from .database import PROJECTILE_TEMPLATES
+from .zobrist import TranspositionTable, zobrist_key
 
 """
 【Ace AI 系统 2.5 - 机动大师版】
@@ -18,6 +21,32 @@ from .database import PROJECTILE_TEMPLATES
 1. _score_plan: 严格执行“平时机动，大招攻击”的姿态策略。
 """
 
+# [v_ZOBRIST] 进程内共享的置换表，键以 GameState.position_hash() 开头。
+# decide_ace_timing 预判时评估过的局面，run_ace_turn 重新规划时直接命中。
+ACE_TRANSPOSITION_TABLE = TranspositionTable()
+
+# [v_LATENCY] 每次规划 (生成 + 评分 + 搜索) 的耗时硬上限 (毫秒)。
+# 超时后不再生成新的动作链，直接在已生成的候选中择优。
+PLANNING_LATENCY_CAP_MS = 200
+
+# [v_REPRO] 可复现规划模式下本次对局专用的置换表 (None 表示未启用，见 deterministic_planning)
+_DETERMINISTIC_TABLE = contextvars.ContextVar('ace_deterministic_table', default=None)
+
+
+@contextlib.contextmanager
+def deterministic_planning(transposition_table=None):
+    """
+    [v_REPRO] 可复现规划模式 (无头模拟器 / 锦标赛使用)。
+    在该上下文中创建的规划器不受墙钟时间影响 (不设搜索预算和耗时上限，搜索只受 max_depth 限制)，
+    并使用本次对局独立的置换表 (默认新建)，不读取其他对局留在共享表中的结果。
+    这样同一种子的对局结果与机器负载、进程数和对局顺序无关。
+    """
+    token = _DETERMINISTIC_TABLE.set(transposition_table if transposition_table is not None else TranspositionTable())
+    try:
+        yield
+    finally:
+        _DETERMINISTIC_TABLE.reset(token)
+
 
 class CombatPlan:
     """
@@ -45,18 +74,95 @@ class CombatPlan:
 
         self.description = ""  # 调试日志描述
 
+    def copy(self):
+        """
+        [v_LATENCY] 扩展动作链用的浅拷贝: 动作序列是新列表，其中的动作 (只读的共享模板) 和目标
+        仍是原对象的引用。(之前的 deepcopy 会把作为目标的玩家机甲整台复制一遍，占了规划耗时的九成。)
+        """
+        clone = CombatPlan.__new__(CombatPlan)
+        clone.__dict__.update(self.__dict__)
+        clone.action_sequence = list(self.action_sequence)
+        return clone
+
+    def to_dict(self):
+        """
+        [v_PLAN_CACHE] 序列化为 session 安全的字典。
+        动作以 (槽位, 名称) 表示，目标实体以 ID 表示，反序列化时在当前 GameState 上重新解析。
+        """
+        sequence = []
+        for action, slot, target in self.action_sequence:
+            entry = {'slot': slot, 'action': action.name}
+            if isinstance(target, tuple):
+                entry['target_pos'] = target
+            elif target is not None:
+                entry['target_id'] = target.id
+            sequence.append(entry)
+        return {
+            'intent': self.intent,
+            'score': self.score,
+            'timing': self.timing,
+            'stance': self.stance,
+            'tp_action': self.tp_action,
+            'tp_cost': self.tp_cost,
+            'action_sequence': sequence,
+            'total_ap_cost': self.total_ap_cost,
+            'description': self.description,
+        }
+
+    @classmethod
+    def from_dict(cls, data, ace_mech, game_state):
+        """从字典重建方案。任一动作或目标已无法解析 (部件被毁、目标消失) 时返回 None。"""
+        plan = cls()
+        plan.intent = data.get('intent', plan.intent)
+        plan.score = data.get('score', plan.score)
+        plan.timing = data.get('timing', plan.timing)
+        plan.stance = data.get('stance', plan.stance)
+        tp_action = data.get('tp_action')
+        if tp_action and tp_action[0] == 'move':
+            tp_action = ('move', tuple(tp_action[1]), tp_action[2])
+        elif tp_action:
+            tp_action = tuple(tp_action)
+        plan.tp_action = tp_action
+        plan.tp_cost = data.get('tp_cost', 0)
+        plan.total_ap_cost = data.get('total_ap_cost', 0)
+        plan.description = data.get('description', '')
+
+        for entry in data.get('action_sequence', []):
+            action = ace_mech.get_action_by_name_and_slot(entry.get('action'), entry.get('slot'))
+            if action is None:
+                return None
+            if 'target_pos' in entry:
+                target = tuple(entry['target_pos'])
+            elif 'target_id' in entry:
+                target = game_state.get_entity_by_id(entry['target_id'])
+                if target is None or target.status == 'destroyed':
+                    return None
+            else:
+                target = None
+            plan.action_sequence.append((action, entry.get('slot'), target))
+        return plan
+
 
 class AceTacticalPlanner:
     """
     Ace 的大脑。负责生成和评估动作链 (Action Chains)。
     """
 
-    def __init__(self, ace_mech, game_state):
+    def __init__(self, ace_mech, game_state, transposition_table=None, max_latency_ms=PLANNING_LATENCY_CAP_MS):
         self.ace = ace_mech
         self.game_state = game_state
         self.player = game_state.get_player_mech()
         self.log = []
 
+        # [v_LATENCY] 规划耗时上限: 计时从创建规划器开始 (包含预计算)，None 表示不限
+        self.max_latency_ms = max_latency_ms
+        self._latency_deadline = time.perf_counter() + max_latency_ms / 1000 if max_latency_ms else None
+        self.truncated = False  # 是否因超时而没有生成全部候选
+
+        # [v_ZOBRIST] 置换表与规划开始时的局面哈希 (启发式规划不修改局面)
+        self.tt = transposition_table if transposition_table is not None else ACE_TRANSPOSITION_TABLE
+        self.position_hash = game_state.position_hash()
+
         # 预计算数据
         self.dist_to_player = _get_distance(self.ace.pos, self.player.pos) if self.player else 999
         self.reachable_tiles_tp = {}  # 仅 TP 可达
@@ -75,12 +181,44 @@ class AceTacticalPlanner:
 
         self._precompute_movement()
 
+        candidate_plans = self._generate_candidate_plans()
+        if self.truncated:
+            self.log.append(f"> [Ace规划] 超出 {self.max_latency_ms}ms 上限，仅在已生成的 {len(candidate_plans)} 个方案中择优。")
+
+        # 评分并择优
+        if not candidate_plans:
+            self.log.append("> [Ace规划] 未找到有效方案，生成待机方案。")
+            return self._create_idle_plan()
+
+        # 评分
+        for plan in candidate_plans:
+            self._score_plan(plan)
+
+        # 排序
+        # 优先分数高，其次 AP 消耗高 (优先做更多事的)，最后随机打破平局
+        # [v_RNG] 平局打破使用本局的 ai 子流，保证可复现
+        tie_break = self.game_state.rng.ai.random
+        best_plan = max(candidate_plans, key=lambda p: (p.score, p.total_ap_cost, tie_break()))
+
+        self.log.append(
+            f"> [Ace规划] 最优方案: [{best_plan.intent}] {best_plan.description} (分: {best_plan.score:.1f}, 耗: {best_plan.total_ap_cost}AP)")
+
+        return best_plan
+
+    def _generate_candidate_plans(self):
+        """
+        生成所有候选动作链 (需先调用 _precompute_movement)。
+        [v_LATENCY] 每个起手动作之前检查耗时上限；超时则停止生成 (self.truncated = True)。
+        生成顺序是固定的，因此超时前生成的候选总是完整结果的一个前缀，平局打破的随机数也按同一顺序抽取。
+        """
         candidate_plans = []
 
         # === 核心逻辑：生成动作链 ===
 
         # 1. 尝试以【武器/战术攻击】起手
         for action, slot in self.available_weapons:
+            if self._over_latency_cap():
+                return candidate_plans
             self._try_add_attack_chains(candidate_plans, action, slot, is_first_step=True)
 
         # 2. 尝试以【移动】起手 (仅当有 S/M AP 时)
@@ -90,25 +228,17 @@ class AceTacticalPlanner:
         if move_action_data:
             move_action, move_slot = move_action_data
             for move_pos in move_candidates:
+                if self._over_latency_cap():
+                    return candidate_plans
                 self._try_add_move_chains(candidate_plans, move_action, move_slot, move_pos)
 
-        # 3. 评分并择优
-        if not candidate_plans:
-            self.log.append("> [Ace规划] 未找到有效方案，生成待机方案。")
-            return self._create_idle_plan()
-
-        # 评分
-        for plan in candidate_plans:
-            self._score_plan(plan)
+        return candidate_plans
 
-        # 排序
-        # 优先分数高，其次 AP 消耗高 (优先做更多事的)，最后随机打破平局
-        best_plan = max(candidate_plans, key=lambda p: (p.score, p.total_ap_cost, random.random()))
-
-        self.log.append(
-            f"> [Ace规划] 最优方案: [{best_plan.intent}] {best_plan.description} (分: {best_plan.score:.1f}, 耗: {best_plan.total_ap_cost}AP)")
-
-        return best_plan
+    def _over_latency_cap(self):
+        """[v_LATENCY] 是否已超出规划耗时上限 (超出后保持 truncated 标记)。"""
+        if self._latency_deadline is not None and time.perf_counter() > self._latency_deadline:
+            self.truncated = True
+        return self.truncated
 
     # --- 链生成逻辑 ---
 
@@ -174,7 +304,7 @@ class AceTacticalPlanner:
                 next_ap, next_tp = _get_action_cost(next_action)
                 if next_ap == 1 and next_tp == 0:
                     if self._is_attack_valid(sim_pos, sim_ori, next_action, self.player.pos):
-                        chain_plan = copy.deepcopy(plan)
+                        chain_plan = plan.copy()
                         chain_plan.action_sequence.append((next_action, next_slot, self.player))
                         chain_plan.total_ap_cost += next_ap
                         chain_plan.description += f" -> {next_action.name}"
@@ -189,7 +319,7 @@ class AceTacticalPlanner:
                 if mv_ap == 1:
                     best_move_pos = self._find_best_tactical_move(sim_pos, move_act.range_val)
                     if best_move_pos:
-                        chain_plan = copy.deepcopy(plan)
+                        chain_plan = plan.copy()
                         chain_plan.action_sequence.append((move_act, move_sl, best_move_pos))
                         chain_plan.total_ap_cost += mv_ap
                         chain_plan.description += f" -> 移动"
@@ -232,7 +362,7 @@ class AceTacticalPlanner:
             next_ap, next_tp = _get_action_cost(next_action)
             if next_ap == 1 and self.initial_ap >= (ap_cost + next_ap):
                 if self._is_attack_valid(sim_pos, sim_ori, next_action, self.player.pos):
-                    chain_plan = copy.deepcopy(plan)
+                    chain_plan = plan.copy()
                     chain_plan.action_sequence.append((next_action, next_slot, self.player))
                     chain_plan.total_ap_cost += next_ap
                     chain_plan.description += f" -> {next_action.name}"
@@ -245,7 +375,12 @@ class AceTacticalPlanner:
     # --- 辅助计算 ---
 
     def _precompute_movement(self):
-        self.all_reachable_costs = _find_all_reachable_positions(self.game_state, self.ace, self.player)
+        # [v_BOARD_SIZE] 有界搜索: 4 为 _get_tactical_move_candidates 使用的移动距离
+        max_cost = max(4, _get_max_move_budget(self.ace))
+        # [v_ZOBRIST] 可达成本只取决于局面 (结果只读，可以在规划器之间共享)
+        self.all_reachable_costs = self.tt.lookup(
+            ('reach', self.position_hash, self.ace.id, max_cost),
+            lambda: _find_all_reachable_positions(self.game_state, self.ace, self.player, max_cost=max_cost))
         legs = self.ace.parts.get('legs')
         tp_range = 0
         if legs and legs.status != 'destroyed' and self.initial_tp > 0:
@@ -275,8 +410,8 @@ class AceTacticalPlanner:
         if dist == 0: return start_pos
         step_x = int(dx / dist * move_range) if dist > 0 else 0
         step_y = int(dy / dist * move_range) if dist > 0 else 0
-        target_x = max(1, min(10, start_pos[0] + step_x))
-        target_y = max(1, min(10, start_pos[1] + step_y))
+        target_x = max(1, min(self.game_state.board_width, start_pos[0] + step_x))
+        target_y = max(1, min(self.game_state.board_height, start_pos[1] + step_y))
         return (target_x, target_y)
 
     def _get_available_weapons(self):
@@ -374,12 +509,13 @@ class AceTacticalPlanner:
         if action.action_type == '战术':
             dist = _get_distance(pos, target_pos)
             return dist <= action.range_val
-        valid_targets = _calculate_ai_attack_range(
+        # [v_ZOBRIST] 不同动作链经常在同一位置/朝向检查同一武器 (如 TP 移动后攻击 vs 移动动作后攻击)
+        key = ('attack', self.position_hash, self.ace.id, pos, ori, action, target_pos)
+        return self.tt.lookup(key, lambda: len(_calculate_ai_attack_range(
             self.game_state, self.ace, action,
             pos, ori,
             target_pos, self.initial_tp
-        )
-        return len(valid_targets) > 0
+        )) > 0)
 
     def _create_idle_plan(self):
         p = CombatPlan()
@@ -387,6 +523,43 @@ class AceTacticalPlanner:
         return p
 
 
+def ace_plan_key(ace_mech, game_state):
+    """
+    [v_PLAN_CACHE] 缓存方案的局面键: position_hash() 去掉其他机甲的 AP / TP。
+    Ace 规划不读取对手剩余的时点，玩家在回合内只消耗 AP / TP 而没有改变局面时，预设方案依然有效。
+    """
+    h = game_state.position_hash()
+    for entity in game_state.entities.values():
+        if entity.entity_type == 'mech' and entity is not ace_mech:
+            h ^= zobrist_key('ap', entity.id, entity.player_ap) ^ zobrist_key('tp', entity.id, entity.player_tp)
+    return h
+
+
+def create_ace_planner(ace_mech, game_state, transposition_table=None):
+    """
+    [v_SEARCH] 按驾驶员的 planner 配置 (AI_PILOTS 中逐个驾驶员设置) 创建规划器。
+    未配置时使用启发式的 AceTacticalPlanner。
+    [v_ZOBRIST] transposition_table 为 None 时使用共享的 ACE_TRANSPOSITION_TABLE。
+    [v_LATENCY] 配置中的 max_latency_ms 覆盖默认的 PLANNING_LATENCY_CAP_MS。
+    [v_REPRO] 在 deterministic_planning() 中忽略时间预算和耗时上限，并使用对局专用的置换表。
+    """
+    config = (ace_mech.pilot.planner if ace_mech.pilot else None) or {}
+    max_latency_ms = config.get('max_latency_ms', PLANNING_LATENCY_CAP_MS)
+    budget_ms = config.get('budget_ms', 50)
+    deterministic_table = _DETERMINISTIC_TABLE.get()
+    if deterministic_table is not None:
+        max_latency_ms = budget_ms = None
+        if transposition_table is None:
+            transposition_table = deterministic_table
+    if config.get('mode') == 'expectiminimax':
+        # 延迟导入以避免循环依赖 (ace_search 继承自本模块的规划器)
+        from .ace_search import SearchTacticalPlanner
+        return SearchTacticalPlanner(ace_mech, game_state, budget_ms=budget_ms,
+                                     max_depth=config.get('max_depth', 3), transposition_table=transposition_table,
+                                     max_latency_ms=max_latency_ms)
+    return AceTacticalPlanner(ace_mech, game_state, transposition_table, max_latency_ms)
+
+
 def run_ace_turn(ace_mech, game_state):
     """
     执行器：获取最佳方案并将其转化为实际的游戏操作。
@@ -415,13 +588,19 @@ def run_ace_turn(ace_mech, game_state):
                     log.append(f"> [Ace技能: 乘胜追击] 侦测到敌方受损，AP+1 (当前: {ace_mech.player_ap})")
 
     # 2. 获取计划 (优先读取缓存)
-    # [关键] 检查是否有缓存的计划
-    if hasattr(ace_mech, 'cached_ace_plan') and ace_mech.cached_ace_plan:
-        best_plan = ace_mech.cached_ace_plan
-        ace_mech.cached_ace_plan = None  # 使用后清除
-        log.append(f"> [Ace系统] 执行拼刀阶段预设战术: {best_plan.description}")
-    else:
-        planner = AceTacticalPlanner(ace_mech, game_state)
+    # [v_PLAN_CACHE] 缓存的是 decide_ace_timing 序列化的方案，只有局面键一致 (局面未变) 时才复用
+    best_plan = None
+    cached = ace_mech.cached_ace_plan
+    ace_mech.cached_ace_plan = None  # 使用后清除
+    if cached:
+        if cached.get('position_hash') == ace_plan_key(ace_mech, game_state):
+            best_plan = CombatPlan.from_dict(cached, ace_mech, game_state)
+        if best_plan:
+            log.append(f"> [Ace系统] 执行拼刀阶段预设战术: {best_plan.description}")
+        else:
+            log.append("> [Ace系统] 局面已变化，预设战术作废，重新规划。")
+    if best_plan is None:
+        planner = create_ace_planner(ace_mech, game_state)
         best_plan = planner.generate_best_plan()
         log.extend(planner.log)
 
@@ -34,9 +34,11 @@ def get_timing_priority(timing_str):
 def decide_ace_timing(ai_mech, player_mech, game_state):
     """
     Ace AI 在玩家回合开始阶段 (Phase 1) 就要决定它的战术时机。
+    [v_PLAN_CACHE] 方案以序列化字典的形式缓存在 ai_mech.cached_ace_plan (随 session 保存)，
+    并记录模拟资源下的局面键；run_ace_turn 在局面未变时直接复用，不再重新规划。
     """
     # 延迟导入以避免循环依赖
-    from .ace_ai_system import AceTacticalPlanner
+    from .ace_ai_system import create_ace_planner, ace_plan_key
 
     if not player_mech or player_mech.status == 'destroyed':
         return '移动'
@@ -67,10 +69,13 @@ def decide_ace_timing(ai_mech, player_mech, game_state):
     ai_mech.player_tp = sim_tp
 
     best_plan = None
+    plan_key = None
     try:
         # 3. 运行规划器生成真实方案
-        planner = AceTacticalPlanner(ai_mech, game_state)
+        planner = create_ace_planner(ai_mech, game_state)
         best_plan = planner.generate_best_plan()
+        # 与 run_ace_turn 初始化资源后的局面对应 (AP / TP 同为模拟值)
+        plan_key = ace_plan_key(ai_mech, game_state)
     except Exception as e:
         print(f"[AceLogic Error] 规划器出错: {e}")
         # 回退安全值
@@ -84,7 +89,9 @@ def decide_ace_timing(ai_mech, player_mech, game_state):
 
     # 5. 缓存计划
     if best_plan:
-        ai_mech.cached_ace_plan = best_plan
+        cached = best_plan.to_dict()
+        cached['position_hash'] = plan_key
+        ai_mech.cached_ace_plan = cached
         # [Log] 可以在这里记录 AI 的心理活动
         # print(f"> [Ace预判] 生成计划: {best_plan.description} (时机: {best_plan.timing})")
         return best_plan.timing
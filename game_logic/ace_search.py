@@ -0,0 +1,265 @@
+"""
+[NEW] Ace 搜索规划器 (Expectiminimax)。
+
+在 AceTacticalPlanner 生成的候选动作链之上做有时间预算的前瞻搜索，
+用骰池的精确概率分布 (dice_probability) 代替手工权重:
+
+- 深度 1 (Ace 回合, 期望节点): 方案中每个攻击对玩家造成的净伤害期望
+- 深度 2 (玩家回合, 极小节点): 玩家在 Ace 行动后的位置上，调整移动 + 最佳攻击组合的期望反击伤害
+- 深度 3 (Ace 下回合, 极大节点): 玩家完成应对后，Ace 从新局面出发的最佳攻击组合期望伤害
+
+每一层的骰子结果都是机会节点，直接用精确分布求期望，不做采样。
+方案在实际的 GameState 上"走子/撤销" (临时修改实体位置、朝向、姿态)，
+因此射界、射程、锁定等规则与真实结算完全一致。
+
+迭代加深: 从深度 1 开始逐层完整评估所有方案，超出时间预算时中止当前层，
+采用上一层完整结果。[v_ZOBRIST] 玩家应对和攻击价值按局面哈希存入置换表:
+落在同一位置/朝向/姿态的不同方案 (以及更深一层的重复评估) 只计算一次。预算内能完成 max_depth 时，结果与机器速度无关 (可复现)；
+CPU 越快能搜得越深，强度随之提升。
+"""
+import time
+
+from .ace_ai_system import AceTacticalPlanner, PLANNING_LATENCY_CAP_MS
+from .ai_system import _get_action_cost, _calculate_ai_attack_range
+from .game_logic import _get_distance, _get_orientation_to_target
+from .data_models import Projectile
+from .dice_probability import expected_net_damage
+
+# 重击相对轻击的权重 (与 ai_system 的强度评估一致)
+HEAVY_HIT_WEIGHT = 1.5
+# 玩家反击与 Ace 下回合收益的权重
+RESPONSE_WEIGHT = 1.0
+FOLLOW_UP_WEIGHT = 1.0
+# 玩家应对时考虑的候选位置上限 (按与 Ace 的距离由近到远)
+MAX_RESPONSE_POSITIONS = 12
+# Ace 可以选择的姿态
+SEARCH_STANCES = ('agile', 'attack', 'defense')
+
+_ATTACK_TYPES = ('近战', '射击', '抛射')
+
+
+class _SearchTimeout(Exception):
+    """搜索超出时间预算。"""
+
+
+def _defense_pool(defender, action, defender_stance):
+    """(白, 蓝) 防御骰数: 以核心为受击部件估算 (与 CombatState 的受击骰规则一致)。"""
+    core = defender.parts.get('core')
+    if not core:
+        return 0, 0
+    white = core.structure if core.status == 'damaged' else core.armor
+    ap_value = action.effects.get('armor_piercing', 0) if action.effects else 0
+    if ap_value and core.status != 'damaged':
+        white = max(0, white - ap_value)
+    if action.action_type == '近战' and core.parry > 0 and defender_stance != 'downed':
+        white += core.parry
+    blue = defender.get_total_evasion() if defender_stance == 'agile' else 0
+    return white, blue
+
+
+def expected_action_damage(action, defender, attacker_stance, defender_stance):
+    """
+    一个攻击动作对 defender 的加权净伤害期望 (轻击 1.0, 重击 HEAVY_HIT_WEIGHT)。
+    抛射动作按其抛射物载荷 x 齐射数计算。
+    """
+    salvo = 1
+    dice_vector = action.dice_vector
+    convert = bool(action.effects and action.effects.get('convert_lightning_to_crit'))
+    if action.action_type == '抛射':
+        payloads = Projectile.get_template_actions(action.projectile_to_spawn) if action.projectile_to_spawn else None
+        if not payloads:
+            return 0.0
+        dice_vector = payloads[0].dice_vector
+        salvo = action.effects.get('salvo', 1) if action.effects else 1
+        convert = False
+    yellow, red = dice_vector[:2]
+    if yellow + red == 0:
+        return 0.0
+    white, blue = _defense_pool(defender, action, defender_stance)
+    ev_hits, ev_crits, _ = expected_net_damage(yellow, red, white, blue, attacker_stance, defender_stance, convert)
+    return (ev_hits + ev_crits * HEAVY_HIT_WEIGHT) * salvo
+
+
+class SearchTacticalPlanner(AceTacticalPlanner):
+    """
+    有时间预算的 Expectiminimax 规划器。
+    候选方案与 AceTacticalPlanner 相同；启发式评分 (_score_plan) 仅用于排序和平局打破。
+    """
+
+    def __init__(self, ace_mech, game_state, budget_ms=50, max_depth=3, transposition_table=None,
+                 max_latency_ms=PLANNING_LATENCY_CAP_MS):
+        super().__init__(ace_mech, game_state, transposition_table, max_latency_ms)
+        self.budget_ms = budget_ms
+        self.max_depth = max_depth
+        self.completed_depth = 0
+        self.nodes = 0
+        self._deadline = None
+
+    def generate_best_plan(self):
+        if not self.player or self.player.status == 'destroyed':
+            return self._create_idle_plan()
+
+        self._precompute_movement()
+        candidate_plans = self._generate_candidate_plans()
+        if self.truncated:
+            self.log.append(f"> [Ace规划] 超出 {self.max_latency_ms}ms 上限，仅在已生成的 {len(candidate_plans)} 个方案中择优。")
+        if not candidate_plans:
+            self.log.append("> [Ace规划] 未找到有效方案，生成待机方案。")
+            return self._create_idle_plan()
+
+        for plan in candidate_plans:
+            self._score_plan(plan)
+
+        # 深度 0: 启发式结果 (与 AceTacticalPlanner 一致)，作为预算耗尽时的兜底
+        tie_break = self.game_state.rng.ai.random
+        best_plan = max(candidate_plans, key=lambda p: (p.score, p.total_ap_cost, tie_break()))
+        best_stance = best_plan.stance
+
+        started = time.perf_counter()
+        self._deadline = started + self.budget_ms / 1000 if self.budget_ms else None
+        # [v_LATENCY] 搜索预算不能越过整个规划的耗时上限
+        if self._latency_deadline is not None:
+            self._deadline = min(self._deadline or self._latency_deadline, self._latency_deadline)
+        ordered = sorted(candidate_plans, key=lambda p: (-p.score, -p.total_ap_cost))
+
+        for depth in range(1, self.max_depth + 1):
+            try:
+                results = [self._evaluate_plan(plan, depth) for plan in ordered]
+            except _SearchTimeout:
+                break
+            # 主变例优先: 下一层按本层结果排序 (排序稳定，同分时保持启发式顺序)
+            ranked = sorted(zip(ordered, results), key=lambda item: -item[1][0])
+            ordered = [plan for plan, _ in ranked]
+            best_plan, (_, best_stance) = ranked[0]
+            self.completed_depth = depth
+
+        best_plan.stance = best_stance
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self.log.append(
+            f"> [Ace搜索] 深度 {self.completed_depth}/{self.max_depth}，{self.nodes} 节点，{elapsed_ms:.1f}ms")
+        self.log.append(
+            f"> [Ace规划] 最优方案: [{best_plan.intent}] {best_plan.description} (姿态: {best_plan.stance}, 耗: {best_plan.total_ap_cost}AP)")
+        return best_plan
+
+    # --- 搜索 ---
+
+    def _check_deadline(self):
+        self.nodes += 1
+        if self._deadline is not None and time.perf_counter() > self._deadline:
+            raise _SearchTimeout()
+
+    def _evaluate_plan(self, plan, depth):
+        """返回 (价值, 最佳姿态)。在每种姿态下走子评估，结束后撤销。"""
+        ace = self.ace
+        saved = (ace.pos, ace.orientation, ace.stance)
+        final_pos, final_ori = self._plan_final_placement(plan)
+        best = None
+        try:
+            ace.pos, ace.orientation = final_pos, final_ori
+            for stance in SEARCH_STANCES:
+                self._check_deadline()
+                ace.stance = stance
+                value = self._ace_turn_value(plan, stance) + self._player_response_value(depth)
+                if best is None or value > best[0]:
+                    best = (value, stance)
+        finally:
+            ace.pos, ace.orientation, ace.stance = saved
+        return best
+
+    def _plan_final_placement(self, plan):
+        """方案执行完毕后 Ace 的位置和朝向 (与 run_ace_turn 的执行逻辑一致)。"""
+        pos, ori = self.ace.pos, self.ace.orientation
+        if plan.tp_action and plan.tp_action[0] == 'move':
+            pos, ori = plan.tp_action[1], plan.tp_action[2]
+        for action, slot, target in plan.action_sequence:
+            if action.action_type == '移动' and isinstance(target, tuple):
+                pos = target
+                ori = _get_orientation_to_target(pos, self.player.pos)
+        return pos, ori
+
+    def _ace_turn_value(self, plan, stance):
+        """(机会节点) 本回合方案中所有攻击的期望伤害。"""
+        value = 0.0
+        for action, slot, target in plan.action_sequence:
+            if action.action_type in _ATTACK_TYPES:
+                value += expected_action_damage(action, self.player, stance, self.player.stance)
+        return value
+
+    def _player_response_value(self, depth):
+        """
+        (极小节点) 玩家在调整移动范围内选择对自己最有利的位置 (用掉 TP 后不能再用 L 动作):
+        承受 Ace 下回合的期望伤害 (深度 3) 减去玩家反击的期望伤害。
+        玩家按攻击姿态估计，Ace 按当前评估的姿态防御。
+        """
+        key = ('response', self.game_state.position_hash(), depth)
+        value = self.tt.get(key)
+        if value is None:
+            value = self._search_player_response(depth)
+            self.tt.put(key, value)
+        return value
+
+    def _search_player_response(self, depth):
+        player = self.player
+        saved = (player.pos, player.orientation)
+        candidates = [player.pos]
+        legs = player.parts.get('legs')
+        if depth >= 2 and legs and legs.status != 'destroyed' and legs.adjust_move > 0:
+            reachable = self.game_state.calculate_move_range(player, legs.adjust_move)
+            reachable.sort(key=lambda pos: (_get_distance(pos, self.ace.pos), pos))
+            candidates.extend(reachable[:MAX_RESPONSE_POSITIONS])
+
+        worst = None
+        try:
+            for pos in candidates:
+                self._check_deadline()
+                player.pos = pos
+                player.orientation = _get_orientation_to_target(pos, self.ace.pos)
+                player_tp = 1 if pos == saved[0] else 0
+                value = -RESPONSE_WEIGHT * self._best_attack_value(player, self.ace, player_tp, 'attack')
+                if depth >= 3:
+                    value += FOLLOW_UP_WEIGHT * self._best_attack_value(self.ace, player, 1, 'attack')
+                if worst is None or value < worst:
+                    worst = value
+        finally:
+            player.pos, player.orientation = saved
+        return worst or 0.0
+
+    def _best_attack_value(self, attacker, defender, current_tp, attacker_stance):
+        """
+        (极大节点) attacker 在当前位置 (朝向 defender) 用 2 AP 能打出的最大期望伤害:
+        一个 M/L 动作，或两个不同的 S 动作。
+        """
+        key = ('attack_value', self.game_state.position_hash(), attacker.id, current_tp, attacker_stance)
+        return self.tt.lookup(key, lambda: self._search_attack_value(attacker, defender, current_tp, attacker_stance))
+
+    def _search_attack_value(self, attacker, defender, current_tp, attacker_stance):
+        ori = _get_orientation_to_target(attacker.pos, defender.pos)
+        defender_stance = defender.stance
+        single = 0.0
+        s_values = []
+        for action, slot in self._attack_options(attacker):
+            ap_cost, tp_cost = _get_action_cost(action)
+            if ap_cost > 2 or tp_cost > current_tp:
+                continue
+            if not _calculate_ai_attack_range(self.game_state, attacker, action, attacker.pos, ori, defender.pos,
+                                              current_tp):
+                continue
+            value = expected_action_damage(action, defender, attacker_stance, defender_stance)
+            if ap_cost == 1:
+                s_values.append(value)
+            single = max(single, value)
+        s_values.sort(reverse=True)
+        return max(single, sum(s_values[:2]))
+
+    def _attack_options(self, mech):
+        """mech 所有可用 (部件完好、弹药充足) 的攻击动作。"""
+        options = []
+        for slot, part in mech.parts.items():
+            if part and part.status != 'destroyed':
+                for action in part.actions:
+                    if action.action_type not in _ATTACK_TYPES:
+                        continue
+                    if action.ammo > 0 and self.game_state.ammo_counts.get((mech.id, slot, action.name), 0) <= 0:
+                        continue
+                    options.append((action, slot))
+        return options
@@ -1,29 +1,76 @@
 import random
 import heapq
-import re
+import threading
+from collections import OrderedDict
 # [重构] 从 .game_logic 导入，现在包含 _get_orientation_to_target
 from .game_logic import (
-    is_in_forward_arc, get_ai_lock_status, _is_adjacent, _is_tile_locked_by_opponent,
+    is_in_forward_arc, get_ai_lock_status, _is_adjacent, get_lock_field,
     _get_distance, _get_orientation_to_target, # <--- 新导入
     # [修复] 移除 'check_interception'，因为它已移至 controller
     run_projectile_logic,
 )
-from .data_models import Mech
+from .data_models import Mech, Action, Projectile
 # [新增] 导入抛射物模板以评估抛射动作强度
-from .database import PROJECTILE_TEMPLATES
+from .database import (
+    PROJECTILE_TEMPLATES, GENERIC_ACTIONS,
+    PLAYER_CORES, PLAYER_LEGS, PLAYER_LEFT_ARMS, PLAYER_RIGHT_ARMS, PLAYER_BACKPACKS,
+    AI_ONLY_CORES, AI_ONLY_LEGS, AI_ONLY_LEFT_ARMS, AI_ONLY_RIGHT_ARMS, AI_ONLY_BACKPACKS
+)
+# [NEW] 精确期望值 (替代硬编码的 0.875 / 1.0625)
+from .dice_probability import expected_attack_value
 
 
 # --- AI 评估辅助函数 ---
 
-def _parse_dice_string_for_eval(dice_str):
-    """(辅助函数) 解析骰子字符串，返回黄红计数。"""
-    yellow, red = 0, 0
-    if not dice_str: return 0, 0
-    match_y = re.search(r'(\d+)\s*黄', dice_str)
-    match_r = re.search(r'(\d+)\s*红', dice_str)
-    if match_y: yellow = int(match_y.group(1))
-    if match_r: red = int(match_r.group(1))
-    return yellow, red
+# [v_STRENGTH] 动作强度表: 强度只取决于动作本身和两个布尔条件
+# (是否只剩 1 个 S 动作可用、L 动作是否在射程内)，因此每个动作只需计算 4 个变体。
+# 数据库中的全部动作在导入时预计算 (按对象身份查表)；
+# 运行时构造的动作 (与模板不一致的 session 数据) 按内容签名进入一个小的 LRU 缓存。
+ACTION_STRENGTH_CACHE_SIZE = 256
+_STRENGTH_TABLE = {}  # {Action 模板: (4 个变体)}
+_runtime_strengths = OrderedDict()  # {动作内容签名: (4 个变体)}
+_runtime_strengths_lock = threading.Lock()  # 多个请求线程共享该 LRU
+
+
+def _strength_variants(action):
+    """(single_s, in_range) = (F,F) (F,T) (T,F) (T,T) 四种条件下的强度。"""
+    return tuple(_compute_action_strength(action, single_s, in_range)
+                 for single_s in (False, True) for in_range in (False, True))
+
+
+def _runtime_strength_variants(action):
+    """非模板动作: 按内容签名查 LRU 缓存。"""
+    effects = action.effects or {}
+    signature = (action.action_type, action.cost, action.dice, action.range_val, action.action_style,
+                 action.ammo, action.projectile_to_spawn, repr(sorted(effects.items())))
+    with _runtime_strengths_lock:
+        variants = _runtime_strengths.get(signature)
+        if variants is not None:
+            _runtime_strengths.move_to_end(signature)
+            return variants
+    variants = _strength_variants(action)
+    with _runtime_strengths_lock:
+        _runtime_strengths[signature] = variants
+        if len(_runtime_strengths) > ACTION_STRENGTH_CACHE_SIZE:
+            _runtime_strengths.popitem(last=False)
+    return variants
+
+
+def build_action_strength_table():
+    """
+    为数据库中的全部动作预计算强度 (导入时调用一次；注册新模板后可再次调用)。
+    玩家与 AI 的同名部件在合并后的 ALL_PARTS 中会互相遮蔽，因此逐个遍历原始部件字典，
+    再补上通用动作和其他已注册的动作模板 (抛射物载荷等)。
+    """
+    part_dicts = (PLAYER_CORES, PLAYER_LEGS, PLAYER_LEFT_ARMS, PLAYER_RIGHT_ARMS, PLAYER_BACKPACKS,
+                  AI_ONLY_CORES, AI_ONLY_LEGS, AI_ONLY_LEFT_ARMS, AI_ONLY_RIGHT_ARMS, AI_ONLY_BACKPACKS)
+    actions = [action for parts in part_dicts for part in parts.values() for action in part.actions]
+    actions.extend(GENERIC_ACTIONS)
+    actions.extend(Action.iter_templates())
+    for action in actions:
+        if action not in _STRENGTH_TABLE:
+            _STRENGTH_TABLE[action] = _strength_variants(action)
+    return _STRENGTH_TABLE
 
 
 def _evaluate_action_strength(action, available_s_action_count, is_in_range):
@@ -31,8 +78,20 @@ def _evaluate_action_strength(action, available_s_action_count, is_in_range):
     根据骰子、成本、射程和效果，评估一个攻击动作的相对强度。
     使用期望值 (EV) 代替任意权重。
     假设处于“攻击姿态”（空心=命中）。
+    [v_STRENGTH] 直接查强度表，不再在每次调用时解析骰子字符串。
     """
     if not action: return 0
+    variants = _STRENGTH_TABLE.get(action)
+    if variants is None:
+        variants = _runtime_strength_variants(action)
+    return variants[(available_s_action_count == 1) * 2 + bool(is_in_range)]
+
+
+def _compute_action_strength(action, single_s, in_range):
+    """
+    (强度表的实际计算)
+    single_s: 是否只剩 1 个 S 动作可用; in_range: L 动作是否在射程内。
+    """
     if action.action_type not in ['近战', '射击', '抛射']: return 0
 
     strength = 0
@@ -43,18 +102,16 @@ def _evaluate_action_strength(action, available_s_action_count, is_in_range):
         template = PROJECTILE_TEMPLATES.get(action.projectile_to_spawn)
         if template:
             # 获取抛射物的主动作（通常是列表中的第一个）
-            proj_actions = template.get('actions', [])
+            # [v_DICE_VECTOR] 使用抛射物模板的共享 Action (带预解析的 dice_vector)
+            proj_actions = Projectile.get_template_actions(action.projectile_to_spawn)
+            if proj_actions is None:
+                proj_actions = Projectile.register_template(action.projectile_to_spawn, template)
             if proj_actions:
-                # 这是一个字典，因为 PROJECTILE_TEMPLATES 存储的是字典格式
                 payload_action = proj_actions[0]
-                p_dice = payload_action.get('dice', '')
-                yellow, red = _parse_dice_string_for_eval(p_dice)
+                yellow, red = payload_action.dice_vector[:2]
 
-                # 计算单发抛射物的 EV (期望值)
-                # 黄骰 EV: 0.875, 红骰 EV: 1.0625
-                ev_yellow = yellow * 0.875
-                ev_red = red * 1.0625
-                base_strength = ev_yellow + ev_red
+                # 计算单发抛射物的 EV (期望值, 由骰面分布精确计算)
+                base_strength = expected_attack_value(yellow, red, 'attack')
 
                 # 考虑齐射 (Salvo)
                 salvo = action.effects.get('salvo', 1)
@@ -65,7 +122,7 @@ def _evaluate_action_strength(action, available_s_action_count, is_in_range):
                 # 1. 考虑类型优势
                 # '立即': 相当于直射，无额外加成
                 # '延迟': 具有追踪和压制能力，给予极高的战术加成 (1.3 -> 1.5)
-                payload_type = payload_action.get('action_type')
+                payload_type = payload_action.action_type
                 if payload_type == '延迟':
                     strength *= 1.5  # 延迟导弹能迫使玩家移动，极具威胁
 
@@ -86,36 +143,24 @@ def _evaluate_action_strength(action, available_s_action_count, is_in_range):
                     strength *= 1.15
 
     else:
-        # 常规动作评估逻辑 (直接读取 action.dice)
-        yellow, red = _parse_dice_string_for_eval(action.dice)
+        # 常规动作评估逻辑 (直接读取预解析的 action.dice_vector)
+        yellow, red = action.dice_vector[:2]
 
         # --- 期望值计算 (假设攻击姿态) ---
-        # 黄骰: 8面, 2x[轻*2], 2x[轻*1], 1x[空心轻*1], 1x[闪电], 1x[眼], 1x[空]
-        # EV(黄) = (2*2 + 2*1 + 1*1) / 8 = 7/8 = 0.875
-        ev_yellow = yellow * 0.875
-
-        # 红骰: 8面, 4x[重*1], 1x[空心重*1], 1x[空心轻*1], 1x[闪电], 1x[眼]
-        # EV(红) = (4*1.5 + 1*1.5) / 8 [重击] + (1*1.0) / 8 [轻击]
-        # EV(红) = (7.5 + 1) / 8 = 8.5 / 8 = 1.0625
-        # (我们给重击 1.5 权重, 轻击 1.0 权重)
-        ev_red = red * ((5 / 8 * 1.5) + (1 / 8 * 1.0))  # 1.0625
-
-        strength = ev_yellow + ev_red
-
-        # 检查【频闪武器】(闪电->重击)
-        if action.effects and action.effects.get("convert_lightning_to_crit"):
-            # 1/8 概率的闪电现在变成了重击 (1.5 权重)
-            strength += yellow * (1 / 8 * 1.5)
-            strength += red * (1 / 8 * 1.5)
+        # 由 dice_probability 对骰面精确卷积得到 (重击 1.5 权重, 轻击 1.0 权重):
+        # EV(黄) = 7/8 = 0.875, EV(红) = 5/8 * 1.5 + 1/8 = 1.0625
+        # 【频闪武器】(闪电->重击) 时每颗骰子额外 + 1/8 * 1.5
+        convert = bool(action.effects and action.effects.get("convert_lightning_to_crit"))
+        strength = expected_attack_value(yellow, red, 'attack', convert)
 
     # --- 通用：成本和效果调整 ---
     if action.cost == 'S':
         strength *= 1.2  # S动作更灵活
-        if available_s_action_count == 1:
+        if single_s:
             strength *= 0.7
     elif action.cost == 'L':
         strength *= 0.8  # L动作成本高
-        if is_in_range:
+        if in_range:
             strength *= 1.5
 
     if action.effects:
@@ -140,6 +185,9 @@ def _evaluate_action_strength(action, available_s_action_count, is_in_range):
     return strength
 
 
+build_action_strength_table()
+
+
 # --- AI 动作成本辅助函数 ---
 def _get_action_cost(action):
     """(辅助函数) 获取动作的 AP/TP 成本。"""
@@ -241,20 +289,33 @@ def _calculate_ai_attack_range(game_state, attacker_mech, action, start_pos, ori
 
 # --- 寻路与位置评估 ---
 
-def _find_all_reachable_positions(game, ai_mech, player_mech):
+def _get_max_move_budget(mech):
+    """
+    [v_BOARD_SIZE] AI 本回合可能用到的最大移动成本:
+    所有【移动】动作的射程，以及调整阶段的移动 (机动姿态下翻倍)。
+    """
+    budget = 0
+    for part in mech.parts.values():
+        if part:
+            for action in part.actions:
+                if action.action_type == '移动':
+                    budget = max(budget, action.range_val)
+    legs = mech.parts.get('legs')
+    if legs:
+        budget = max(budget, legs.adjust_move * 2)
+    return budget
+
+
+def _find_all_reachable_positions(game, ai_mech, player_mech, max_cost=None):
     """
     在AI回合开始时运行一次，使用 Dijkstra 算法计算到所有格子的最小成本。
     返回一个字典: {(x, y): cost}
+    [v_BOARD_SIZE] max_cost: 只搜索成本不超过该值的格子 (None 表示整个棋盘)。
+    大棋盘上搜索量只与移动力有关；返回的格子及其顺序与全图搜索中 cost <= max_cost 的部分一致。
     """
     start_pos = ai_mech.pos
-    locker_mech = player_mech
-    locker_pos = player_mech.pos if player_mech else None
-
-    locker_can_lock = (
-            locker_mech and
-            locker_mech.status != 'destroyed' and
-            locker_mech.has_melee_action()
-    )
+    # [v_LOCKFIELD] 只有玩家机甲能锁定 AI；锁定场在寻路前计算一次
+    locked_tiles = get_lock_field(game, ai_mech, [player_mech] if player_mech else [])
 
     pq = [(0, start_pos)]  # (cost, pos)
     visited = {start_pos: 0}  # {pos: cost}
@@ -265,12 +326,14 @@ def _find_all_reachable_positions(game, ai_mech, player_mech):
         cost, (x, y) = heapq.heappop(pq)
         current_pos = (x, y)
 
+        if max_cost is not None and cost > max_cost:
+            # 之后出队的成本只会更高；剩余格子的成本都超出预算 (可能尚未收敛)，丢弃
+            return {pos: c for pos, c in visited.items() if c <= max_cost}
+        if cost > visited[current_pos]:
+            continue  # 过期的队列项
+
         # 探索邻居
-        current_is_locked = False
-        if locker_can_lock:
-            current_is_locked = _is_tile_locked_by_opponent(
-                game, current_pos, ai_mech, locker_pos, locker_mech
-            )
+        current_is_locked = current_pos in locked_tiles
 
         for dx, dy in [(0, 1), (0, -1), (1, 0), (-1, 0)]:
             nx, ny = x + dx, y + dy
@@ -408,7 +471,8 @@ def run_ai_turn(ai_mech, game_state):
 
     player_pos = player_mech.pos
 
-    all_reachable_costs = _find_all_reachable_positions(game_state, ai_mech, player_mech)
+    all_reachable_costs = _find_all_reachable_positions(game_state, ai_mech, player_mech,
+                                                        max_cost=_get_max_move_budget(ai_mech))
 
     is_ai_locked = get_ai_lock_status(game_state, ai_mech)[0]
     if is_ai_locked: log.append(f"> AI {ai_mech.name} 被玩家近战锁定！")
@@ -925,18 +989,17 @@ def run_ai_turn(ai_mech, game_state):
                     best_intermediate = None
                     min_dist_to_player = 999
 
-                    # 搜索所有射程内的格子
-                    for dx in range(-launch_range, launch_range + 1):
-                        for dy in range(-launch_range, launch_range + 1):
-                            if abs(dx) + abs(dy) <= launch_range:
-                                cx, cy = ai_mech.pos[0] + dx, ai_mech.pos[1] + dy
-                                if 1 <= cx <= game_state.board_width and 1 <= cy <= game_state.board_height:
-                                    # 目标格子不能有单位 (抛射物除外，但简单起见避开所有单位)
-                                    if (cx, cy) not in occupied:
-                                        d = _get_distance((cx, cy), player_pos)
-                                        if d < min_dist_to_player:
-                                            min_dist_to_player = d
-                                            best_intermediate = (cx, cy)
+                    # 搜索所有射程内的格子 (菱形裁剪到棋盘内，x 优先，其次 y)
+                    ax, ay = ai_mech.pos
+                    for cx in range(max(1, ax - launch_range), min(game_state.board_width, ax + launch_range) + 1):
+                        span = launch_range - abs(cx - ax)
+                        for cy in range(max(1, ay - span), min(game_state.board_height, ay + span) + 1):
+                            # 目标格子不能有单位 (抛射物除外，但简单起见避开所有单位)
+                            if (cx, cy) not in occupied:
+                                d = _get_distance((cx, cy), player_pos)
+                                if d < min_dist_to_player:
+                                    min_dist_to_player = d
+                                    best_intermediate = (cx, cy)
 
                     if best_intermediate:
                         target_spot = best_intermediate
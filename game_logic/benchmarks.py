@@ -0,0 +1,242 @@
+"""
+[NEW] 性能基准 (Benchmarks)。
+
+不依赖第三方库的微基准，用于在优化前后对比同一指标:
+- memory: 每个存活 GameState 占用的字节数 (tracemalloc)，以及 to_dict / from_dict 往返耗时
+- movement: 移动范围 / AI 寻路耗时随棋盘尺寸的变化
+- session: session 中每局的字节数与编码/解码耗时 (to_dict + pickle vs state_codec)
+- context: 玩家所有动作的高亮范围 (逐个动作计算 vs 回合上下文 vs 缓存命中)
+
+用法:
+    python -m game_logic.benchmarks memory
+    python -m game_logic.benchmarks memory --count 500 --mode horde
+    python -m game_logic.benchmarks movement --sizes 10,32,64,128
+    python -m game_logic.benchmarks session --mode horde
+    python -m game_logic.benchmarks context --mode standard
+"""
+import argparse
+import contextlib
+import io
+import pickle
+import time
+import tracemalloc
+
+from .game_logic import GameState
+from .ai_system import _find_all_reachable_positions, _get_max_move_budget
+from .simulator import DEFAULT_PLAYER_SELECTION
+from .state_codec import encode_state, decode_state
+from .turn_context import ADJUST_MOVE, RANGE_ATTACK_TYPES, move_range, attack_range, build_turn_context, \
+    get_turn_context
+
+
+def _build_states(count, game_mode, ai_loadout_key):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return [GameState(DEFAULT_PLAYER_SELECTION, ai_loadout_key, game_mode, seed=i) for i in range(count)]
+
+
+def bench_memory(count=200, game_mode='duel', ai_loadout_key='standard'):
+    """
+    测量每个存活 GameState 的内存占用。
+
+    分别统计:
+    - new: 直接构造 (GameState(...))
+    - loaded: 从 session 字典恢复 (GameState.from_dict)，即每次请求实际驻留的对象
+
+    Returns:
+        dict: {'new_bytes', 'loaded_bytes', 'roundtrip_us'}
+    """
+    _build_states(1, game_mode, ai_loadout_key)  # 预热: 导入、模板注册、lru_cache
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    states = _build_states(count, game_mode, ai_loadout_key)
+    new_bytes = (tracemalloc.get_traced_memory()[0] - before) / count
+
+    session_data = [gs.to_dict() for gs in states]
+    del states
+    before = tracemalloc.get_traced_memory()[0]
+    loaded = [GameState.from_dict(data) for data in session_data]
+    loaded_bytes = (tracemalloc.get_traced_memory()[0] - before) / count
+    tracemalloc.stop()
+    del loaded
+
+    started = time.perf_counter()
+    for data in session_data:
+        GameState.from_dict(data).to_dict()
+    roundtrip_us = (time.perf_counter() - started) / count * 1e6
+
+    return {'new_bytes': new_bytes, 'loaded_bytes': loaded_bytes, 'roundtrip_us': roundtrip_us}
+
+
+def _time_us(func, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - started) / repeat * 1e6
+
+
+def bench_movement(sizes=(10, 32, 64, 128), move_distance=4, repeat=200, ai_loadout_key='standard'):
+    """
+    测量不同棋盘尺寸下的寻路耗时 (双方机甲位于棋盘中央附近)。
+
+    分别统计:
+    - move_range: 玩家 calculate_move_range (地面移动)
+    - ai_bounded: AI 回合开始时的 _find_all_reachable_positions (按移动力限界)
+    - ai_full: 同上但搜索整个棋盘 (限界前的行为)
+
+    Returns:
+        list: [{'size', 'move_range_us', 'ai_bounded_us', 'ai_full_us'}, ...]
+    """
+    report = []
+    for size in sizes:
+        with contextlib.redirect_stdout(io.StringIO()):
+            gs = GameState(DEFAULT_PLAYER_SELECTION, ai_loadout_key, 'duel', seed=0, board_width=size,
+                           board_height=size)
+        player, ai = gs.get_player_mech(), gs.get_ai_mech()
+        center = (size + 1) // 2
+        player.pos, ai.pos = (center, center), (min(size, center + 3), center)
+        budget = _get_max_move_budget(ai)
+        report.append({
+            'size': size,
+            'move_range_us': _time_us(lambda: gs.calculate_move_range(player, move_distance), repeat),
+            'ai_bounded_us': _time_us(lambda: _find_all_reachable_positions(gs, ai, player, budget), repeat),
+            'ai_full_us': _time_us(lambda: _find_all_reachable_positions(gs, ai, player), max(1, repeat // 10)),
+        })
+    return report
+
+
+def bench_session(count=200, game_mode='duel', ai_loadout_key='standard'):
+    """
+    测量每局游戏写入 session 的字节数和每次请求的编码 / 解码耗时。
+    session 后端 (Flask-Session 文件存储) 会再 pickle 一次 session 内容，这里按最高协议计入。
+
+    分别统计:
+    - dict: GameState.to_dict() / GameState.from_dict() (旧格式)
+    - codec: state_codec.encode_state() / decode_state()
+
+    Returns:
+        dict: {'dict_bytes', 'codec_bytes', 'dict_encode_us', 'dict_decode_us',
+               'codec_encode_us', 'codec_decode_us', 'roundtrip_ok'}
+    """
+    states = _build_states(count, game_mode, ai_loadout_key)
+    dumps = lambda obj: pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL)
+
+    dict_blobs = [dumps(gs.to_dict()) for gs in states]
+    codec_blobs = [dumps(encode_state(gs)) for gs in states]
+    dict_data = [gs.to_dict() for gs in states]
+    codec_data = [encode_state(gs) for gs in states]
+
+    def per_state_us(func, items):
+        started = time.perf_counter()
+        for item in items:
+            func(item)
+        return (time.perf_counter() - started) / len(items) * 1e6
+
+    return {
+        'dict_bytes': sum(map(len, dict_blobs)) / count,
+        'codec_bytes': sum(map(len, codec_blobs)) / count,
+        'dict_encode_us': per_state_us(lambda gs: dumps(gs.to_dict()), states),
+        'dict_decode_us': per_state_us(lambda blob: GameState.from_dict(pickle.loads(blob)), dict_blobs),
+        'codec_encode_us': per_state_us(lambda gs: dumps(encode_state(gs)), states),
+        'codec_decode_us': per_state_us(lambda blob: decode_state(pickle.loads(blob)), codec_blobs),
+        'roundtrip_ok': all(decode_state(blob).to_dict() == GameState.from_dict(data).to_dict()
+                            for blob, data in zip(codec_data, dict_data)),
+    }
+
+
+def bench_turn_context(count=200, game_mode='duel', ai_loadout_key='standard'):
+    """
+    测量一个状态版本内玩家所有动作的高亮范围耗时 (不含 HTTP 往返)。
+
+    分别统计:
+    - per_action: 每个动作单独计算 (以前每次选择动作都请求一次 get_move_range / get_attack_range)
+    - context: build_turn_context 一次算出全部
+    - cached: get_turn_context 缓存命中 (同一版本的后续请求)
+
+    Returns:
+        dict: {'actions', 'per_action_us', 'context_us', 'cached_us'}
+    """
+    states = _build_states(count, game_mode, ai_loadout_key)
+    for gs in states:
+        gs.get_player_mech().turn_phase = 'main'
+
+    def per_action(gs):
+        mech = gs.get_player_mech()
+        move_range(gs, mech, ADJUST_MOVE, 'legs')
+        for action, slot in mech.get_all_actions():
+            if action.action_type == '移动':
+                move_range(gs, mech, action.name, slot)
+            elif action.action_type in RANGE_ATTACK_TYPES:
+                attack_range(gs, mech, action.name, slot)
+
+    def per_state_us(func):
+        started = time.perf_counter()
+        for gs in states:
+            func(gs)
+        return (time.perf_counter() - started) / count * 1e6
+
+    actions = sum(1 + sum(1 for action, _ in gs.get_player_mech().get_all_actions()
+                          if action.action_type == '移动' or action.action_type in RANGE_ATTACK_TYPES)
+                  for gs in states) / count
+    per_action_us = per_state_us(per_action)
+    context_us = per_state_us(lambda gs: build_turn_context(gs, gs.get_player_mech()))
+    per_state_us(lambda gs: get_turn_context(gs, gs.get_player_mech()))  # 填充缓存
+    cached_us = per_state_us(lambda gs: get_turn_context(gs, gs.get_player_mech()))
+    return {'actions': actions, 'per_action_us': per_action_us, 'context_us': context_us, 'cached_us': cached_us}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="游戏逻辑性能基准")
+    sub = parser.add_subparsers(dest='bench', required=True)
+
+    memory = sub.add_parser('memory', help="每个 GameState 的内存占用")
+    memory.add_argument('--count', type=int, default=200)
+    memory.add_argument('--mode', default='duel')
+    memory.add_argument('--ai', default='standard')
+
+    movement = sub.add_parser('movement', help="寻路耗时 vs 棋盘尺寸")
+    movement.add_argument('--sizes', default='10,32,64,128', help="逗号分隔的棋盘边长")
+    movement.add_argument('--distance', type=int, default=4, help="玩家移动距离")
+    movement.add_argument('--repeat', type=int, default=200)
+
+    session_bench = sub.add_parser('session', help="session 字节数与编码/解码耗时")
+    session_bench.add_argument('--count', type=int, default=200)
+    session_bench.add_argument('--mode', default='duel')
+    session_bench.add_argument('--ai', default='standard')
+
+    context_bench = sub.add_parser('context', help="高亮范围: 逐个动作 vs 回合上下文")
+    context_bench.add_argument('--count', type=int, default=200)
+    context_bench.add_argument('--mode', default='duel')
+    context_bench.add_argument('--ai', default='standard')
+
+    args = parser.parse_args(argv)
+    if args.bench == 'memory':
+        stats = bench_memory(args.count, args.mode, args.ai)
+        print(f"GameState ({args.mode}, AI={args.ai}, n={args.count}):")
+        print(f"  新建:      {stats['new_bytes']:10.0f} 字节/局")
+        print(f"  from_dict: {stats['loaded_bytes']:10.0f} 字节/局")
+        print(f"  往返:      {stats['roundtrip_us']:10.1f} 微秒/局")
+    elif args.bench == 'movement':
+        sizes = [int(n) for n in args.sizes.split(',') if n]
+        print(f"{'棋盘':>9} {'移动范围(us)':>14} {'AI 限界(us)':>14} {'AI 全图(us)':>14}")
+        for row in bench_movement(sizes, args.distance, args.repeat):
+            print(f"{row['size']:>4}x{row['size']:<4} {row['move_range_us']:14.1f} "
+                  f"{row['ai_bounded_us']:14.1f} {row['ai_full_us']:14.1f}")
+    elif args.bench == 'session':
+        stats = bench_session(args.count, args.mode, args.ai)
+        print(f"Session ({args.mode}, AI={args.ai}, n={args.count}):")
+        print(f"{'':>8} {'字节/局':>10} {'编码(us)':>10} {'解码(us)':>10}")
+        for label, key in (('to_dict', 'dict'), ('codec', 'codec')):
+            print(f"{label:>8} {stats[key + '_bytes']:10.0f} {stats[key + '_encode_us']:10.1f} "
+                  f"{stats[key + '_decode_us']:10.1f}")
+        print(f"  解码结果一致: {stats['roundtrip_ok']}")
+    elif args.bench == 'context':
+        stats = bench_turn_context(args.count, args.mode, args.ai)
+        print(f"高亮范围 ({args.mode}, AI={args.ai}, n={args.count}, 平均 {stats['actions']:.1f} 个动作/局):")
+        print(f"  逐个动作:   {stats['per_action_us']:10.1f} 微秒/版本 ({stats['actions']:.1f} 次请求)")
+        print(f"  回合上下文: {stats['context_us']:10.1f} 微秒/版本 (1 次请求)")
+        print(f"  缓存命中:   {stats['cached_us']:10.1f} 微秒/请求")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,274 @@
+"""
+[NEW] 位棋盘 (Bitboard) 几何与占据层。
+
+棋盘上每个格子对应一个整数位，任意格子集合都可以用一个 Python int 表示
+(默认 10x10 棋盘为 100 位)，集合运算 (并、交、差) 即位运算。
+
+位序采用列优先: index = (x - 1) * height + (y - 1)。
+按位从低到高遍历时，顺序与旧代码中 `for x in ...: for y in ...:` 的双重循环一致，
+因此用掩码替换扫描后，结果列表的顺序不变。
+
+- BoardGeometry: 只与棋盘尺寸有关的几何掩码 (曼哈顿半径、前向弧、8邻域)，按尺寸共享并缓存
+- Bitboard: 一局游戏的占据状态 (总占据、按控制方占据)，由 EntityRegistry 在实体
+  生成 / 移动 / 摧毁 / 移除时增量维护
+"""
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+
+# 每个 BoardGeometry 缓存的抛射落点结果数 (LRU)
+LAUNCH_CELL_CACHE_SIZE = 512
+
+
+class BoardGeometry:
+    """
+    与棋盘尺寸绑定的几何掩码工具 (只读，可在多局之间共享)。
+    掩码缓存只做单次字典读写；抛射落点的 LRU 需要多步操作，由锁保护 (多个请求线程共享同一实例)。
+    """
+
+    __slots__ = ('width', 'height', 'size', 'full', '_manhattan', '_arcs', '_neighbors8', '_launch_cells',
+                 '_launch_lock')
+
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.size = width * height
+        self.full = (1 << self.size) - 1
+        self._manhattan = {}  # {(pos, radius): mask}
+        self._arcs = {}  # {(pos, orientation): mask}
+        self._neighbors8 = {}  # {pos: mask}
+        self._launch_cells = OrderedDict()  # {(pos, radius, occupied): 坐标元组} (LRU)
+        self._launch_lock = threading.Lock()
+
+    def __reduce__(self):
+        # 锁不能序列化；反序列化 / 深拷贝时取回按尺寸共享的实例，而不是复制一份
+        return get_geometry, (self.width, self.height)
+
+    # --- 坐标 <-> 位 ---
+
+    def on_board(self, pos):
+        return 1 <= pos[0] <= self.width and 1 <= pos[1] <= self.height
+
+    def index(self, pos):
+        """坐标 -> 位序号；棋盘外返回 -1。"""
+        x, y = pos
+        if 1 <= x <= self.width and 1 <= y <= self.height:
+            return (x - 1) * self.height + (y - 1)
+        return -1
+
+    def bit(self, pos):
+        """坐标 -> 单个位的掩码；棋盘外返回 0。"""
+        index = self.index(pos)
+        return 1 << index if index >= 0 else 0
+
+    def position(self, index):
+        x, y = divmod(index, self.height)
+        return x + 1, y + 1
+
+    def mask_of(self, positions):
+        mask = 0
+        for pos in positions:
+            mask |= self.bit(pos)
+        return mask
+
+    def positions(self, mask):
+        """按位序 (x 优先，其次 y) 列出掩码中的所有坐标。"""
+        result = []
+        height = self.height
+        while mask:
+            low = mask & -mask
+            x, y = divmod(low.bit_length() - 1, height)
+            result.append((x + 1, y + 1))
+            mask ^= low
+        return result
+
+    @staticmethod
+    def count(mask):
+        return bin(mask).count('1')
+
+    # --- 几何掩码 (缓存) ---
+
+    def _column_span(self, x, y_min, y_max):
+        """第 x 列中 y_min..y_max (裁剪到棋盘内) 的连续位段；每列一次位运算，不逐格循环。"""
+        y_min = max(1, y_min)
+        y_max = min(self.height, y_max)
+        if y_min > y_max:
+            return 0
+        return ((1 << (y_max - y_min + 1)) - 1) << ((x - 1) * self.height + (y_min - 1))
+
+    def manhattan(self, pos, radius):
+        """与 pos 的曼哈顿距离 <= radius 的所有格子 (含 pos 自身)。"""
+        key = (pos, radius)
+        mask = self._manhattan.get(key)
+        if mask is None:
+            mask = 0
+            if radius >= 0:
+                px, py = pos
+                for x in range(max(1, px - radius), min(self.width, px + radius) + 1):
+                    span = radius - abs(x - px)
+                    mask |= self._column_span(x, py - span, py + span)
+            self._manhattan[key] = mask
+        return mask
+
+    def forward_arc(self, pos, orientation):
+        """观察者前向 90 度弧内的所有格子 (与 game_logic.is_in_forward_arc 规则一致，含 pos 自身)。"""
+        key = (pos, orientation)
+        mask = self._arcs.get(key)
+        if mask is None:
+            mask = 0
+            vx, vy = pos
+            if orientation == 'N':
+                for x in range(1, self.width + 1):
+                    mask |= self._column_span(x, 1, vy - abs(x - vx))
+            elif orientation == 'S':
+                for x in range(1, self.width + 1):
+                    mask |= self._column_span(x, vy + abs(x - vx), self.height)
+            elif orientation == 'E':
+                for x in range(max(1, vx), self.width + 1):
+                    mask |= self._column_span(x, vy - (x - vx), vy + (x - vx))
+            elif orientation == 'W':
+                for x in range(1, min(self.width, vx) + 1):
+                    mask |= self._column_span(x, vy - (vx - x), vy + (vx - x))
+            self._arcs[key] = mask
+        return mask
+
+    def neighbors8(self, pos):
+        """pos 周围 8 格 (不含 pos 自身)，即近战锁定区域。"""
+        mask = self._neighbors8.get(pos)
+        if mask is None:
+            mask = 0
+            px, py = pos
+            for x in range(max(1, px - 1), min(self.width, px + 1) + 1):
+                for y in range(max(1, py - 1), min(self.height, py + 1) + 1):
+                    if x != px or y != py:
+                        mask |= 1 << ((x - 1) * self.height + (y - 1))
+            self._neighbors8[pos] = mask
+        return mask
+
+    def launch_cells(self, pos, radius, occupied):
+        """
+        抛射的可选落点: 以 pos 为中心、半径 radius 的菱形 (裁剪到棋盘内)，
+        去掉 occupied 掩码中的格子和 pos 自身，按位序 (x 优先，其次 y) 排列。
+
+        结果按 (pos, radius, occupied) 缓存: 占据掩码本身即占据状态的版本号，
+        同一局面在不同请求之间重建 GameState 后依然命中。
+        """
+        key = (pos, radius, occupied)
+        cache = self._launch_cells
+        with self._launch_lock:
+            cells = cache.get(key)
+            if cells is not None:
+                cache.move_to_end(key)
+                return list(cells)
+        mask = self.manhattan(pos, radius) & ~occupied & ~self.bit(pos)
+        cells = tuple(self.positions(mask))
+        with self._launch_lock:
+            cache[key] = cells
+            if len(cache) > LAUNCH_CELL_CACHE_SIZE:
+                cache.popitem(last=False)
+        return list(cells)
+
+
+@lru_cache(maxsize=None)
+def get_geometry(width, height):
+    """按棋盘尺寸获取共享的 BoardGeometry。"""
+    return BoardGeometry(width, height)
+
+
+class Bitboard:
+    """
+    一局游戏的占据位棋盘。
+
+    同一格子上可能同时有多个实体 (例如抛射物落在机甲格子上)，所以内部按格子计数，
+    计数在 0 <-> 1 之间变化时才翻转对应的位。被摧毁的实体不占据格子。
+    棋盘外的坐标不进入掩码，单独计数，保证 occupied_positions() 与旧的扫描结果一致。
+    """
+
+    __slots__ = ('geometry', 'occupied', 'by_controller', '_counts', '_controller_counts', '_offboard', 'version')
+
+    def __init__(self, geometry):
+        self.geometry = geometry
+        self.occupied = 0
+        self.by_controller = {}  # {controller: mask}
+        self._counts = {}  # {index: 实体数}
+        self._controller_counts = {}  # {(controller, index): 实体数}
+        self._offboard = {}  # {pos: 实体数}
+        self.version = 0  # 每次占据变化 +1，供上层缓存判断失效
+
+    def add(self, controller, pos):
+        self.version += 1
+        index = self.geometry.index(pos) if pos else -1
+        if index < 0:
+            self._offboard[pos] = self._offboard.get(pos, 0) + 1
+            return
+        bit = 1 << index
+        count = self._counts.get(index, 0)
+        self._counts[index] = count + 1
+        if count == 0:
+            self.occupied |= bit
+        key = (controller, index)
+        count = self._controller_counts.get(key, 0)
+        self._controller_counts[key] = count + 1
+        if count == 0:
+            self.by_controller[controller] = self.by_controller.get(controller, 0) | bit
+
+    def remove(self, controller, pos):
+        self.version += 1
+        index = self.geometry.index(pos) if pos else -1
+        if index < 0:
+            count = self._offboard.get(pos, 0) - 1
+            if count > 0:
+                self._offboard[pos] = count
+            else:
+                self._offboard.pop(pos, None)
+            return
+        bit = 1 << index
+        count = self._counts.get(index, 0) - 1
+        if count > 0:
+            self._counts[index] = count
+        else:
+            self._counts.pop(index, None)
+            self.occupied &= ~bit
+        key = (controller, index)
+        count = self._controller_counts.get(key, 0) - 1
+        if count > 0:
+            self._controller_counts[key] = count
+        else:
+            self._controller_counts.pop(key, None)
+            self.by_controller[controller] = self.by_controller.get(controller, 0) & ~bit
+
+    def move(self, controller, old_pos, new_pos):
+        if old_pos != new_pos:
+            self.remove(controller, old_pos)
+            self.add(controller, new_pos)
+
+    # --- 查询 ---
+
+    def is_occupied(self, pos):
+        index = self.geometry.index(pos)
+        if index < 0:
+            return pos in self._offboard
+        return bool(self.occupied >> index & 1)
+
+    def count_at(self, pos):
+        index = self.geometry.index(pos)
+        if index < 0:
+            return self._offboard.get(pos, 0)
+        return self._counts.get(index, 0)
+
+    def controller_mask(self, controller):
+        return self.by_controller.get(controller, 0)
+
+    def enemy_mask(self, controller):
+        """所有非 controller 一方的实体所在格子。"""
+        mask = 0
+        for other, other_mask in self.by_controller.items():
+            if other != controller:
+                mask |= other_mask
+        return mask
+
+    def occupied_positions(self):
+        """所有被占据的坐标集合 (含棋盘外)。"""
+        positions = set(self.geometry.positions(self.occupied))
+        positions.update(self._offboard)
+        return positions
@@ -1,23 +1,24 @@
 import random
-import re
 import traceback
 from .dice_roller import roll_dice, process_rolls, reroll_specific_dice
+from .dice_probability import parse_dice_pool
 from .data_models import Mech, Projectile, Part, Action
 # [NEW] 导入 Ace 逻辑
 from . import ace_logic
 
 
+def dice_vector_to_counts(dice_vector):
+    """(辅助函数) 将 (黄, 红, 白, 蓝) 四元组转为 roll_dice 的关键字参数字典。"""
+    yellow, red, white, blue = dice_vector
+    return {'yellow_count': yellow, 'red_count': red, 'white_count': white, 'blue_count': blue}
+
+
 def parse_dice_string(dice_str):
     """
-    (辅助函数) 使用正则表达式解析骰子字符串，例如 '1黄3红'。
+    (辅助函数) 解析骰子字符串，例如 '1黄3红'。
+    [v_DICE_VECTOR] 四种颜色都会解析 (之前会丢弃白骰和蓝骰)。结算时直接使用 Action.dice_vector。
     """
-    counts = {'yellow_count': 0, 'red_count': 0, 'white_count': 0, 'blue_count': 0}
-    if not dice_str: return counts
-    patterns = {'yellow_count': r'(\d+)\s*黄', 'red_count': r'(\d+)\s*红'}
-    for key, pattern in patterns.items():
-        match = re.search(pattern, dice_str)
-        if match: counts[key] = int(match.group(1))
-    return counts
+    return dice_vector_to_counts(parse_dice_pool(dice_str))
 
 
 class CombatState:
@@ -27,9 +28,10 @@ class CombatState:
     """
 
     def __init__(self, attacker_entity, defender_entity, action, target_part_name,
-                 is_back_attack=False, is_interception_attack=False):
+                 is_back_attack=False, is_interception_attack=False, rng=None):
         """
         初始化一个新的战斗会话。
+        [v_RNG] rng: 掷骰使用的随机流 (通常为 game_state.rng.dice)，默认使用全局 random。
         """
         # --- 核心上下文 (在战斗中不变) ---
         self.attacker_entity = attacker_entity
@@ -38,6 +40,7 @@ class CombatState:
         self.target_part_name = target_part_name
         self.is_back_attack = is_back_attack
         self.is_interception_attack = is_interception_attack  # 拦截攻击不能被重投
+        self.rng = rng or random
 
         # --- 状态管理 ---
         self.stage = 'INITIAL_ROLL'
@@ -90,7 +93,8 @@ class CombatState:
             action,
             data['target_part_name'],
             data.get('is_back_attack', False),
-            data.get('is_interception_attack', False)
+            data.get('is_interception_attack', False),
+            rng=game_state.rng.dice if getattr(game_state, 'rng', None) else None
         )
 
         # 恢复所有内部状态
@@ -172,7 +176,7 @@ class CombatState:
                 rerolling_player.pilot.link_points -= 1  # 状态修改：消耗链接值
                 player_did_reroll = True
                 link_cost_applied = True
-                new_attack_rolls = reroll_specific_dice(new_attack_rolls, selections_attacker)
+                new_attack_rolls = reroll_specific_dice(new_attack_rolls, selections_attacker, self.rng)
             else:
                 log.append("  > [警告] 玩家试图重投攻击骰，但链接值不足！")
 
@@ -183,7 +187,7 @@ class CombatState:
                 if not link_cost_applied:
                     rerolling_player.pilot.link_points -= 1  # 状态修改：消耗链接值
                 player_did_reroll = True
-                new_defense_rolls = reroll_specific_dice(new_defense_rolls, selections_defender)
+                new_defense_rolls = reroll_specific_dice(new_defense_rolls, selections_defender, self.rng)
             else:
                 log.append("  > [警告] 玩家试图重投防御骰，但链接值不足！")
 
@@ -263,7 +267,7 @@ class CombatState:
         original_status = target_part.status
 
         # --- 3. 投掷攻击骰 ---
-        attack_dice_counts = parse_dice_string(self.action.dice)
+        attack_dice_counts = dice_vector_to_counts(self.action.dice_vector)
         is_mech_attacker = isinstance(self.attacker_entity, Mech)
         is_mech_defender = isinstance(self.defender_entity, Mech)
 
@@ -294,7 +298,7 @@ class CombatState:
         dice_roll_details['attack_dice_input'] = attack_dice_counts.copy()
 
         # 存储原始骰子，以便重投
-        self.attack_raw_rolls = roll_dice(**attack_dice_counts)
+        self.attack_raw_rolls = roll_dice(**attack_dice_counts, rng=self.rng)
 
         attacker_stance = 'attack' if (is_mech_attacker and self.attacker_entity.stance == 'attack') else 'defense'
         convert_lightning = self.action.effects and self.action.effects.get("convert_lightning_to_crit", False)
@@ -337,7 +341,7 @@ class CombatState:
 
         dice_roll_details['defense_dice_input'] = {'white_count': white_dice_count, 'blue_count': blue_dice_count}
 
-        self.defense_raw_rolls = roll_dice(white_count=white_dice_count, blue_count=blue_dice_count)
+        self.defense_raw_rolls = roll_dice(white_count=white_dice_count, blue_count=blue_dice_count, rng=self.rng)
 
         processed_defense_rolls, defense_roll_summary = process_rolls(
             self.defense_raw_rolls,
@@ -363,7 +367,7 @@ class CombatState:
                     if reroll_selections:
                         log.append(f"> [警告] 王牌机师 {self.attacker_entity.name} 消耗 1 链接值强制修正攻击弹道！")
                         self.attacker_entity.pilot.link_points -= 1
-                        self.attack_raw_rolls = reroll_specific_dice(self.attack_raw_rolls, reroll_selections)
+                        self.attack_raw_rolls = reroll_specific_dice(self.attack_raw_rolls, reroll_selections, self.rng)
                         self.ace_rerolled = True
 
                         # 重新处理攻击骰
@@ -388,7 +392,7 @@ class CombatState:
                     if reroll_selections:
                         log.append(f"> [警告] 王牌机师 {self.defender_entity.name} 消耗 1 链接值强制修正防御机动！")
                         self.defender_entity.pilot.link_points -= 1
-                        self.defense_raw_rolls = reroll_specific_dice(self.defense_raw_rolls, reroll_selections)
+                        self.defense_raw_rolls = reroll_specific_dice(self.defense_raw_rolls, reroll_selections, self.rng)
                         self.ace_rerolled = True
 
                         # 重新处理防御骰
@@ -820,7 +824,7 @@ class CombatState:
                 defense_raw_rolls_2 = rerolled_defense_raw
                 log.append("  > (使用重投后的毁伤防御骰...)")
             else:
-                defense_raw_rolls_2 = roll_dice(white_count=white_dice_count_2, blue_count=blue_dice_count_2)
+                defense_raw_rolls_2 = roll_dice(white_count=white_dice_count_2, blue_count=blue_dice_count_2, rng=self.rng)
 
             # --- 重投中断检查 ---
             if not skip_reroll_phase:
@@ -935,7 +939,7 @@ class CombatState:
             if not other_parts:
                 log.append(f"  > [{log_effect_name}] 没有其他有效部件可以作为目标。")
             else:
-                secondary_target_slot, secondary_target = random.choice(other_parts)
+                secondary_target_slot, secondary_target = self.rng.choice(other_parts)
                 secondary_status = secondary_target.status
                 log.append(
                     f"  > [{log_effect_name}] 溢出伤害 ({overflow_crits}重, {overflow_hits}轻) 结算至随机部件: [{secondary_target.name}] ({secondary_target_slot})！")
@@ -957,7 +961,7 @@ class CombatState:
                     defense_raw_rolls_2 = rerolled_defense_raw
                     log.append(f"  > (使用重投后的{log_effect_name}防御骰...)")
                 else:
-                    defense_raw_rolls_2 = roll_dice(white_count=white_dice_2, blue_count=blue_dice_2)
+                    defense_raw_rolls_2 = roll_dice(white_count=white_dice_2, blue_count=blue_dice_2, rng=self.rng)
 
                 # --- 重投中断检查 ---
                 if not skip_reroll_phase:
@@ -1,5 +1,7 @@
 import random
 
+from .dice_probability import parse_dice_pool
+from .zobrist import zobrist_key
 
 # 注意：这个文件位于 game_logic/ 文件夹中。
 # 它依赖于同在 game_logic/ 下的 database/ 包。
@@ -8,14 +10,28 @@ class Action:
     """
     定义一个可执行的动作 (如攻击、移动)。
     这是所有部件 (Part) 可以执行的操作的基础数据结构。
+
+    [v_FLYWEIGHT] Action 在运行时是只读的 (弹药存放在 GameState.ammo_counts 中)，
+    因此数据库中的动作会注册为共享模板，from_dict 遇到与模板一致的数据时直接返回模板实例。
+    [v_SLOTS] 使用 __slots__，实例不再携带 __dict__。
+    [v_DICE_VECTOR] dice_vector 是预解析的 (黄, 红, 白, 蓝) 四元组，创建时计算一次并随 to_dict 保存，
+    结算和 AI 评估直接读取它，不再在热路径上对 dice 字符串跑正则。
     """
 
+    __slots__ = ('name', 'action_type', 'cost', 'dice', 'range_val', 'effects',
+                 'action_style', 'aoe_range', 'projectile_to_spawn', 'ammo', 'dice_vector')
+
+    # {(name, action_type, cost, dice): [Action, ...]}  ('点射' 等名称并不唯一)
+    _templates = {}
+
     def __init__(self, name, action_type, cost, dice, range_val=0, effects=None,
-                 action_style='direct', aoe_range=0, projectile_to_spawn=None, ammo=0):
+                 action_style='direct', aoe_range=0, projectile_to_spawn=None, ammo=0, dice_vector=None):
         self.name = name
         self.action_type = action_type  # 类型: '近战', '射击', '移动', '抛射', '被动', '快速'
         self.cost = cost  # 成本: 'S', 'M', 'L'
         self.dice = dice  # 骰子: e.g., '1黄3红'
+        # 预解析的骰池 (黄, 红, 白, 蓝)
+        self.dice_vector = tuple(dice_vector) if dice_vector is not None else parse_dice_pool(dice)
         self.range_val = range_val  # 射程或移动距离
         self.effects = effects if effects is not None else {}  # 特殊效果: e.g., '穿甲'
 
@@ -38,11 +54,42 @@ class Action:
             'aoe_range': self.aoe_range,
             'projectile_to_spawn': self.projectile_to_spawn,
             'ammo': self.ammo,
+            'dice_vector': list(self.dice_vector),  # 列表: 经过 JSON 往返后仍能与模板比对
         }
 
+    @classmethod
+    def register_template(cls, action):
+        """[v_FLYWEIGHT] 将数据库中的动作注册为共享模板 (并缓存其序列化形式用于比对)。"""
+        key = (action.name, action.action_type, action.cost, action.dice)
+        bucket = cls._templates.setdefault(key, [])
+        if not any(t is action for t, _ in bucket):
+            bucket.append((action, action.to_dict()))
+        return action
+
+    @classmethod
+    def iter_templates(cls):
+        """遍历所有已注册的动作模板。"""
+        for bucket in cls._templates.values():
+            for template, _ in bucket:
+                yield template
+
+    @classmethod
+    def find_template(cls, data):
+        """查找与序列化数据完全一致的已注册模板，找不到返回 None。"""
+        bucket = cls._templates.get((data['name'], data['action_type'], data['cost'], data['dice']))
+        if bucket:
+            for template, template_data in bucket:
+                if template_data == data:
+                    return template
+        return None
+
     @classmethod
     def from_dict(cls, data):
-        """从字典创建Action对象, 包含向后兼容逻辑。"""
+        """从字典创建Action对象, 包含向后兼容逻辑。与已注册模板一致时直接复用模板。"""
+        template = cls.find_template(data)
+        if template is not None:
+            return template
+
         action_style = data.get('action_style', 'direct')
         # 兼容旧的/来自效果的 'action_style'
         if data.get('effects', {}).get('action_style') == 'curved':
@@ -59,6 +106,7 @@ class Action:
             aoe_range=data.get('aoe_range', 0),
             projectile_to_spawn=data.get('projectile_to_spawn', None),
             ammo=data.get('ammo', 0),
+            dice_vector=data.get('dice_vector'),
         )
 
 
@@ -66,8 +114,16 @@ class Part:
     """
     定义一个机甲部件 (如核心、手臂、背包)。
     它包含该部件的属性和它可以执行的 Action 列表。
+
+    [v_FLYWEIGHT] 数据库中的部件是共享模板。对局中的部件由 instantiate() 创建，
+    与模板共享 actions / tags 列表，只有 status 是实例自己的状态。
     """
 
+    __slots__ = ('name', 'armor', 'structure', 'parry', 'evasion', 'electronics', 'adjust_move',
+                 'actions', 'status', 'tags', 'image_url')
+
+    _templates = {}  # {部件名称: (Part, 序列化形式)}
+
     def __init__(self, name, armor, structure, parry=0, evasion=0, electronics=0, adjust_move=0, actions=None,
                  status='ok', tags=None, image_url=None):
         self.name = name  # 部件名称
@@ -98,9 +154,61 @@ class Part:
             'image_url': self.image_url,
         }
 
+    @classmethod
+    def register_template(cls, part):
+        """[v_FLYWEIGHT] 将数据库中的部件 (及其动作) 注册为共享模板 (并缓存其序列化形式用于比对)。"""
+        cls._templates[part.name] = (part, part.instantiate().to_dict())
+        for action in part.actions:
+            Action.register_template(action)
+        return part
+
+    @classmethod
+    def get_template(cls, name):
+        """按名称获取已注册的部件模板，未注册返回 None。"""
+        entry = cls._templates.get(name)
+        return entry[0] if entry is not None else None
+
+    @classmethod
+    def template_names(cls):
+        """所有已注册的部件模板名称。"""
+        return list(cls._templates)
+
+    def matches_template(self):
+        """[v_CODEC] 本部件是否是同名模板的实例 (除 status 外全部一致，动作列表与模板共享)。"""
+        template = self.get_template(self.name)
+        return (template is not None and self.actions is template.actions
+                and self.armor == template.armor and self.structure == template.structure
+                and self.parry == template.parry and self.evasion == template.evasion
+                and self.electronics == template.electronics and self.adjust_move == template.adjust_move
+                and self.tags == template.tags and self.image_url == template.image_url)
+
+    def instantiate(self, status='ok'):
+        """从模板创建一个对局中的部件实例 (共享动作和标签，不做深拷贝)。"""
+        return Part(
+            name=self.name,
+            armor=self.armor,
+            structure=self.structure,
+            parry=self.parry,
+            evasion=self.evasion,
+            electronics=self.electronics,
+            adjust_move=self.adjust_move,
+            actions=self.actions,
+            status=status,
+            tags=self.tags,
+            image_url=self.image_url
+        )
+
     @classmethod
     def from_dict(cls, data):
-        """从字典创建Part对象，并重建其Action列表。"""
+        """从字典创建Part对象，并重建其Action列表。与数据库模板一致时只创建轻量实例。"""
+        entry = cls._templates.get(data['name'])
+        if entry is not None:
+            template, template_data = entry
+            status = data.get('status', 'ok')
+            # 模板缓存的是 status='ok' 的序列化形式，其余字段必须完全一致
+            if (data if status == 'ok' else {**data, 'status': 'ok'}) == template_data:
+                return template.instantiate(status)
+
         actions_data = data.get('actions', [])
         actions = [Action.from_dict(a_data) for a_data in actions_data]
 
@@ -123,16 +231,24 @@ class GameEntity:
     """
     所有战斗单位 (机甲、抛射物、无人机) 的基类。
     提供共享的基础属性 (ID, 位置, 状态等)。
+    [v_SLOTS] 实体及其子类都使用 __slots__，新增运行时属性必须先在对应类的 __slots__ 中声明。
+    [v_BITBOARD] pos / status 是属性: 实体被放入 GameState.entities (EntityRegistry) 后，
+    赋值会同步更新该注册表的占据位棋盘和位置 / 类别索引 (_registry)。
+    [v_ZOBRIST] pos / orientation / status 同时增量更新注册表的局面哈希 (见 zobrist.py)。
     """
 
+    __slots__ = ('id', 'entity_type', 'controller', '_pos', '_orientation', 'name', '_status',
+                 'controller_css', 'last_pos', '_registry')
+
     def __init__(self, id, entity_type, controller, pos, orientation, name, status='ok'):
+        self._registry = None  # 所属的 EntityRegistry (放入 GameState.entities 时挂接)
         self.id = id  # 唯一ID (e.g., 'player_1')
         self.entity_type = entity_type  # 'mech', 'projectile', 'drone'
         self.controller = controller  # 'player' or 'ai'
-        self.pos = pos  # 坐标元组 (x, y)
-        self.orientation = orientation  # 'N', 'E', 'S', 'W', 'NONE'
+        self._pos = pos  # 坐标元组 (x, y)
+        self._orientation = orientation  # 'N', 'E', 'S', 'W', 'NONE'
         self.name = name  # 显示名称
-        self.status = status  # 'ok' or 'destroyed'
+        self._status = status  # 'ok' or 'destroyed'
 
         # 用于前端渲染的 CSS 类名
         if self.controller == 'player':
@@ -144,6 +260,74 @@ class GameEntity:
 
         self.last_pos = None  # 用于前端动画
 
+    @property
+    def pos(self):
+        return self._pos
+
+    @pos.setter
+    def pos(self, value):
+        old_pos = self._pos
+        self._pos = value
+        if self._registry is not None:
+            self._rehash('pos', old_pos, value)
+            if self._status != 'destroyed':
+                self._registry._moved(self, old_pos, value)
+
+    @property
+    def orientation(self):
+        return self._orientation
+
+    @orientation.setter
+    def orientation(self, value):
+        old = self._orientation
+        self._orientation = value
+        self._rehash('ori', old, value)
+
+    @property
+    def status(self):
+        return self._status
+
+    @status.setter
+    def status(self, value):
+        old = self._status
+        self._status = value
+        if self._registry is not None:
+            self._rehash('status', old, value)
+            was_alive = old != 'destroyed'
+            if was_alive != (value != 'destroyed'):
+                self._registry._status_changed(self, not was_alive)
+
+    # --- [v_ZOBRIST] 局面哈希 ---
+
+    def _zobrist_features(self):
+        """参与局面哈希的 (类别, 取值)。子类追加自己的回合状态。"""
+        return (('pos', self._pos), ('ori', self._orientation), ('status', self._status))
+
+    def zobrist(self):
+        """本实体对局面哈希的贡献 (挂接/解除注册表时整体异或进/出)。"""
+        h = 0
+        for feature, value in self._zobrist_features():
+            h ^= zobrist_key(feature, self.id, value)
+        return h
+
+    def _rehash(self, feature, old, new):
+        """属性从 old 变为 new: 增量更新所属注册表的局面哈希。"""
+        registry = self._registry
+        if registry is not None and old != new:
+            registry.zobrist ^= zobrist_key(feature, self.id, old) ^ zobrist_key(feature, self.id, new)
+
+    def __getstate__(self):
+        # copy / pickle 出的副本不挂接任何注册表 (否则 deepcopy 会连带复制整个 entities)
+        _, slots = super().__getstate__()
+        slots.pop('_registry', None)
+        return None, slots
+
+    def __setstate__(self, state):
+        _, slots = state
+        self._registry = None
+        for name, value in slots.items():
+            setattr(self, name, value)
+
     def to_dict(self):
         """序列化基础实体数据。"""
         return {
@@ -210,9 +394,16 @@ class GameEntity:
 class Pilot:
     """
     定义一个驾驶员及其属性 (如链接值和速度)。
+    [v_FLYWEIGHT] speed_stats / skills 在对局中只读，实例之间共享；只有 link_points 是可变状态。
+    [v_SEARCH] planner: Ace 规划器配置 (None 为启发式规划器)，
+    例如 {'mode': 'expectiminimax', 'budget_ms': 50, 'max_depth': 3}，见 ace_search.py。
     """
 
-    def __init__(self, name, link_points=5, speed_stats=None, skills=None):
+    __slots__ = ('name', 'link_points', 'speed_stats', 'skills', 'planner')
+
+    _templates = {}  # {驾驶员名称: Pilot}
+
+    def __init__(self, name, link_points=5, speed_stats=None, skills=None, planner=None):
         self.name = name
         self.link_points = link_points  # 用于专注重投
 
@@ -225,6 +416,7 @@ class Pilot:
         else:
             self.speed_stats = speed_stats
         self.skills = skills if skills is not None else []  # 未来的技能系统
+        self.planner = planner  # Ace 规划器配置 (只读，实例之间共享)
 
     def to_dict(self):
         """将Pilot对象序列化为字典。"""
@@ -233,14 +425,53 @@ class Pilot:
             'link_points': self.link_points,
             'speed_stats': self.speed_stats,
             'skills': self.skills,
+            'planner': self.planner,
         }
 
+    @classmethod
+    def register_template(cls, pilot):
+        """[v_FLYWEIGHT] 将数据库中的驾驶员注册为共享模板。"""
+        cls._templates[pilot.name] = pilot
+        return pilot
+
+    @classmethod
+    def get_template(cls, name):
+        """按名称获取已注册的驾驶员模板，未注册返回 None。"""
+        return cls._templates.get(name)
+
+    @classmethod
+    def template_names(cls):
+        """所有已注册的驾驶员模板名称。"""
+        return list(cls._templates)
+
+    def matches_template(self):
+        """[v_CODEC] 本驾驶员是否是同名模板的实例 (除 link_points 外全部一致)。"""
+        template = self._templates.get(self.name)
+        return (template is not None and self.speed_stats == template.speed_stats
+                and self.skills == template.skills and self.planner == template.planner)
+
+    def instantiate(self, link_points=None):
+        """从模板创建一个对局中的驾驶员实例 (共享速度属性和技能)。"""
+        return Pilot(
+            name=self.name,
+            link_points=self.link_points if link_points is None else link_points,
+            speed_stats=self.speed_stats,
+            skills=self.skills,
+            planner=self.planner
+        )
+
     @classmethod
     def from_dict(cls, data):
         """从字典创建Pilot对象。"""
         if not data:
             return None
 
+        template = cls._templates.get(data.get('name'))
+        if (template is not None and template.speed_stats == data.get('speed_stats')
+                and template.skills == data.get('skills', [])
+                and template.planner == data.get('planner', template.planner)):
+            return template.instantiate(data.get('link_points', 5))
+
         default_speeds = {
             '快速': 5, '近战': 5, '抛射': 5,
             '射击': 5, '移动': 5, '战术': 5
@@ -250,16 +481,71 @@ class Pilot:
             name=data.get('name', '未知驾驶员'),
             link_points=data.get('link_points', 5),
             speed_stats=data.get('speed_stats', default_speeds),
-            skills=data.get('skills', [])
+            skills=data.get('skills', []),
+            planner=data.get('planner')
         )
 
 
+class ActionIndex:
+    """
+    [v_INDEX] 一台机甲当前可用动作的只读索引。
+
+    由 Mech._get_action_index() 惰性构建，部件状态 (或部件本身) 变化时整体重建。
+    顺序与旧的 get_all_actions() 完全一致: 先按槽位遍历部件动作，再追加已解锁的通用动作。
+    """
+
+    __slots__ = ('signature', 'all_actions', 'by_type', 'by_slot_name', 'by_effect', 'passive_effects')
+
+    def __init__(self, parts, signature):
+        # [重要] 局部导入以避免循环依赖
+        # 此文件位于 game_logic/，它需要从 game_logic/database/ 导入
+        try:
+            from .database import GENERIC_ACTIONS
+        except ImportError:
+            GENERIC_ACTIONS = {}  # 安全后备
+
+        self.signature = signature
+        all_actions = []
+        # 1. 收集所有来自部件的动作
+        for part_slot, part in parts.items():
+            if part and part.status != 'destroyed':
+                for action in part.actions:
+                    all_actions.append((action, part_slot))
+
+        # 2. 检查并添加通用动作 (如 '拳打脚踢')：任一所需槽位的部件未摧毁即解锁
+        for generic_action, required_slots in GENERIC_ACTIONS.items():
+            for slot in required_slots:
+                part = parts.get(slot)
+                if part and part.status != 'destroyed':
+                    all_actions.append((generic_action, 'generic'))
+                    break
+
+        self.all_actions = tuple(all_actions)
+        self.by_type = {}  # {action_type: [(Action, slot), ...]}
+        self.by_slot_name = {}  # {(slot, name): Action}，同名时保留第一个
+        self.by_effect = {}  # {effect_key: [(Action, slot), ...]}
+        self.passive_effects = []  # 被动动作的 effects 字典
+        for entry in self.all_actions:
+            action, part_slot = entry
+            self.by_type.setdefault(action.action_type, []).append(entry)
+            self.by_slot_name.setdefault((part_slot, action.name), action)
+            if action.effects:
+                for effect_key in action.effects:
+                    self.by_effect.setdefault(effect_key, []).append(entry)
+                if action.action_type == '被动':
+                    self.passive_effects.append(action.effects)
+
+
 class Mech(GameEntity):
     """
     定义一台完整的机甲。继承自 GameEntity。
     管理部件 (Parts)、驾驶员 (Pilot) 和回合制状态 (AP/TP, 姿态等)。
     """
 
+    __slots__ = ('parts', 'pilot', '_stance', '_player_ap', '_player_tp', 'turn_phase', 'timing',
+                 'opening_move_taken', 'actions_used_this_turn', 'pending_combat', 'has_acted_early',
+                 'cached_ace_plan', 'last_ai_pos', '_action_index', '_parts_zobrist')
+
     def __init__(self, id, controller, pos, orientation, name, core, legs, left_arm, right_arm, backpack, pilot=None):
         super().__init__(id, 'mech', controller, pos, orientation, name)
 
@@ -274,9 +560,10 @@ class Mech(GameEntity):
         self.pilot = pilot  # 关联的驾驶员
 
         # --- 回合制状态 ---
-        self.stance = 'defense'  # 'defense', 'agile', 'attack', 'downed'
-        self.player_ap = 2  # 行动时点
-        self.player_tp = 1  # 调整时点
+        # [v_ZOBRIST] stance / player_ap / player_tp 是属性，赋值时增量更新局面哈希
+        self._stance = 'defense'  # 'defense', 'agile', 'attack', 'downed'
+        self._player_ap = 2  # 行动时点
+        self._player_tp = 1  # 调整时点
         self.turn_phase = 'timing'  # 'timing', 'stance', 'adjustment', 'main'
         self.timing = None  # '近战', '射击', '移动'
         self.opening_move_taken = False  # 是否已执行起手动作
@@ -288,8 +575,65 @@ class Mech(GameEntity):
 
         # [NEW] 标记：Ace AI 是否在本回合已经抢先行动过
         self.has_acted_early = False
+
+        # [v_PLAN_CACHE] 抢先手预判时算好的 Ace 方案 (CombatPlan.to_dict() + 局面键)，随 session 保存
+        self.cached_ace_plan: dict | None = None
+        # AI 运行时缓存 (不序列化): 上一次的 AI 位置
+        self.last_ai_pos = None
+        self._action_index = None  # [v_INDEX] 惰性构建的 ActionIndex
+        self._parts_zobrist = None  # [v_ZOBRIST] (部件签名, 部件状态哈希)
         # ---
 
+    @property
+    def stance(self):
+        return self._stance
+
+    @stance.setter
+    def stance(self, value):
+        old = self._stance
+        self._stance = value
+        self._rehash('stance', old, value)
+
+    @property
+    def player_ap(self):
+        return self._player_ap
+
+    @player_ap.setter
+    def player_ap(self, value):
+        old = self._player_ap
+        self._player_ap = value
+        self._rehash('ap', old, value)
+
+    @property
+    def player_tp(self):
+        return self._player_tp
+
+    @player_tp.setter
+    def player_tp(self, value):
+        old = self._player_tp
+        self._player_tp = value
+        self._rehash('tp', old, value)
+
+    def _zobrist_features(self):
+        return super()._zobrist_features() + (
+            ('stance', self._stance), ('ap', self._player_ap), ('tp', self._player_tp))
+
+    def parts_zobrist(self):
+        """
+        [v_ZOBRIST] 部件状态对局面哈希的贡献。
+        部件状态在结算中到处被直接赋值，因此不做属性钩子，而是像 ActionIndex 一样
+        按 (部件对象, 状态) 签名缓存: 部件被摧毁/修复/弃置替换后自动重算。
+        """
+        signature = tuple([(part, part.status) if part else None for part in self.parts.values()])
+        cached = self._parts_zobrist
+        if cached is None or cached[0] != signature:
+            h = 0
+            for slot, part in self.parts.items():
+                if part:
+                    h ^= zobrist_key('part', self.id, (slot, part.name, part.status))
+            cached = self._parts_zobrist = (signature, h)
+        return cached[1]
+
     def get_total_evasion(self):
         """计算机甲所有未摧毁部件的总回避值。"""
         return sum(part.evasion for part in self.parts.values() if part and part.status != 'destroyed')
@@ -298,78 +642,40 @@ class Mech(GameEntity):
         """计算机甲所有未摧毁部件的总电子值。"""
         return sum(part.electronics for part in self.parts.values() if part and part.status != 'destroyed')
 
+    def _get_action_index(self):
+        """
+        [v_INDEX] 获取 (必要时重建) 动作索引。
+        签名为各槽位的 (部件对象, 状态)：部件被摧毁/修复/弃置替换后自动失效。
+        """
+        signature = tuple([(part, part.status) if part else None for part in self.parts.values()])
+        if self._action_index is None or self._action_index.signature != signature:
+            self._action_index = ActionIndex(self.parts, signature)
+        return self._action_index
+
     def get_all_actions(self):
         """
         获取所有可用动作（来自部件和通用动作）及其所属的部件槽位。
         返回: [(Action, part_slot), ...]
         """
-        # [重要] 局部导入以避免循环依赖
-        # 此文件位于 game_logic/，它需要从 game_logic/database/ 导入
-        try:
-            from .database import GENERIC_ACTIONS
-        except ImportError:
-            GENERIC_ACTIONS = {}  # 安全后备
-
-        all_actions = []
-        # 1. 收集所有来自部件的动作
-        for part_slot, part in self.parts.items():
-            if part and part.status != 'destroyed':
-                for action in part.actions:
-                    all_actions.append((action, part_slot))
+        return list(self._get_action_index().all_actions)
 
-        # 2. 检查并添加通用动作 (如 '拳打脚踢')
-        if GENERIC_ACTIONS:
-            for generic_action, required_slots in GENERIC_ACTIONS.items():
-                is_unlocked = False
-                for slot in required_slots:
-                    part = self.parts.get(slot)
-                    if part and part.status != 'destroyed':
-                        is_unlocked = True
-                        break  # 找到一个未摧毁的部件就解锁
-                if is_unlocked:
-                    all_actions.append((generic_action, 'generic'))
+    def get_actions_by_type(self, action_type):
+        """[v_INDEX] 获取指定类型的全部可用动作。返回: [(Action, part_slot), ...] (只读)"""
+        return self._get_action_index().by_type.get(action_type, ())
 
-        return all_actions
+    def get_actions_with_effect(self, effect_key):
+        """[v_INDEX] 获取 effects 中带有指定键的全部可用动作。返回: [(Action, part_slot), ...] (只读)"""
+        return self._get_action_index().by_effect.get(effect_key, ())
 
     def get_action_by_name_and_slot(self, action_name, part_slot):
         """通过名称和槽位获取一个动作对象。"""
-
-        # 检查 'generic' (通用) 槽位
-        if part_slot == 'generic':
-            # [重要] 局部导入以避免循环依赖
-            try:
-                from .database import GENERIC_ACTIONS
-            except ImportError:
-                GENERIC_ACTIONS = {}  # 安全后备
-
-            if GENERIC_ACTIONS:
-                for generic_action, required_slots in GENERIC_ACTIONS.items():
-                    if generic_action.name == action_name:
-                        # 再次验证机甲是否真的有权限
-                        is_unlocked = False
-                        for slot in required_slots:
-                            part = self.parts.get(slot)
-                            if part and part.status != 'destroyed':
-                                is_unlocked = True
-                                break
-                        if is_unlocked:
-                            return generic_action
-            return None
-
-        # 检查特定部件槽位
-        part = self.parts.get(part_slot)
-        if part and part.status != 'destroyed':
-            for action in part.actions:
-                if action.name == action_name:
-                    return action
-        return None
+        # 'generic' (通用) 槽位只有在解锁时才会出现在索引中
+        return self._get_action_index().by_slot_name.get((part_slot, action_name))
 
     def get_action_by_timing(self, timing_type):
         """获取第一个匹配该时机类型的可用动作。"""
-        for action, part_slot in self.get_all_actions():
-            if action.action_type == timing_type:
-                return action, part_slot
-        return None, None
+        actions = self._get_action_index().by_type.get(timing_type)
+        return actions[0] if actions else (None, None)
 
     def get_part_by_name(self, name_or_slot):
         """根据部件的显示名称或其槽位名获取部件对象。"""
@@ -382,10 +688,7 @@ class Mech(GameEntity):
 
     def has_melee_action(self):
         """检查机甲是否有可用的近战动作。"""
-        for action, part_slot in self.get_all_actions():
-            if action.action_type == '近战':
-                return True
-        return False
+        return '近战' in self._get_action_index().by_type
 
     def get_active_parts_count(self):
         """计算未被摧毁的部件数量。"""
@@ -393,19 +696,12 @@ class Mech(GameEntity):
 
     def get_passive_effects(self):
         """收集机甲所有未摧毁部件上的所有被动动作的效果。"""
-        passive_effects = []
-        for action, part_slot in self.get_all_actions():
-            if action.action_type == '被动' and action.effects:
-                passive_effects.append(action.effects)
-        return passive_effects
+        return list(self._get_action_index().passive_effects)
 
     def get_interceptor_actions(self):
         """获取所有可用的拦截器动作（被动，带拦截效果）。"""
-        interceptor_actions = []
-        for action, part_slot in self.get_all_actions():
-            if action.action_type == '被动' and action.effects and 'interceptor' in action.effects:
-                interceptor_actions.append((action, part_slot))
-        return interceptor_actions
+        return [(action, part_slot) for action, part_slot in self.get_actions_with_effect('interceptor')
+                if action.action_type == '被动']
 
     def to_dict(self):
         """将 Mech 对象转换为 JSON 安全的字典，递归转换 Action、Part 等自定义类。"""
@@ -440,6 +736,8 @@ class Mech(GameEntity):
             "pending_combat": make_json_safe(self.pending_combat),
             # [NEW] 序列化抢先行动状态
             "has_acted_early": self.has_acted_early,
+            # [v_PLAN_CACHE] 序列化预设的 Ace 方案
+            "cached_ace_plan": make_json_safe(self.cached_ace_plan),
         })
         return base_dict
 
@@ -481,9 +779,12 @@ class Mech(GameEntity):
         # [核心修复] 确保在从 session 加载时恢复 pending_combat 状态
         mech.pending_combat = data.get('pending_combat', None)
         mech.last_pos = data.get('last_pos', None)
+        # [修复] 恢复实体状态 (之前被摧毁的机甲在 session 往返后会变回 'ok')
+        mech.status = data.get('status', 'ok')
 
         # [NEW] 恢复抢先行动状态
         mech.has_acted_early = data.get('has_acted_early', False)
+        mech.cached_ace_plan = data.get('cached_ace_plan', None)
 
         mech.controller_css = data.get('controller_css', 'neutral')
         if mech.controller == 'player':
@@ -498,11 +799,18 @@ class Projectile(GameEntity):
     """
     抛射物实体 (例如，导弹)。
     它有简化的属性，只有一个 'core' 部件代表其生命值。
+    [v_FLYWEIGHT] template_key 指向 PROJECTILE_TEMPLATES，同一模板的抛射物共享同一个动作列表。
     """
 
+    __slots__ = ('template_key', 'evasion', 'stance', 'life_span', 'electronics', 'move_range',
+                 'has_acted', 'is_active', 'parts')
+
+    _template_actions = {}  # {PROJECTILE_TEMPLATES 键: [Action, ...]}
+
     def __init__(self, id, controller, pos, name, evasion, stance, actions, life_span,
-                 electronics=0, move_range=0):
+                 electronics=0, move_range=0, template_key=None):
         super().__init__(id, 'projectile', controller, pos, 'NONE', name)  # 抛射物没有朝向
+        self.template_key = template_key
 
         self.evasion = evasion  # 固定的闪避值
         self.stance = stance  # 通常是 'agile'
@@ -512,12 +820,25 @@ class Projectile(GameEntity):
 
         # [NEW] 本回合是否已经行动过的标志
         self.has_acted = False
+        self.is_active = False  # 延迟动作是否已激活 (抛射阶段设置，不序列化)
 
         # 抛射物只有一个 'core' 部件，代表它的 HP (通常 structure=1)
         self.parts = {
             'core': Part(name=f"{name} 核心", armor=0, structure=1, actions=actions, electronics=electronics)
         }
 
+    @classmethod
+    def register_template(cls, template_key, template):
+        """[v_FLYWEIGHT] 为抛射物模板构建一次共享的动作列表。"""
+        actions = [Action.register_template(Action.from_dict(a)) for a in template.get('actions', [])]
+        cls._template_actions[template_key] = actions
+        return actions
+
+    @classmethod
+    def get_template_actions(cls, template_key):
+        """获取抛射物模板的共享动作列表，未注册返回 None。"""
+        return cls._template_actions.get(template_key)
+
     def get_total_evasion(self):
         """抛射物有固定的闪避值。"""
         return self.evasion if self.status == 'ok' else 0
@@ -562,6 +883,7 @@ class Projectile(GameEntity):
             'electronics': self.electronics,
             'move_range': self.move_range,
             'has_acted': self.has_acted,  # [NEW] 序列化
+            'template_key': self.template_key,
         })
         return base_dict
 
@@ -569,8 +891,12 @@ class Projectile(GameEntity):
     def from_dict(cls, data):
         """从字典重建抛射物。"""
         core_part_data = data.get('parts', {}).get('core')
-        core_part = Part.from_dict(core_part_data) if core_part_data else None
-        actions = core_part.actions if core_part else []
+        template_key = data.get('template_key')
+        actions = cls.get_template_actions(template_key)
+        if actions is None:
+            # 旧存档 / 未注册的模板：从序列化数据重建动作
+            core_part = Part.from_dict(core_part_data) if core_part_data else None
+            actions = core_part.actions if core_part else []
 
         projectile = cls(
             id=data.get('id', f"proj_{random.randint(0, 999)}"),
@@ -582,7 +908,8 @@ class Projectile(GameEntity):
             actions=actions,
             life_span=data.get('life_span', 1),
             electronics=data.get('electronics', 0),
-            move_range=data.get('move_range', 0)
+            move_range=data.get('move_range', 0),
+            template_key=template_key
         )
         projectile.last_pos = data.get('last_pos', None)
         projectile.status = data.get('status', 'ok')
@@ -595,7 +922,7 @@ class Projectile(GameEntity):
         # [NEW] 反序列化
         projectile.has_acted = data.get('has_acted', False)
 
-        if core_part:
+        if core_part_data:
             projectile.parts['core'].status = core_part_data.get('status', 'ok')
 
         return projectile
@@ -606,6 +933,8 @@ class Drone(GameEntity):
     无人机实体 (目前是一个骨架，未来可以扩展)。
     """
 
+    __slots__ = ()
+
     def __init__(self, id, controller, pos, orientation, name):
         super().__init__(id, 'drone', controller, pos, orientation, name)
         # TODO: 添加无人机特有的属性 (例如 部件, HP, 动作)
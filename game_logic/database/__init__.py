@@ -32,6 +32,20 @@ BACKPACKS = {**PLAYER_BACKPACKS, **AI_ONLY_BACKPACKS}
 
 ALL_PARTS = {**CORES, **LEGS, **LEFT_ARMS, **RIGHT_ARMS, **BACKPACKS}
 
+# [v_FLYWEIGHT] 注册共享模板
+#    对局中的部件 / 驾驶员 / 抛射物动作都引用这里的只读对象，
+#    反序列化时与模板一致的数据不会再重建 Action / Part。
+from ..data_models import Action as _Action, Part as _Part, Pilot as _Pilot, Projectile as _Projectile
+
+for _part in ALL_PARTS.values():
+    _Part.register_template(_part)
+for _generic_action in GENERIC_ACTIONS:
+    _Action.register_template(_generic_action)
+for _pilot in (*PLAYER_PILOTS.values(), *AI_PILOTS.values()):
+    _Pilot.register_template(_pilot)
+for _key, _template in PROJECTILE_TEMPLATES.items():
+    _Projectile.register_template(_key, _template)
+
 # 3. 定义此包的 "公共 API"
 #    只有在这里列出的变量才能被 `import *` 导入
 __all__ = [
@@ -21,7 +21,9 @@ PILOT_RAVEN = Pilot(
         '快速': 3, '近战': 2, '抛射': 7,
         '射击': 4, '移动': 6, '战术': 6
     },
-    skills=["pursuit"]  # pursuit = 乘胜追击
+    skills=["pursuit"],  # pursuit = 乘胜追击
+    # [NEW] 使用有时间预算的 Expectiminimax 搜索规划器 (见 ace_search.py)
+    planner={'mode': 'expectiminimax', 'budget_ms': 50, 'max_depth': 3}
 )
 
 PLAYER_PILOTS = {
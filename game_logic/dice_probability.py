@@ -0,0 +1,211 @@
+"""
+[NEW] 骰池精确概率分布。
+
+基于 dice_roller.DICE_FACES 逐面卷积，计算一次攻击在防御抵消后
+净[轻击]/净[重击]的完整概率分布，结果按骰池签名缓存。
+用于 AI 评估等需要在微秒级拿到精确期望值、而不能跑蒙特卡洛的场景。
+
+抵消规则与 combat_system 的结算保持一致:
+  1. [防御] 抵消 [轻击]
+  2. [闪避] 先抵消 [重击]，剩余的 [闪避] 再抵消 [轻击]
+"""
+import re
+from functools import lru_cache
+from types import MappingProxyType
+
+from .dice_roller import FACES_PER_DIE, RESULT_INDEX, get_face_slot_table
+
+_LIGHT = RESULT_INDEX['light_hit']
+_HEAVY = RESULT_INDEX['heavy_hit']
+_DEFENSE = RESULT_INDEX['defense']
+_EVASION = RESULT_INDEX['evasion']
+
+_POOL_PATTERNS = {
+    'yellow': re.compile(r'(\d+)\s*黄'),
+    'red': re.compile(r'(\d+)\s*红'),
+    'white': re.compile(r'(\d+)\s*白'),
+    'blue': re.compile(r'(\d+)\s*蓝'),
+}
+
+
+@lru_cache(maxsize=256)
+def parse_dice_pool(dice_str):
+    """
+    解析 "2黄4红" / "3白2蓝" 形式的骰池字符串，返回 (黄, 红, 白, 蓝) 四元组。
+    [v_DICE_VECTOR] 这是唯一的骰池解析入口 (Action.dice_vector 在加载时由它计算)；结果按字符串缓存。
+    """
+    if not dice_str:
+        return 0, 0, 0, 0
+    counts = []
+    for color in ('yellow', 'red', 'white', 'blue'):
+        match = _POOL_PATTERNS[color].search(dice_str)
+        counts.append(int(match.group(1)) if match else 0)
+    return tuple(counts)
+
+
+def _single_die_counts(color, stance, convert_lightning_to_crit, first_slot, second_slot):
+    """
+    单颗骰子的结果计数分布 (权重为面数, 总和为 8)。
+    返回 {(first, second): 面数}，first/second 为两个关注的结果类别的数量。
+    """
+    table = get_face_slot_table(color, stance, convert_lightning_to_crit)
+    counts = {}
+    for slots in table:
+        key = (slots.count(first_slot), slots.count(second_slot))
+        counts[key] = counts.get(key, 0) + 1
+    return counts
+
+
+def _convolve(dist_a, dist_b):
+    """二维计数分布卷积。"""
+    result = {}
+    for (a1, a2), wa in dist_a.items():
+        for (b1, b2), wb in dist_b.items():
+            key = (a1 + b1, a2 + b2)
+            result[key] = result.get(key, 0) + wa * wb
+    return result
+
+
+def _pool_counts(dice_by_color, stance, convert_lightning_to_crit, first_slot, second_slot):
+    """按颜色依次卷积整个骰池，返回整数权重分布 (总权重为 8^骰子数)。"""
+    dist = {(0, 0): 1}
+    for color, count in dice_by_color:
+        if count <= 0:
+            continue
+        die = _single_die_counts(color, stance, convert_lightning_to_crit, first_slot, second_slot)
+        for _ in range(count):
+            dist = _convolve(dist, die)
+    return dist
+
+
+@lru_cache(maxsize=None)
+def _attack_pool_counts(yellow, red, stance, convert_lightning_to_crit):
+    return _pool_counts((('yellow', yellow), ('red', red)), stance, convert_lightning_to_crit, _LIGHT, _HEAVY)
+
+
+@lru_cache(maxsize=None)
+def _defense_pool_counts(white, blue, stance):
+    return _pool_counts((('white', white), ('blue', blue)), stance, False, _DEFENSE, _EVASION)
+
+
+def _normalize_stance(stance, default):
+    # 骰面解析只区分 'attack' / 'defense' / 其他，归一化后可以让缓存命中率最大化
+    stance = stance or default
+    return stance if stance in ('attack', 'defense') else 'other'
+
+
+def _to_probabilities(counts, total_dice):
+    total = FACES_PER_DIE ** total_dice
+    return MappingProxyType({key: weight / total for key, weight in sorted(counts.items())})
+
+
+def attack_pool_distribution(yellow, red, stance='attack', convert_lightning_to_crit=False):
+    """
+    攻击骰池 (未经防御抵消) 的 (轻击, 重击) 分布。
+
+    Returns:
+        MappingProxyType: {(轻击数, 重击数): 概率}
+    """
+    stance = _normalize_stance(stance, 'attack')
+    return _attack_distribution_cached(yellow, red, stance, bool(convert_lightning_to_crit))
+
+
+@lru_cache(maxsize=None)
+def _attack_distribution_cached(yellow, red, stance, convert_lightning_to_crit):
+    return _to_probabilities(_attack_pool_counts(yellow, red, stance, convert_lightning_to_crit), yellow + red)
+
+
+def defense_pool_distribution(white, blue, stance='defense'):
+    """
+    防御骰池的 (防御, 闪避) 分布。
+
+    Returns:
+        MappingProxyType: {(防御数, 闪避数): 概率}
+    """
+    stance = _normalize_stance(stance, 'defense')
+    return _defense_distribution_cached(white, blue, stance)
+
+
+@lru_cache(maxsize=None)
+def _defense_distribution_cached(white, blue, stance):
+    return _to_probabilities(_defense_pool_counts(white, blue, stance), white + blue)
+
+
+def net_damage_distribution(yellow, red, white=0, blue=0, attack_stance='attack', defense_stance='defense',
+                            convert_lightning_to_crit=False):
+    """
+    完整的净伤害分布: 攻击骰池对防御骰池，按结算规则抵消后的 (净轻击, 净重击)。
+
+    Args:
+        yellow, red (int): 攻击方黄/红骰数量
+        white, blue (int): 防御方白/蓝骰数量
+        attack_stance (str): 攻击方姿态 (决定空心轻击/空心重击是否生效)
+        defense_stance (str): 防御方姿态 (决定空心防御是否生效)
+        convert_lightning_to_crit (bool): 是否激活【频闪武器】
+
+    Returns:
+        MappingProxyType: {(净轻击, 净重击): 概率}，按骰池签名缓存，请勿修改。
+    """
+    return _net_distribution_cached(
+        yellow, red, white, blue,
+        _normalize_stance(attack_stance, 'attack'),
+        _normalize_stance(defense_stance, 'defense'),
+        bool(convert_lightning_to_crit)
+    )
+
+
+@lru_cache(maxsize=None)
+def _net_distribution_cached(yellow, red, white, blue, attack_stance, defense_stance, convert_lightning_to_crit):
+    attack = _attack_pool_counts(yellow, red, attack_stance, convert_lightning_to_crit)
+    defense = _defense_pool_counts(white, blue, defense_stance)
+    net = {}
+    for (hits, crits), wa in attack.items():
+        for (defenses, dodges), wd in defense.items():
+            net_hits = max(0, hits - defenses)
+            cancelled_crits = min(crits, dodges)
+            net_crits = crits - cancelled_crits
+            net_hits = max(0, net_hits - (dodges - cancelled_crits))
+            key = (net_hits, net_crits)
+            net[key] = net.get(key, 0) + wa * wd
+    return _to_probabilities(net, yellow + red + white + blue)
+
+
+def distribution_for_pool(attack_pool, defense_pool='', attack_stance='attack', defense_stance='defense',
+                          convert_lightning_to_crit=False):
+    """便捷入口: 直接接受 "2黄4红" / "3白2蓝" 形式的骰池字符串 (或四元组)。"""
+    if isinstance(attack_pool, str):
+        attack_pool = parse_dice_pool(attack_pool)
+    if isinstance(defense_pool, str):
+        defense_pool = parse_dice_pool(defense_pool)
+    yellow, red = attack_pool[0], attack_pool[1]
+    white, blue = (defense_pool[2], defense_pool[3]) if len(defense_pool) == 4 else tuple(defense_pool)
+    return net_damage_distribution(yellow, red, white, blue, attack_stance, defense_stance,
+                                   convert_lightning_to_crit)
+
+
+def expected_net_damage(yellow, red, white=0, blue=0, attack_stance='attack', defense_stance='defense',
+                        convert_lightning_to_crit=False):
+    """
+    返回 (净轻击期望, 净重击期望, 击穿概率)。
+    击穿概率即净轻击 + 净重击 > 0 的概率。
+    """
+    dist = net_damage_distribution(yellow, red, white, blue, attack_stance, defense_stance,
+                                   convert_lightning_to_crit)
+    ev_hits = ev_crits = p_penetration = 0.0
+    for (hits, crits), p in dist.items():
+        ev_hits += hits * p
+        ev_crits += crits * p
+        if hits + crits > 0:
+            p_penetration += p
+    return ev_hits, ev_crits, p_penetration
+
+
+@lru_cache(maxsize=None)
+def expected_attack_value(yellow, red, stance='attack', convert_lightning_to_crit=False,
+                          light_weight=1.0, heavy_weight=1.5):
+    """
+    攻击骰池 (无防御) 的加权期望值，AI 强度评估使用。
+    默认权重: 轻击 1.0，重击 1.5。
+    """
+    dist = attack_pool_distribution(yellow, red, stance, convert_lightning_to_crit)
+    return sum((hits * light_weight + crits * heavy_weight) * p for (hits, crits), p in dist.items())
@@ -1,4 +1,5 @@
 import random
+from array import array
 from collections import Counter
 
 # 定义每种颜色骰子的面
@@ -15,9 +16,9 @@ DICE_FACES = {
 BLACK_DIE_FACES = ['core', 'legs', 'left_arm', 'right_arm', 'backpack', 'any']
 
 
-def roll_black_die():
-    """投掷一个黑骰子（部位骰）并返回结果。"""
-    return random.choice(BLACK_DIE_FACES)
+def roll_black_die(rng=None):
+    """投掷一个黑骰子（部位骰）并返回结果。rng 为可选的 random.Random 实例 (如 GameState.rng.dice)。"""
+    return (rng or random).choice(BLACK_DIE_FACES)
 
 
 # 用于将骰面结果映射到中文名称
@@ -35,34 +36,143 @@ RESULT_MAP = {
 }
 
 
-def roll_dice(yellow_count=0, red_count=0, white_count=0, blue_count=0):
+# --- [NEW] 批量骰子引擎 ---
+# 所有颜色的骰子都恰好有 8 个面, 因此骰面可以统一编码为 0-7 的整数 (DICE_FACES 中的下标),
+# 一次批量投掷只需一次 getrandbits 调用, 再用 bytes.translate 截取低 3 位即可得到全部骰面。
+DICE_COLORS = ('yellow', 'red', 'white', 'blue')
+FACES_PER_DIE = 8
+_FACE_MASK = bytes(i & (FACES_PER_DIE - 1) for i in range(256))
+
+# 结果类别的整数编码 (处理后的汇总数组按此顺序排列)
+RESULT_KEYS = ('light_hit', 'heavy_hit', 'defense', 'evasion', 'hollow_light_hit',
+               'hollow_heavy_hit', 'hollow_defense', 'lightning', 'eye', 'blank')
+RESULT_INDEX = {key: i for i, key in enumerate(RESULT_KEYS)}
+NUM_RESULTS = len(RESULT_KEYS)
+RESULT_LABELS = tuple(RESULT_MAP[key] for key in RESULT_KEYS)
+
+# 每种颜色骰面 -> 首次出现的下标 (用于把原始字符串结果编码回整数)
+FACE_INDEX = {
+    color: {face: faces.index(face) for face in faces}
+    for color, faces in DICE_FACES.items()
+}
+
+
+def _resolve_face(face, stance, convert_lightning_to_crit):
+    """将单个骰面按姿态与【频闪武器】规则解析为结果类别的元组 (一颗骰子可能产生两个结果)。"""
+    if face == 'light_hit_2':
+        return ('light_hit', 'light_hit')
+    if face in ('light_hit', 'heavy_hit', 'defense', 'evasion', 'eye'):
+        return (face,)
+    if face == 'hollow_light_hit':
+        return ('light_hit',) if stance == 'attack' else ('hollow_light_hit',)
+    if face == 'hollow_heavy_hit':
+        return ('heavy_hit',) if stance == 'attack' else ('hollow_heavy_hit',)
+    if face == 'hollow_defense_2':
+        result = 'defense' if stance == 'defense' else 'hollow_defense'
+        return (result, result)
+    if face == 'lightning':
+        return ('heavy_hit',) if convert_lightning_to_crit else ('lightning',)
+    return ('blank',)
+
+
+_SLOT_TABLE_CACHE = {}
+
+
+def get_face_slot_table(color, stance='defense', convert_lightning_to_crit=False):
+    """
+    [NEW] 返回某颜色骰子在给定姿态/频闪设置下的查找表:
+    第 i 项为骰面 i 产生的结果类别下标元组 (下标对应 RESULT_KEYS)。
+    姿态只区分 'attack' / 'defense' / 其他, 因此表的数量是有限的。
+    """
+    stance_key = stance if stance in ('attack', 'defense') else 'other'
+    cache_key = (color, stance_key, bool(convert_lightning_to_crit))
+    table = _SLOT_TABLE_CACHE.get(cache_key)
+    if table is None:
+        table = tuple(
+            tuple(RESULT_INDEX[r] for r in _resolve_face(face, stance_key, convert_lightning_to_crit))
+            for face in DICE_FACES[color]
+        )
+        _SLOT_TABLE_CACHE[cache_key] = table
+    return table
+
+
+def roll_faces(count, rng=None):
+    """[NEW] 一次 RNG 调用投出 count 个骰面下标 (0-7), 返回 bytes。"""
+    if count <= 0:
+        return b''
+    rng = rng or random
+    return rng.getrandbits(8 * count).to_bytes(count, 'little').translate(_FACE_MASK)
+
+
+def roll_dice_batch(dice_specs, rng=None):
+    """
+    [NEW] 批量投掷。
+
+    Args:
+        dice_specs (list): 每项为 (黄, 红, 白, 蓝) 骰子数量的四元组。
+        rng: 可选的 random.Random 实例, 默认使用全局 random。
+
+    Returns:
+        array('B'): 所有骰面下标, 按规格顺序展开, 每个规格内依次为黄、红、白、蓝骰。
+    """
+    total = 0
+    for spec in dice_specs:
+        total += sum(spec)
+    return array('B', roll_faces(total, rng))
+
+
+def process_rolls_batch(dice_specs, faces, stance='defense', convert_lightning_to_crit=False):
+    """
+    [NEW] 将 roll_dice_batch 的骰面下标批量处理为结果计数。
+
+    Returns:
+        array('H'): 长度为 len(dice_specs) * NUM_RESULTS,
+                    第 i 个规格的计数位于 [i * NUM_RESULTS, (i + 1) * NUM_RESULTS)。
+    """
+    tables = [get_face_slot_table(color, stance, convert_lightning_to_crit) for color in DICE_COLORS]
+    summaries = array('H', bytes(2 * NUM_RESULTS * len(dice_specs)))
+    pos = 0
+    base = 0
+    for spec in dice_specs:
+        for table, count in zip(tables, spec):
+            for face in faces[pos:pos + count]:
+                for slot in table[face]:
+                    summaries[base + slot] += 1
+            pos += count
+        base += NUM_RESULTS
+    return summaries
+
+
+def roll_and_process_batch(dice_specs, stance='defense', convert_lightning_to_crit=False, rng=None):
+    """[NEW] 便捷函数: 批量投掷并处理, 返回 (faces, summaries)。"""
+    faces = roll_dice_batch(dice_specs, rng)
+    return faces, process_rolls_batch(dice_specs, faces, stance, convert_lightning_to_crit)
+
+
+def faces_to_rolls(spec, faces, offset=0):
+    """[NEW] 将单个规格的骰面下标还原为 roll_dice 的原始字典格式。"""
+    rolls_by_color = {}
+    for color, count in zip(DICE_COLORS, spec):
+        color_faces = DICE_FACES[color]
+        rolls_by_color[f'{color}_rolls'] = [color_faces[f] for f in faces[offset:offset + count]]
+        offset += count
+    return rolls_by_color
+
+
+def roll_dice(yellow_count=0, red_count=0, white_count=0, blue_count=0, rng=None):
     """
     [v_MODIFIED]
     模拟投掷指定数量的四种颜色骰子。
     不再汇总结果，而是返回每个骰子颜色的原始投掷结果列表。
+    [v_BATCH] 现在是批量引擎的单规格视图。
+    [v_RNG] rng 为可选的 random.Random 实例 (如 GameState.rng.dice)，默认使用全局 random。
 
     Returns:
         dict: 一个包含每种颜色骰子原始结果列表的字典。
               e.g., {'yellow_rolls': ['light_hit_2', 'blank'], 'red_rolls': ['heavy_hit'], ...}
     """
-    rolls_by_color = {
-        'yellow_rolls': [],
-        'red_rolls': [],
-        'white_rolls': [],
-        'blue_rolls': []
-    }
-
-    # 收集所有投掷结果
-    for _ in range(yellow_count):
-        rolls_by_color['yellow_rolls'].append(random.choice(DICE_FACES['yellow']))
-    for _ in range(red_count):
-        rolls_by_color['red_rolls'].append(random.choice(DICE_FACES['red']))
-    for _ in range(white_count):
-        rolls_by_color['white_rolls'].append(random.choice(DICE_FACES['white']))
-    for _ in range(blue_count):
-        rolls_by_color['blue_rolls'].append(random.choice(DICE_FACES['blue']))
-
-    return rolls_by_color
+    spec = (yellow_count, red_count, white_count, blue_count)
+    return faces_to_rolls(spec, roll_faces(sum(spec), rng))
 
 
 def process_rolls(raw_rolls_dict, stance='defense', convert_lightning_to_crit=False):
@@ -75,6 +185,7 @@ def process_rolls(raw_rolls_dict, stance='defense', convert_lightning_to_crit=Fa
     processed_results_by_color 现在是一个 list-of-lists 结构,
     e.g., {'yellow': [['轻击', '轻击'], ['空白']], ...}
     其中每个内部列表代表一颗骰子的结果 (例如 'light_hit_2' 会产生 ['轻击', '轻击'])
+    [v_BATCH] 与批量引擎共用同一张骰面查找表, 不再逐颗骰子走 if/elif 分支。
 
     Args:
         raw_rolls_dict (dict): 来自 roll_dice 的原始结果, e.g., {'yellow_rolls': [...], ...}
@@ -87,116 +198,32 @@ def process_rolls(raw_rolls_dict, stance='defense', convert_lightning_to_crit=Fa
             aggregated_summary (dict): e.g., {'轻击': 3, '重击': 1, '空白': 1}
         )
     """
-
-    # [修改] 字典的值现在是列表的列表
-    processed_results_by_color = {
-        'yellow': [],  # e.g., [['轻击', '轻击'], ['空白']]
-        'red': [],
-        'white': [],
-        'blue': []
-    }
-
+    processed_results_by_color = {}
     aggregated_summary = {}
-
-    def add_results_to_aggregator(results_list):
-        """[修改] 辅助函数，用于将 *一颗骰子* 的结果（可能多于一个）添加到总聚合中"""
-        for res in results_list:
-            aggregated_summary[res] = aggregated_summary.get(res, 0) + 1
-
-    # --- 处理黄骰 ---
-    for roll in raw_rolls_dict.get('yellow_rolls', []):
-        die_results = []  # 来自这 *一颗* 黄骰的结果
-        result = ''
-        if roll == 'light_hit_2':
-            die_results = [RESULT_MAP['light_hit'], RESULT_MAP['light_hit']]
-        elif roll == 'light_hit':
-            die_results = [RESULT_MAP['light_hit']]
-        elif roll == 'hollow_light_hit':
-            result = RESULT_MAP['light_hit'] if stance == 'attack' else RESULT_MAP['hollow_light_hit']
-            die_results = [result]
-        elif roll == 'lightning':
-            result = RESULT_MAP['heavy_hit'] if convert_lightning_to_crit else RESULT_MAP['lightning']
-            die_results = [result]
-        elif roll == 'eye':
-            die_results = [RESULT_MAP['eye']]
-        else:  # 'blank'
-            die_results = [RESULT_MAP['blank']]
-
-        processed_results_by_color['yellow'].append(die_results)  # 添加这颗骰子的结果列表
-        add_results_to_aggregator(die_results)  # 更新聚合
-
-    # --- 处理红骰 ---
-    for roll in raw_rolls_dict.get('red_rolls', []):
-        die_results = []
-        result = ''
-        if roll == 'heavy_hit':
-            die_results = [RESULT_MAP['heavy_hit']]
-        elif roll == 'hollow_heavy_hit':
-            result = RESULT_MAP['heavy_hit'] if stance == 'attack' else RESULT_MAP['hollow_heavy_hit']
-            die_results = [result]
-        elif roll == 'hollow_light_hit':
-            result = RESULT_MAP['light_hit'] if stance == 'attack' else RESULT_MAP['hollow_light_hit']
-            die_results = [result]
-        elif roll == 'lightning':
-            result = RESULT_MAP['heavy_hit'] if convert_lightning_to_crit else RESULT_MAP['lightning']
-            die_results = [result]
-        elif roll == 'eye':
-            die_results = [RESULT_MAP['eye']]
-        else:  # 'blank' (red dice don't have blank, but for safety)
-            die_results = [RESULT_MAP['blank']]
-
-        processed_results_by_color['red'].append(die_results)
-        add_results_to_aggregator(die_results)
-
-    # --- 处理白骰 ---
-    for roll in raw_rolls_dict.get('white_rolls', []):
-        die_results = []
-        result = ''
-        if roll == 'defense':
-            die_results = [RESULT_MAP['defense']]
-        elif roll == 'hollow_defense_2':
-            result = RESULT_MAP['defense'] if stance == 'defense' else RESULT_MAP['hollow_defense']
-            die_results = [result, result]  # 两个结果来自同一颗骰子
-        elif roll == 'evasion':
-            die_results = [RESULT_MAP['evasion']]
-        elif roll == 'lightning':
-            result = RESULT_MAP['heavy_hit'] if convert_lightning_to_crit else RESULT_MAP['lightning']
-            die_results = [result]
-        elif roll == 'eye':
-            die_results = [RESULT_MAP['eye']]
-        else:  # 'blank'
-            die_results = [RESULT_MAP['blank']]
-
-        processed_results_by_color['white'].append(die_results)
-        add_results_to_aggregator(die_results)
-
-    # --- 处理蓝骰 ---
-    for roll in raw_rolls_dict.get('blue_rolls', []):
-        die_results = []
-        result = ''
-        if roll == 'evasion':
-            die_results = [RESULT_MAP['evasion']]
-        elif roll == 'eye':
-            die_results = [RESULT_MAP['eye']]
-        elif roll == 'lightning':
-            result = RESULT_MAP['heavy_hit'] if convert_lightning_to_crit else RESULT_MAP['lightning']
-            die_results = [result]
-        else:  # 'blank'
-            die_results = [RESULT_MAP['blank']]
-
-        processed_results_by_color['blue'].append(die_results)
-        add_results_to_aggregator(die_results)
-
-    # 清理空的颜色列表
-    processed_results_by_color = {k: v for k, v in processed_results_by_color.items() if v}
-    # 清理0计数的聚合结果
-    aggregated_summary = {k: v for k, v in aggregated_summary.items() if v > 0}
+    blank_slots = (RESULT_INDEX['blank'],)
+
+    for color in DICE_COLORS:
+        rolls = raw_rolls_dict.get(f'{color}_rolls')
+        if not rolls:
+            continue
+        table = get_face_slot_table(color, stance, convert_lightning_to_crit)
+        face_index = FACE_INDEX[color]
+        color_results = []
+        for roll in rolls:
+            face = face_index.get(roll)
+            # 未知骰面按空白处理 (与旧版 else 分支一致)
+            slots = table[face] if face is not None else blank_slots
+            die_results = [RESULT_LABELS[s] for s in slots]
+            for res in die_results:
+                aggregated_summary[res] = aggregated_summary.get(res, 0) + 1
+            color_results.append(die_results)
+        processed_results_by_color[color] = color_results
 
     return processed_results_by_color, aggregated_summary
 
 
 # [v_REROLL 新增] 专注重投功能
-def reroll_specific_dice(raw_rolls_dict, selections_to_reroll):
+def reroll_specific_dice(raw_rolls_dict, selections_to_reroll, rng=None):
     """
     根据索引重投 'raw_rolls_dict' 中的特定骰子。
     selections_to_reroll 是一个列表, 格式为:
@@ -205,6 +232,8 @@ def reroll_specific_dice(raw_rolls_dict, selections_to_reroll):
     if not selections_to_reroll:
         return raw_rolls_dict  # 没有骰子被重投
 
+    rng = rng or random
+
     # 遍历玩家的选择
     for selection in selections_to_reroll:
         color = selection.get('color')
@@ -216,7 +245,7 @@ def reroll_specific_dice(raw_rolls_dict, selections_to_reroll):
                 isinstance(index, int) and 0 <= index < len(raw_rolls_dict[color_key]):
 
             # 执行重投并替换原始字典中的骰子
-            new_die_roll = random.choice(DICE_FACES[color])
+            new_die_roll = rng.choice(DICE_FACES[color])
             raw_rolls_dict[color_key][index] = new_die_roll
         else:
             # 记录一个无害的警告，以防前端发送了无效数据
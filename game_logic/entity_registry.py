@@ -0,0 +1,184 @@
+"""
+[NEW] GameState.entities 的实体注册表。
+
+EntityRegistry 仍然是一个普通的 {entity_id: entity} 字典 (所有现有的
+`entities.values()` / `entities.get()` / `entities[eid] = ...` 代码照常工作)，
+同时维护若干派生索引:
+
+- board:     占据位棋盘 (Bitboard)
+- 位置索引:  {pos: 该格子上的存活实体}
+- 类别索引:  {(controller, entity_type): 存活实体}
+
+放入字典时挂接实体 (entity._registry = self)，移出时解除；实体的 pos / status
+是属性，赋值时通知所挂接的注册表增量更新全部索引。索引只包含未被摧毁的实体，
+查询结果按实体加入注册表的顺序排列 (与遍历 entities.values() 的顺序一致)。
+索引不参与序列化: GameState.from_dict 重新放入实体时会自动重建。
+
+[v_ZOBRIST] 注册表同时维护实体部分的局面哈希 (self.zobrist): 挂接/解除时整体异或进/出，
+实体的 pos / orientation / status / stance / AP / TP 赋值时由实体增量更新。
+"""
+from .bitboard import Bitboard
+
+
+class EntityRegistry(dict):
+    """{entity_id: GameEntity}，并维护占据位棋盘 (self.board) 和位置 / 类别索引。"""
+
+    def __init__(self, geometry, entities=None):
+        super().__init__()
+        self.board = Bitboard(geometry)
+        self._by_pos = {}  # {pos: {id(entity): entity}}
+        self._by_kind = {}  # {(controller, entity_type): {id(entity): entity}}
+        self._order = {}  # {id(entity): 加入顺序}
+        self._next_order = 0
+        self.zobrist = 0  # 所有已挂接实体的局面哈希 (含已摧毁的实体)
+        if entities:
+            for entity_id, entity in entities.items():
+                self[entity_id] = entity
+
+    # --- 索引维护 ---
+
+    def _index(self, entity):
+        key = id(entity)
+        self.board.add(entity.controller, entity.pos)
+        self._by_pos.setdefault(entity.pos, {})[key] = entity
+        self._by_kind.setdefault((entity.controller, entity.entity_type), {})[key] = entity
+
+    def _unindex(self, entity, pos):
+        key = id(entity)
+        self.board.remove(entity.controller, pos)
+        bucket = self._by_pos.get(pos)
+        if bucket is not None:
+            bucket.pop(key, None)
+            if not bucket:
+                del self._by_pos[pos]
+        bucket = self._by_kind.get((entity.controller, entity.entity_type))
+        if bucket is not None:
+            bucket.pop(key, None)
+
+    def _moved(self, entity, old_pos, new_pos):
+        """(由 GameEntity.pos 调用) 存活实体移动。"""
+        if old_pos != new_pos:
+            self._unindex(entity, old_pos)
+            self._index(entity)
+
+    def _status_changed(self, entity, alive):
+        """(由 GameEntity.status 调用) 实体被摧毁 / 复活。"""
+        if alive:
+            self._index(entity)
+        else:
+            self._unindex(entity, entity.pos)
+
+    # --- 挂接 / 解除 ---
+
+    def _attach(self, entity):
+        if entity._registry is self:
+            return
+        if entity._registry is not None:
+            # 同一实体只能属于一个注册表: 先从旧注册表中移除
+            entity._registry._detach(entity)
+        entity._registry = self
+        self._order[id(entity)] = self._next_order
+        self._next_order += 1
+        self.zobrist ^= entity.zobrist()
+        if entity.status != 'destroyed':
+            self._index(entity)
+
+    def _detach(self, entity):
+        if entity._registry is not self:
+            return
+        if entity.status != 'destroyed':
+            self._unindex(entity, entity.pos)
+        self._order.pop(id(entity), None)
+        self.zobrist ^= entity.zobrist()
+        entity._registry = None
+
+    def _ordered(self, entities):
+        if len(entities) < 2:
+            return list(entities)
+        order = self._order
+        return sorted(entities, key=lambda e: order[id(e)])
+
+    # --- 查询 ---
+
+    def at(self, pos):
+        """某个格子上的所有存活实体 O(k)。"""
+        bucket = self._by_pos.get(pos)
+        return self._ordered(bucket.values()) if bucket else []
+
+    def positions(self):
+        """所有存活实体所在的格子。"""
+        return self._by_pos.keys()
+
+    def live(self, controller=None, entity_type=None):
+        """按控制方 / 实体类型筛选存活实体 (None 表示不限)。"""
+        found = []
+        for (kind_controller, kind_type), bucket in self._by_kind.items():
+            if controller is not None and kind_controller != controller:
+                continue
+            if entity_type is not None and kind_type != entity_type:
+                continue
+            found.extend(bucket.values())
+        return self._ordered(found)
+
+    def enemies_of(self, controller, entity_type=None):
+        """所有与 controller 敌对 (控制方不同) 的存活实体。"""
+        found = []
+        for (kind_controller, kind_type), bucket in self._by_kind.items():
+            if kind_controller == controller:
+                continue
+            if entity_type is not None and kind_type != entity_type:
+                continue
+            found.extend(bucket.values())
+        return self._ordered(found)
+
+    def first(self, controller, entity_type):
+        """最早加入的一个符合条件的存活实体，没有则返回 None。"""
+        bucket = self._by_kind.get((controller, entity_type))
+        if not bucket:
+            return None
+        order = self._order
+        return min(bucket.values(), key=lambda e: order[id(e)])
+
+    # --- dict 写操作 ---
+
+    def __setitem__(self, entity_id, entity):
+        old = self.get(entity_id)
+        if old is not None and old is not entity:
+            self._detach(old)
+        super().__setitem__(entity_id, entity)
+        self._attach(entity)
+
+    def __delitem__(self, entity_id):
+        entity = self[entity_id]
+        super().__delitem__(entity_id)
+        self._detach(entity)
+
+    def pop(self, entity_id, *default):
+        if entity_id not in self:
+            return super().pop(entity_id, *default)
+        entity = super().pop(entity_id)
+        self._detach(entity)
+        return entity
+
+    def popitem(self):
+        entity_id, entity = super().popitem()
+        self._detach(entity)
+        return entity_id, entity
+
+    def setdefault(self, entity_id, entity=None):
+        if entity_id not in self:
+            self[entity_id] = entity
+        return self[entity_id]
+
+    def update(self, *args, **kwargs):
+        for entity_id, entity in dict(*args, **kwargs).items():
+            self[entity_id] = entity
+
+    def clear(self):
+        for entity in self.values():
+            self._detach(entity)
+        super().clear()
+
+    def __reduce__(self):
+        # 反序列化时不能先调用 __setitem__ (此时索引尚未创建)，改为通过构造函数重建
+        return self.__class__, (self.board.geometry, dict(self))
@@ -1,4 +1,3 @@
-import random
 # 基础数据模型
 from .data_models import Mech, Projectile, Action
 # [阶段2重构] 导入新的 CombatState 状态机
@@ -152,10 +151,8 @@ def _run_interception_checks(projectile, game_state, log):
         return game_state, log
 
     landing_pos = projectile.pos
-    intercepting_entities = [
-        e for e in game_state.entities.values()
-        if e.controller != projectile.controller and e.entity_type == 'mech' and e.status != 'destroyed'
-    ]
+    # [v_INDEX] 类别索引: 只取敌方存活机甲
+    intercepting_entities = game_state.entities.enemies_of(projectile.controller, 'mech')
 
     for entity in intercepting_entities:
         if projectile.status == 'destroyed':
@@ -197,7 +194,8 @@ def _run_interception_checks(projectile, game_state, log):
                             action=intercept_action,
                             target_part_name='core',  # 抛射物只有一个 'core'
                             is_back_attack=False,
-                            is_interception_attack=True  # 标记为拦截，跳过重投
+                            is_interception_attack=True,  # 标记为拦截，跳过重投
+                            rng=game_state.rng.dice
                         )
 
                         log, result_packet = combat_session.resolve(log)
@@ -529,11 +527,11 @@ def handle_execute_attack(game_state, player_mech, data):
 
                 target_part_slot = 'core'
                 if isinstance(defender, Mech):
-                    hit_roll_result = roll_black_die()
+                    hit_roll_result = roll_black_die(game_state.rng.dice)
                     log.append(f"> 投掷部位骰结果: 【{hit_roll_result}】")
                     if hit_roll_result == 'any':
                         valid_parts = [s for s, p in defender.parts.items() if p and p.status != 'destroyed']
-                        target_part_slot = random.choice(valid_parts) if valid_parts else 'core'
+                        target_part_slot = game_state.rng.dice.choice(valid_parts) if valid_parts else 'core'
                         log.append(f"> 抛射物随机命中: [{target_part_slot}]。")
                     elif defender.parts.get(hit_roll_result) and defender.parts[hit_roll_result].status != 'destroyed':
                         target_part_slot = hit_roll_result
@@ -548,7 +546,8 @@ def handle_execute_attack(game_state, player_mech, data):
                     defender_entity=defender,
                     action=action,
                     target_part_name=target_part_slot,
-                    is_back_attack=False
+                    is_back_attack=False,
+                    rng=game_state.rng.dice
                 )
 
                 log, result_packet = combat_session.resolve(log)
@@ -636,7 +635,7 @@ def handle_execute_attack(game_state, player_mech, data):
                         log.append(f"> AI 决定用 [{best_parry_part.name}] 进行招架！")
 
             if not target_part_slot:
-                hit_roll_result = roll_black_die()
+                hit_roll_result = roll_black_die(game_state.rng.dice)
                 log.append(f"> 玩家投掷部位骰结果: 【{hit_roll_result}】")
                 if hit_roll_result == 'any':
                     log.append("> 玩家获得任意选择权！请选择目标部位。")
@@ -670,7 +669,8 @@ def handle_execute_attack(game_state, player_mech, data):
             defender_entity=defender_entity,
             action=attack_action,
             target_part_name=target_part_slot,
-            is_back_attack=back_attack
+            is_back_attack=back_attack,
+            rng=game_state.rng.dice
         )
         log, result_packet = combat_session.resolve(log)
 
@@ -724,7 +724,6 @@ def handle_execute_attack(game_state, player_mech, data):
 def handle_jettison_part(game_state, player_mech, part_slot):
     """(玩家) 阶段 4：执行[弃置]动作"""
     from game_logic.database import ALL_PARTS
-    from .data_models import Part
 
     log = []
     game_state.visual_events = []
@@ -760,11 +759,8 @@ def handle_jettison_part(game_state, player_mech, part_slot):
         return game_state, log, None, None, "未找到（弃置）部件"
 
     # 创建并替换部件
-    new_part_data = ALL_PARTS[discarded_part_name]
-    new_part = Part.from_dict(new_part_data.to_dict())
-
-    # 继承状态
-    new_part.status = current_status
+    # 继承状态 (从共享模板创建实例)
+    new_part = ALL_PARTS[discarded_part_name].instantiate(status=current_status)
     if current_status == 'damaged':
         log.append(f"> 部件状态 [破损] 已继承。")
 
@@ -1024,7 +1020,7 @@ def _resolve_queued_attack(game_state, log, attack_data, remaining_attacks_queue
                 log.append(f"> 玩家决定用 [{best_parry_part.name}] 进行招架！")
 
         if not target_part_slot:
-            hit_roll_result = roll_black_die()
+            hit_roll_result = roll_black_die(game_state.rng.dice)
             log.append(f"> AI 投掷部位骰结果: 【{hit_roll_result}】")
             if hit_roll_result == 'any' or back_attack:
                 if back_attack:
@@ -1033,14 +1029,14 @@ def _resolve_queued_attack(game_state, log, attack_data, remaining_attacks_queue
                     log.append("> AI 获得任意选择权！")
                 damaged_parts = [s for s, p in defender_entity.parts.items() if p and p.status == 'damaged']
                 if damaged_parts:
-                    target_part_slot = random.choice(damaged_parts)
+                    target_part_slot = game_state.rng.dice.choice(damaged_parts)
                     log.append(f"> AI 优先攻击已受损部件: [{target_part_slot}]。")
                 elif defender_entity.parts.get('core') and defender_entity.parts['core'].status != 'destroyed':
                     target_part_slot = 'core'
                     log.append("> AI 决定攻击 [核心]。")
                 else:
                     valid_parts = [s for s, p in defender_entity.parts.items() if p and p.status != 'destroyed']
-                    target_part_slot = random.choice(valid_parts) if valid_parts else 'core'
+                    target_part_slot = game_state.rng.dice.choice(valid_parts) if valid_parts else 'core'
             elif defender_entity.parts.get(hit_roll_result) and defender_entity.parts[
                 hit_roll_result].status != 'destroyed':
                 target_part_slot = hit_roll_result
@@ -1057,7 +1053,8 @@ def _resolve_queued_attack(game_state, log, attack_data, remaining_attacks_queue
         defender_entity=defender_entity,
         action=attack_action,
         target_part_name=target_part_slot,
-        is_back_attack=back_attack
+        is_back_attack=back_attack,
+        rng=game_state.rng.dice
     )
     log, result_packet = combat_session.resolve(log)
 
@@ -1,10 +1,9 @@
 import math
 import heapq
-import random
 
 # 基础数据模型
 from .data_models import (
-    Mech, Part, Action, GameEntity, Projectile, Drone, Pilot
+    Mech, GameEntity, Projectile
 )
 # 数据库
 from .database import (
@@ -13,7 +12,20 @@ from .database import (
     AI_LOADOUTS,
     PLAYER_PILOTS, AI_PILOTS
 )
-
+# [NEW] 每局独立的随机子流
+from .rng import GameRNG
+# [NEW] 位棋盘占据层
+from .bitboard import get_geometry
+from .entity_registry import EntityRegistry
+from .zobrist import AmmoLedger, zobrist_key
+
+# [NEW] 可选棋盘尺寸: 机库表单的 board_size -> (宽, 高)
+BOARD_SIZES = {
+    'standard': (10, 10),
+    'large': (32, 32),
+    'huge': (64, 64),
+}
+DEFAULT_BOARD_SIZE = BOARD_SIZES['standard']
 
 # [阶段2重构] 移除了对 combat_system 的导入，因为它不再暴露全局函数
 
@@ -89,33 +101,65 @@ def _is_tile_locked_by_opponent(game_state, tile_pos, a_mech, b_pos, b_mech):
     return True
 
 
+def get_lock_mask(game_state, mover, lockers=None):
+    """
+    [v_BITBOARD] mover 的锁定区域位掩码: 被敌方近战单位锁定的全部格子 (锁定者周围8格)。
+
+    Args:
+        mover: 正在移动的单位
+        lockers (list): 可选，显式指定的锁定者；默认为所有与 mover 敌对、未摧毁的机甲
+    """
+    geometry = game_state.board.geometry
+    if lockers is None:
+        lockers = game_state.entities.enemies_of(mover.controller, 'mech')
+
+    mask = 0
+    for locker in lockers:
+        # 与 _is_tile_locked_by_opponent 的规则一致: 被摧毁、宕机或没有近战动作的单位无法锁定
+        if not locker or locker.status == 'destroyed' or locker.stance == 'downed':
+            continue
+        if not locker.has_melee_action():
+            continue
+        mask |= geometry.neighbors8(locker.pos)
+    return mask
+
+
+def get_lock_field(game_state, mover, lockers=None):
+    """
+    [v_LOCKFIELD] 一次性计算 mover 的 "锁定场" (锁定区域的坐标集合)。
+    寻路时直接查表，不必在每个出队节点上遍历所有锁定者及其动作。
+
+    Returns:
+        frozenset: {(x, y), ...}，只包含棋盘内的格子
+    """
+    return frozenset(game_state.board.geometry.positions(get_lock_mask(game_state, mover, lockers)))
+
+
 def get_player_lock_status(game_state, player_mech):
     """检查玩家是否被任何AI机甲锁定。"""
     if not player_mech: return False, None
-    for entity in game_state.entities.values():
-        if entity.controller == 'ai' and entity.entity_type == 'mech' and entity.status != 'destroyed':
-            is_locked = _is_tile_locked_by_opponent(
-                game_state,
-                player_mech.pos, player_mech,
-                entity.pos, entity
-            )
-            if is_locked:
-                return True, entity.pos
+    for entity in game_state.entities.live('ai', 'mech'):
+        is_locked = _is_tile_locked_by_opponent(
+            game_state,
+            player_mech.pos, player_mech,
+            entity.pos, entity
+        )
+        if is_locked:
+            return True, entity.pos
     return False, None
 
 
 def get_ai_lock_status(game_state, ai_mech):
     """检查AI是否被任何玩家机甲锁定。"""
     if not ai_mech: return False, None
-    for entity in game_state.entities.values():
-        if entity.controller == 'player' and entity.entity_type == 'mech' and entity.status != 'destroyed':
-            is_locked = _is_tile_locked_by_opponent(
-                game_state,
-                ai_mech.pos, ai_mech,
-                entity.pos, entity
-            )
-            if is_locked:
-                return True, entity.pos
+    for entity in game_state.entities.live('player', 'mech'):
+        is_locked = _is_tile_locked_by_opponent(
+            game_state,
+            ai_mech.pos, ai_mech,
+            entity.pos, entity
+        )
+        if is_locked:
+            return True, entity.pos
     return False, None
 
 
@@ -163,12 +207,12 @@ def run_projectile_logic(projectile, game_state, timing_to_run='立即'):
         # 1. '延迟' 动作 (如导弹) 寻找最近的敌人
         closest_enemy = None
         min_dist = 999
-        for entity in game_state.entities.values():
-            if entity.controller != projectile.controller and entity.status != 'destroyed':
-                dist = _get_distance(projectile.pos, entity.pos)
-                if dist < min_dist:
-                    min_dist = dist
-                    closest_enemy = entity
+        # [v_INDEX] 只遍历敌方存活实体 (类别索引)
+        for entity in game_state.entities.enemies_of(projectile.controller):
+            dist = _get_distance(projectile.pos, entity.pos)
+            if dist < min_dist:
+                min_dist = dist
+                closest_enemy = entity
 
         if not closest_enemy:
             log.append(f"> [抛射物] {projectile.name} 未找到敌方目标，自我销毁。")
@@ -251,29 +295,30 @@ def run_drone_logic(drone, game_state):
 def create_mech_from_selection(name, selection, entity_id, controller, pilot_name=None):
     """
     根据机库页面的部件名称选择，从数据库动态创建一台机甲。
+    [v_FLYWEIGHT] 部件由数据库模板 instantiate()，共享动作列表，不再 to_dict -> from_dict 深拷贝。
     """
     try:
-        core_part = Part.from_dict(CORES[selection['core']].to_dict())
-        legs_part = Part.from_dict(LEGS[selection['legs']].to_dict())
-        left_arm_part = Part.from_dict(LEFT_ARMS[selection['left_arm']].to_dict())
-        right_arm_part = Part.from_dict(RIGHT_ARMS[selection['right_arm']].to_dict())
-        backpack_part = Part.from_dict(BACKPACKS[selection['backpack']].to_dict())
+        core_part = CORES[selection['core']].instantiate()
+        legs_part = LEGS[selection['legs']].instantiate()
+        left_arm_part = LEFT_ARMS[selection['left_arm']].instantiate()
+        right_arm_part = RIGHT_ARMS[selection['right_arm']].instantiate()
+        backpack_part = BACKPACKS[selection['backpack']].instantiate()
     except KeyError as e:
         print(f"创建机甲时出错：找不到部件 {e}。使用默认部件。")
-        core_part = Part.from_dict(list(CORES.values())[0].to_dict())
-        legs_part = Part.from_dict(list(LEGS.values())[0].to_dict())
-        left_arm_part = Part.from_dict(list(LEFT_ARMS.values())[0].to_dict())
-        right_arm_part = Part.from_dict(list(RIGHT_ARMS.values())[0].to_dict())
-        backpack_part = Part.from_dict(list(BACKPACKS.values())[0].to_dict())
+        core_part = next(iter(CORES.values())).instantiate()
+        legs_part = next(iter(LEGS.values())).instantiate()
+        left_arm_part = next(iter(LEFT_ARMS.values())).instantiate()
+        right_arm_part = next(iter(RIGHT_ARMS.values())).instantiate()
+        backpack_part = next(iter(BACKPACKS.values())).instantiate()
 
     pilot_obj = None
     if pilot_name:
         pilot_data_source = PLAYER_PILOTS if controller == 'player' else AI_PILOTS
         if pilot_name in pilot_data_source:
             # [重要] 我们不能直接赋实例，因为 pilot.link_points 是可变的。
-            # 我们需要复制它。最简单的方法是 to_dict -> from_dict
+            # instantiate() 创建新实例，只共享只读的速度属性和技能
             pilot_template = pilot_data_source[pilot_name]
-            pilot_obj = Pilot.from_dict(pilot_template.to_dict())
+            pilot_obj = pilot_template.instantiate()
         else:
             print(f"警告: 找不到驾驶员 '{pilot_name}' (controller: {controller})。将不分配驾驶员。")
 
@@ -332,20 +377,26 @@ class GameState:
     这是游戏状态的“唯一真实来源”。
     """
 
-    def __init__(self, player_mech_selection=None, ai_loadout_key=None, game_mode='duel', player_pilot_name=None):
+    def __init__(self, player_mech_selection=None, ai_loadout_key=None, game_mode='duel', player_pilot_name=None,
+                 seed=None, board_width=None, board_height=None):
         """
         初始化游戏状态，创建玩家和AI机甲，并根据游戏模式设置它们的起始位置。
+        [v_RNG] seed: 本局随机种子 (None 则随机生成)，所有随机性都来自 self.rng 的子流。
+        [v_BOARD_SIZE] board_width / board_height: 棋盘尺寸 (默认 10x10)，起始位置按尺寸换算。
         """
-        self.board_width = 10
-        self.board_height = 10
-        self.entities = {}  # 核心状态：{ 'player_1': <Mech>, 'ai_1': <Mech>, 'proj_123': <Projectile> }
+        self.rng = GameRNG(seed)
+        self.board_width = board_width or DEFAULT_BOARD_SIZE[0]
+        self.board_height = board_height or DEFAULT_BOARD_SIZE[1]
+        # 核心状态：{ 'player_1': <Mech>, 'ai_1': <Mech>, 'proj_123': <Projectile> }
+        # [v_BITBOARD] EntityRegistry 是 dict 子类，同时维护占据位棋盘 (self.board)
+        self.entities = EntityRegistry(get_geometry(self.board_width, self.board_height))
 
         self.game_mode = game_mode
         self.ai_defeat_count = 0
         self.game_over = None
 
-        # 弹药追踪
-        self.ammo_counts = {}  # { ('player_1', 'left_arm', '火箭弹'): 2 }
+        # 弹药追踪 ([v_ZOBRIST] AmmoLedger 是 dict 子类，增量维护弹药部分的局面哈希)
+        self.ammo_counts = AmmoLedger()  # { ('player_1', 'left_arm', '火箭弹'): 2 }
 
         # 视觉事件
         self.visual_events = []
@@ -356,6 +407,10 @@ class GameState:
         # [NEW] 标记当前是否处于抛射物阶段 (防止过早结束回合)
         self.projectile_phase_active = False
 
+        # [v_VERSION] 状态版本: 每次保存了 (非临时的) 变化都递增 (见 StateJournal.prepare)，
+        # 用于识别过期的缓存对象和其他页面发来的过期请求
+        self.state_version = 0
+
         # --- 初始化玩家机甲 ---
         if player_mech_selection:
             player_mech = create_mech_from_selection(
@@ -388,22 +443,28 @@ class GameState:
 
             player_mech = self.get_player_mech()  # 获取实例
 
+            # [v_BOARD_SIZE] 起始位置相对棋盘尺寸 (10x10 时与原来的固定坐标一致)
+            center_x, center_y = self._board_center()
             if self.game_mode == 'horde':
-                if player_mech: player_mech.pos, player_mech.orientation = (5, 2), 'N'
+                if player_mech: player_mech.pos, player_mech.orientation = (center_x, 2), 'N'
                 self._spawn_horde_ai(ai_loadout_key)
             elif self.game_mode == 'duel':
-                if player_mech: player_mech.pos, player_mech.orientation = (1, 5), 'E'
-                if ai_mech: ai_mech.pos, ai_mech.orientation = (10, 5), 'W'
+                if player_mech: player_mech.pos, player_mech.orientation = (1, center_y), 'E'
+                if ai_mech: ai_mech.pos, ai_mech.orientation = (self.board_width, center_y), 'W'
             elif self.game_mode == 'range':
-                if player_mech: player_mech.pos, player_mech.orientation = (5, 3), 'S'
-                if ai_mech: ai_mech.pos, ai_mech.orientation = (5, 8), 'N'
+                if player_mech: player_mech.pos, player_mech.orientation = (center_x, 3), 'S'
+                if ai_mech: ai_mech.pos, ai_mech.orientation = (center_x, self.board_height - 2), 'N'
             else:  # 'standard'
-                if player_mech: player_mech.pos, player_mech.orientation = (5, 2), 'N'
-                if ai_mech: ai_mech.pos, ai_mech.orientation = (5, 8), 'S'
+                if player_mech: player_mech.pos, player_mech.orientation = (center_x, 2), 'N'
+                if ai_mech: ai_mech.pos, ai_mech.orientation = (center_x, self.board_height - 2), 'S'
 
         elif player_mech_selection:
             player_mech = self.get_player_mech()
-            if player_mech: player_mech.pos, player_mech.orientation = (5, 2), 'N'
+            if player_mech: player_mech.pos, player_mech.orientation = (self._board_center()[0], 2), 'N'
+
+    def _board_center(self):
+        """棋盘中线坐标 (10x10 时为 (5, 5))。"""
+        return (self.board_width + 1) // 2, (self.board_height + 1) // 2
 
     def _spawn_horde_ai(self, ai_loadout_key):
         """生存模式下，在底部两行随机生成一个AI。"""
@@ -415,12 +476,12 @@ class GameState:
                 if pos != player_pos:
                     valid_spawn_points.append(pos)
 
-        spawn_pos = random.choice(valid_spawn_points) if valid_spawn_points else (1, self.board_height)
+        spawn_pos = self.rng.spawn.choice(valid_spawn_points) if valid_spawn_points else (1, self.board_height)
 
         if self.ai_defeat_count > 0:
-            ai_loadout_key = random.choice(list(AI_LOADOUTS.keys()))
+            ai_loadout_key = self.rng.spawn.choice(list(AI_LOADOUTS.keys()))
         elif ai_loadout_key is None:
-            ai_loadout_key = random.choice(list(AI_LOADOUTS.keys()))
+            ai_loadout_key = self.rng.spawn.choice(list(AI_LOADOUTS.keys()))
 
         ai_id = f"ai_{self.ai_defeat_count + 1}"
         ai_mech = create_ai_mech(ai_loadout_key, entity_id=ai_id)
@@ -439,18 +500,18 @@ class GameState:
             self.entities[ai_id] = ai_mech
 
     def _spawn_range_ai(self):
-        """靶场模式下，在 (5, 8) 重新生成一个AI。"""
+        """靶场模式下，在 (中线, 倒数第3行) 重新生成一个AI (10x10 时为 (5, 8))。"""
         # 移除所有旧的AI和抛射物
         ids_to_remove = [eid for eid, e in self.entities.items() if
                          e.controller == 'ai' or e.entity_type == 'projectile']
         for eid in ids_to_remove:
             del self.entities[eid]
 
-        ai_loadout_key = random.choice(list(AI_LOADOUTS.keys()))
+        ai_loadout_key = self.rng.spawn.choice(list(AI_LOADOUTS.keys()))
         ai_id = f"ai_range_{self.ai_defeat_count + 1}"
         ai_mech = create_ai_mech(ai_loadout_key, entity_id=ai_id)
         if ai_mech:
-            ai_mech.pos = (5, 8)
+            ai_mech.pos = (self._board_center()[0], self.board_height - 2)
             ai_mech.orientation = 'N'
 
             # 为新生成的 AI 初始化弹药
@@ -507,9 +568,12 @@ class GameState:
 
         template = PROJECTILE_TEMPLATES[projectile_key]
 
-        actions = [Action.from_dict(a) for a in template.get('actions', [])]
+        # [v_FLYWEIGHT] 同一模板的抛射物共享动作列表
+        actions = Projectile.get_template_actions(projectile_key)
+        if actions is None:
+            actions = Projectile.register_template(projectile_key, template)
 
-        new_id = f"proj_{random.randint(10000, 99999)}"
+        new_id = f"proj_{self.rng.spawn.randint(10000, 99999)}"
 
         new_projectile = Projectile(
             id=new_id,
@@ -521,7 +585,8 @@ class GameState:
             actions=actions,
             life_span=template.get('life_span', 1),
             electronics=template.get('electronics', 0),
-            move_range=template.get('move_range', 0)
+            move_range=template.get('move_range', 0),
+            template_key=projectile_key
         )
 
         self.entities[new_id] = new_projectile
@@ -545,7 +610,9 @@ class GameState:
         if ai_dead:
             if self.game_mode == 'horde':
                 self.ai_defeat_count += 1
-                self.entities[ai_mech.id].status = 'destroyed'  # 标记旧AI为已摧毁
+                # [修复] AI 可能已被 entity_changes 标记为摧毁，此时 get_ai_mech 返回 None
+                if ai_mech:
+                    self.entities[ai_mech.id].status = 'destroyed'  # 标记旧AI为已摧毁
                 self._spawn_horde_ai(None)
                 if self.get_ai_mech():  # 检查新AI是否生成成功
                     self.get_ai_mech().last_ai_pos = None
@@ -561,16 +628,19 @@ class GameState:
 
     # --- 实体辅助函数 ---
 
+    @property
+    def board(self):
+        """[v_BITBOARD] 本局的占据位棋盘 (由 self.entities 维护)。"""
+        return self.entities.board
+
     def get_player_mech(self):
         """获取 'player_1' 机甲实体。"""
         return self.entities.get('player_1')
 
     def get_ai_mech(self):
         """获取第一个 'ai' 控制的机甲实体。"""
-        for entity in self.entities.values():
-            if entity.controller == 'ai' and entity.entity_type == 'mech' and entity.status != 'destroyed':
-                return entity
-        return None  # 如果所有AI都被击败
+        # [v_INDEX] 类别索引 O(1)；如果所有AI都被击败则返回 None
+        return self.entities.first('ai', 'mech')
 
     def get_entity_by_id(self, entity_id):
         """通过 ID 获取任何实体。"""
@@ -585,36 +655,50 @@ class GameState:
         return [e.to_dict() for e in self.entities.values() if e.status != 'destroyed']
 
     def get_entities_at_pos(self, pos, exclude_id=None):
-        """获取特定坐标上的所有实体列表。"""
-        entities_found = []
-        for entity in self.entities.values():
-            if entity.pos == pos and entity.status != 'destroyed':
-                if exclude_id and entity.id == exclude_id:
-                    continue
-                entities_found.append(entity)
+        """获取特定坐标上的所有实体列表。[v_INDEX] 位置索引 O(k)。"""
+        entities_found = self.entities.at(pos)
+        if exclude_id:
+            entities_found = [entity for entity in entities_found if entity.id != exclude_id]
         return entities_found
 
     def get_occupied_tiles(self, exclude_id=None):
-        """获取所有被实体占据的格子。"""
-        occupied = set()
-        for entity in self.entities.values():
-            if entity.status != 'destroyed':
-                if exclude_id and entity.id == exclude_id:
-                    continue
-                occupied.add(entity.pos)
+        """获取所有被实体占据的格子。[v_INDEX] 直接从位置索引读取。"""
+        occupied = set(self.entities.positions())
+        if exclude_id:
+            excluded = self.entities.get(exclude_id)
+            # 只有当该格子上没有其他实体时，排除才会让它变空
+            if excluded and excluded.status != 'destroyed' and self.board.count_at(excluded.pos) == 1:
+                occupied.discard(excluded.pos)
         return occupied
 
+    def position_hash(self):
+        """
+        [v_ZOBRIST] 当前局面的 64 位 Zobrist 哈希 (确定性，与进程无关)。
+        覆盖棋盘尺寸、实体的位置 / 朝向 / 状态、机甲的姿态 / AP / TP / 部件状态以及弹药。
+        实体和弹药部分是增量维护的，这里只需合并；部件部分按签名缓存。
+        """
+        h = self.entities.zobrist ^ self.ammo_counts.zobrist
+        h ^= zobrist_key('board', self.board_width, self.board_height)
+        for entity in self.entities.values():
+            if entity.entity_type == 'mech':
+                h ^= entity.parts_zobrist()
+        return h
+
     def to_dict(self):
         """序列化整个游戏状态，包括所有实体。"""
         return {
             'entities': {eid: entity.to_dict() for eid, entity in self.entities.items()},
+            'board_width': self.board_width,  # [v_BOARD_SIZE]
+            'board_height': self.board_height,
             'game_mode': self.game_mode,
             'ai_defeat_count': self.ai_defeat_count,
             'game_over': self.game_over,
-            'ammo_counts': self.ammo_counts,
+            'ammo_counts': dict(self.ammo_counts),
             'visual_events': self.visual_events,
             'pending_projectile_queue': self.pending_projectile_queue,  # [新增] 序列化队列
             'projectile_phase_active': self.projectile_phase_active,  # [NEW] 序列化
+            'rng': self.rng.to_dict(),  # [v_RNG] 随机子流状态
+            'state_version': self.state_version,  # [v_VERSION]
         }
 
     @classmethod
@@ -625,10 +709,11 @@ class GameState:
             return cls()
 
         game_state = cls.__new__(cls)
-        game_state.board_width = 10
-        game_state.board_height = 10
+        game_state.rng = GameRNG.from_dict(data.get('rng'))
+        game_state.board_width = data.get('board_width', DEFAULT_BOARD_SIZE[0])
+        game_state.board_height = data.get('board_height', DEFAULT_BOARD_SIZE[1])
 
-        game_state.entities = {}
+        game_state.entities = EntityRegistry(get_geometry(game_state.board_width, game_state.board_height))
         entities_data = data.get('entities', {})
         for eid, entity_data in entities_data.items():
             if entity_data:
@@ -637,7 +722,7 @@ class GameState:
         game_state.game_mode = data.get('game_mode', 'duel')
         game_state.ai_defeat_count = data.get('ai_defeat_count', 0)
         game_state.game_over = data.get('game_over', None)
-        game_state.ammo_counts = data.get('ammo_counts', {})
+        game_state.ammo_counts = AmmoLedger(data.get('ammo_counts', {}))
         game_state.visual_events = data.get('visual_events', [])
 
         # [新增] 反序列化队列
@@ -645,6 +730,7 @@ class GameState:
 
         # [NEW] 反序列化
         game_state.projectile_phase_active = data.get('projectile_phase_active', False)
+        game_state.state_version = data.get('state_version', 0)
 
         return game_state
 
@@ -660,13 +746,6 @@ class GameState:
         # 获取所有被占据的格子，排除移动者自己
         occupied_tiles = self.get_occupied_tiles(exclude_id=entity.id)
 
-        # 确定锁定者 (所有与移动者敌对的单位)
-        lockers = []
-        for e in self.entities.values():
-            if e.controller != entity.controller and e.entity_type == 'mech' and e.status != 'destroyed':
-                if e.has_melee_action():
-                    lockers.append(e)
-
         if is_flight:
             # --- 空中移动逻辑 (无视锁定，可穿过单位) ---
             pq = [(0, start_pos)]  # (cost, pos)
@@ -676,8 +755,11 @@ class GameState:
                 cost, (x, y) = heapq.heappop(pq)
                 current_pos = (x, y)
 
+                # [v_BOARD_SIZE] 出队成本单调不减: 超出移动距离即可提前结束，与棋盘大小无关
                 if cost > move_distance:
-                    continue
+                    break
+                if cost > visited[current_pos]:
+                    continue  # 过期的队列项 (该格子已以更低成本出队)
 
                 if cost > 0:
                     valid_moves.append(current_pos)
@@ -699,6 +781,8 @@ class GameState:
                         heapq.heappush(pq, (new_cost, next_pos))
         else:
             # --- 地面移动逻辑 (A* 算法) ---
+            # [v_LOCKFIELD] 锁定场 (所有与移动者敌对的近战单位周围的格子) 只计算一次
+            locked_tiles = get_lock_field(self, entity)
             pq = [(0, start_pos)]  # (cost, pos)
             visited = {start_pos: 0}
 
@@ -706,21 +790,17 @@ class GameState:
                 cost, (x, y) = heapq.heappop(pq)
                 current_pos = (x, y)
 
+                # [v_BOARD_SIZE] 同上，有界 Dijkstra
                 if cost > move_distance:
-                    continue
+                    break
+                if cost > visited[current_pos]:
+                    continue  # 过期的队列项 (该格子已以更低成本出队)
 
                 if cost > 0:
                     valid_moves.append(current_pos)
 
-                # 检查当前格子是否被锁定
-                current_is_locked = False
-                for locker_mech in lockers:
-                    if _is_tile_locked_by_opponent(self, current_pos, entity, locker_mech.pos, locker_mech):
-                        current_is_locked = True
-                        break
-
                 # 只要从一个被锁定的格子出发，移动成本就是 2。
-                move_cost = 2 if current_is_locked else 1
+                move_cost = 2 if current_pos in locked_tiles else 1
 
                 for dx_step, dy_step in [(0, 1), (0, -1), (1, 0), (-1, 0)]:
                     nx, ny = x + dx_step, y + dy_step
@@ -807,34 +887,27 @@ class GameState:
 
         elif action.action_type == '射击' or action.action_type == '抛射' or action.action_type == '快速':
             # --- 射击/抛射 目标实体 逻辑 ---
-            # 遍历所有敌方实体
-            for entity in self.entities.values():
-                if entity.controller != attacker_entity.controller and entity.status != 'destroyed':
-                    dist = _get_distance(start_pos, entity.pos)
-                    if dist <= final_range:
-                        # 抛射 (或曲射) 无视朝向
-                        if action.action_type == '抛射' or is_curved or is_in_forward_arc(start_pos, orientation,
-                                                                                          entity.pos):
-                            back_attack = False
-                            if isinstance(entity, Mech):
-                                back_attack = is_back_attack(start_pos, entity.pos, entity.orientation)
-                            valid_targets.append({'pos': entity.pos, 'entity': entity, 'is_back_attack': back_attack})
+            # [v_BITBOARD] 射程 (曼哈顿半径) 与前向弧都是预计算的位掩码
+            geometry = self.board.geometry
+            ignores_arc = action.action_type == '抛射' or is_curved  # 抛射 (或曲射) 无视朝向
+            reach_mask = geometry.manhattan(start_pos, final_range)
+            if not ignores_arc:
+                reach_mask &= geometry.forward_arc(start_pos, orientation)
+
+            # 遍历所有敌方存活实体 (射程内没有敌方占据的格子时跳过)
+            if reach_mask & self.board.enemy_mask(attacker_entity.controller):
+                for entity in self.entities.enemies_of(attacker_entity.controller):
+                    if reach_mask & geometry.bit(entity.pos):
+                        back_attack = False
+                        if isinstance(entity, Mech):
+                            back_attack = is_back_attack(start_pos, entity.pos, entity.orientation)
+                        valid_targets.append({'pos': entity.pos, 'entity': entity, 'is_back_attack': back_attack})
 
             # 如果是抛射, *额外* 查找所有可发射的空格子
             if action.action_type == '抛射':
                 # --- 抛射 目标格子 逻辑 ---
-                occupied_tiles = self.get_occupied_tiles()
-                for x in range(1, self.board_width + 1):
-                    for y in range(1, self.board_height + 1):
-                        cell_pos = (x, y)
-                        if cell_pos in occupied_tiles: continue  # 只查找空格子
-
-                        dist = _get_distance(start_pos, cell_pos)
-                        if 0 < dist <= final_range:  # 距离必须 > 0
-                            # 抛射 (或曲射) 无视朝向
-                            if action.action_type == '抛射' or is_curved or is_in_forward_arc(start_pos, orientation,
-                                                                                              cell_pos):
-                                valid_launch_cells.append(cell_pos)
+                # [v_LAUNCH] 射程菱形内、非起点 (距离必须 > 0) 的空格子，直接由几何层生成并缓存
+                valid_launch_cells = geometry.launch_cells(start_pos, final_range, self.board.occupied)
 
         elif action.action_type == '被动':
             # 拦截动作的目标是抛射物，由 _run_interception_checks 动态决定
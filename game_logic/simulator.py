@@ -0,0 +1,547 @@
+"""
+[NEW] 无头对局模拟器 (Headless Match Runner)。
+
+在没有 Flask 请求上下文、也没有 session 往返的情况下，逐回合跑完一整局 GameState。
+模拟器直接驱动 routes/api_routes.py 所使用的同一套 game_controller 处理函数，
+因此规则、AI 和中断 (重投 / 效果选择) 的行为与网页对局完全一致。
+
+玩家一方由可插拔的策略 (PlayerPolicy) 控制:
+- PassivePolicy: 什么都不做，只结束回合 (用于测试 AI 的输出)
+- GreedyPolicy:  复用 AI 的动作强度评估，贪心地攻击 / 接近目标
+
+用法:
+    python -m game_logic.simulator --ai heavy --mode duel --matches 20 --seed 1
+"""
+import argparse
+import contextlib
+import io
+import time
+from collections import Counter
+
+from .data_models import Mech
+from .game_logic import (
+    GameState, BOARD_SIZES, _get_distance, _get_orientation_to_target, is_in_forward_arc, get_player_lock_status
+)
+from . import game_controller as controller
+from .ai_system import _evaluate_action_strength, _get_action_cost
+from .ace_ai_system import deterministic_planning
+from .database import AI_LOADOUTS
+
+# 默认的玩家配置 (与机库页面的默认选择一致)
+DEFAULT_PLAYER_SELECTION = {
+    'core': 'RT-06 "泥沼"核心',
+    'legs': 'RL-06 标准下肢',
+    'left_arm': '55型 轻盾 + CC-6 格斗刀',
+    'right_arm': 'AC-32 自动步枪',
+    'backpack': 'AMS-190 主动防御',
+}
+DEFAULT_PLAYER_PILOT = '【测试驾驶员】'
+
+# 安全上限，防止策略或规则出现死循环
+MAX_MAIN_ACTIONS_PER_TURN = 8
+MAX_INTERRUPTS_PER_STEP = 32
+MAX_PROJECTILE_PHASE_STEPS = 32
+
+ATTACK_ACTION_TYPES = ('近战', '射击', '抛射', '快速')
+
+
+# --- 玩家策略 ---
+
+class PlayerPolicy:
+    """
+    玩家策略接口。
+    所有方法都接收当前的 game_state 与玩家机甲，返回值格式与对应 API 的请求参数一致。
+    """
+
+    def choose_timing(self, game_state, mech):
+        """阶段 1: 返回时机字符串 ('近战', '射击', '抛射', '移动', ...)。"""
+        return '移动'
+
+    def choose_stance(self, game_state, mech):
+        """阶段 2: 返回姿态 ('attack', 'defense', 'agile')。"""
+        return 'defense'
+
+    def choose_adjustment(self, game_state, mech):
+        """
+        阶段 3: 返回 None (跳过)、('move', target_pos, orientation) 或 ('turn', orientation)。
+        """
+        return None
+
+    def choose_main_action(self, game_state, mech):
+        """
+        阶段 4: 返回 None 结束回合，或一个动作字典:
+            {'kind': 'move', 'action_name', 'part_slot', 'target_pos', 'final_orientation'}
+            {'kind': 'attack', 'action_name', 'part_slot', 'target_entity_id' 或 'target_pos'}
+        """
+        return None
+
+    def choose_target_part(self, game_state, mech, defender):
+        """获得任意选择权时，选择目标部位槽位。"""
+        if isinstance(defender, Mech):
+            damaged = [s for s, p in defender.parts.items() if p and p.status == 'damaged']
+            if damaged:
+                return damaged[0]
+            core = defender.parts.get('core')
+            if core and core.status != 'destroyed':
+                return 'core'
+            valid = [s for s, p in defender.parts.items() if p and p.status != 'destroyed']
+            if valid:
+                return valid[0]
+        return 'core'
+
+    def choose_rerolls(self, game_state, mech, pending_combat):
+        """专注重投: 返回 (攻击骰选择, 防御骰选择)，默认不重投。"""
+        return [], []
+
+    def choose_effect(self, game_state, mech, options):
+        """溢出效果选择: 默认选择第一个可用效果。"""
+        return options[0] if options else None
+
+
+class PassivePolicy(PlayerPolicy):
+    """什么都不做的玩家 (每回合直接结束)。"""
+    pass
+
+
+class GreedyPolicy(PlayerPolicy):
+    """
+    贪心玩家策略。
+    复用 ai_system 的动作强度评估: 能攻击就选最强的攻击，否则用移动动作接近敌人。
+    """
+
+    def _enemy_mechs(self, game_state, mech):
+        return [e for e in game_state.entities.values()
+                if isinstance(e, Mech) and e.controller != mech.controller and e.status != 'destroyed']
+
+    def _nearest_enemy(self, game_state, mech):
+        enemies = self._enemy_mechs(game_state, mech)
+        if not enemies:
+            return None
+        return min(enemies, key=lambda e: _get_distance(mech.pos, e.pos))
+
+    def _usable_actions(self, mech, game_state, action_types):
+        """返回本回合仍可执行的 (action, slot) 列表 (已检查使用次数、AP/TP、弹药和起手时机)。"""
+        usable = []
+        for action, slot in mech.get_all_actions():
+            if action.action_type not in action_types:
+                continue
+            if (slot, action.name) in mech.actions_used_this_turn:
+                continue
+            cost_ap, cost_tp = _get_action_cost(action)
+            if mech.player_ap < cost_ap or mech.player_tp < cost_tp:
+                continue
+            if action.ammo > 0 and game_state.ammo_counts.get((mech.id, slot, action.name), 0) <= 0:
+                continue
+            if not mech.opening_move_taken and action.action_type not in (mech.timing, '快速'):
+                continue
+            usable.append((action, slot))
+        return usable
+
+    def _ideal_distance(self, mech):
+        """根据武器射程决定理想的交战距离。"""
+        ranges = [a.range_val for a, _ in mech.get_all_actions() if a.action_type in ('射击', '快速')]
+        if any(a.action_type == '近战' for a, _ in mech.get_all_actions()):
+            return 1
+        return max(1, min(ranges)) if ranges else 1
+
+    def choose_timing(self, game_state, mech):
+        enemy = self._nearest_enemy(game_state, mech)
+        if not enemy:
+            return '移动'
+        dist = _get_distance(mech.pos, enemy.pos)
+        types = {a.action_type: a for a, _ in mech.get_all_actions()}
+        if '近战' in types and dist <= 2:
+            return '近战'
+        shooting = [a for a, _ in mech.get_all_actions() if a.action_type == '射击']
+        if shooting and any(dist <= a.range_val for a in shooting):
+            return '射击'
+        if '抛射' in types and any(dist <= a.range_val for a, _ in mech.get_all_actions() if a.action_type == '抛射'):
+            return '抛射'
+        return '移动'
+
+    def choose_stance(self, game_state, mech):
+        if mech.timing in ('近战', '射击', '抛射'):
+            return 'attack'
+        return 'agile'
+
+    def choose_adjustment(self, game_state, mech):
+        enemy = self._nearest_enemy(game_state, mech)
+        if not enemy or mech.player_tp < 1:
+            return None
+        desired = _get_orientation_to_target(mech.pos, enemy.pos)
+        if is_in_forward_arc(mech.pos, mech.orientation, enemy.pos):
+            return None
+        return 'turn', desired
+
+    def choose_main_action(self, game_state, mech):
+        enemy = self._nearest_enemy(game_state, mech)
+        if not enemy:
+            return None
+
+        # 1. 攻击
+        is_locked, _ = get_player_lock_status(game_state, mech)
+        attacks = self._usable_actions(mech, game_state, ATTACK_ACTION_TYPES)
+        s_count = sum(1 for a, _ in attacks if a.cost == 'S')
+        best = None
+        for action, slot in attacks:
+            if is_locked and action.action_type == '射击':
+                continue
+            targets, launch_cells = game_state.calculate_attack_range(mech, action)
+            strength = _evaluate_action_strength(action, s_count, True)
+            if strength <= 0:
+                continue
+            target = next((t['entity'] for t in targets
+                           if isinstance(t['entity'], Mech) and t['entity'].controller != mech.controller), None)
+            choice = None
+            if target:
+                choice = {'kind': 'attack', 'action_name': action.name, 'part_slot': slot,
+                          'target_entity_id': target.id}
+            elif action.action_type == '抛射' and launch_cells:
+                cell = min(launch_cells, key=lambda c: _get_distance(c, enemy.pos))
+                choice = {'kind': 'attack', 'action_name': action.name, 'part_slot': slot,
+                          'target_pos': list(cell)}
+                strength *= 0.5  # 没有直接命中目标，打折
+            if choice and (best is None or strength > best[0]):
+                best = (strength, choice)
+        if best:
+            return best[1]
+
+        # 2. 移动
+        moves = self._usable_actions(mech, game_state, ('移动',))
+        if not moves:
+            return None
+        ideal = self._ideal_distance(mech)
+        current_score = abs(_get_distance(mech.pos, enemy.pos) - ideal)
+        best_move = None
+        for action, slot in moves:
+            reachable = game_state.calculate_move_range(
+                mech, action.range_val, is_flight=bool(action.effects.get("flight_movement"))
+            )
+            for pos in reachable:
+                score = abs(_get_distance(pos, enemy.pos) - ideal)
+                if score < current_score and (best_move is None or score < best_move[0]):
+                    best_move = (score, action, slot, pos)
+        if not best_move:
+            return None
+        _, action, slot, pos = best_move
+        return {'kind': 'move', 'action_name': action.name, 'part_slot': slot, 'target_pos': list(pos),
+                'final_orientation': _get_orientation_to_target(pos, enemy.pos)}
+
+
+POLICIES = {
+    'passive': PassivePolicy,
+    'greedy': GreedyPolicy,
+}
+
+
+# --- 对局运行器 ---
+
+class HeadlessMatch:
+    """
+    驱动一局完整的对局。
+    每次调用控制器后都会像 GET /game 那样清理视觉事件与 last_pos，并顺带统计伤害。
+    [v_REPRO] 对局在 deterministic_planning() 中运行: Ace 规划不受墙钟时间影响，
+    且每局使用独立的置换表，同一种子的结果与机器负载和对局顺序无关。
+    """
+
+    def __init__(self, game_state, policy=None, keep_log=False):
+        self.game_state = game_state
+        self.policy = policy or GreedyPolicy()
+        self.keep_log = keep_log
+        self.log = []
+        self.turns = 0
+        self.errors = 0
+        self.attack_results = Counter()
+        self.damage_taken = {'player': Counter(), 'ai': Counter()}
+        self._part_snapshot = self._snapshot_parts()
+
+    # --- 统计 ---
+
+    def _snapshot_parts(self):
+        snapshot = {}
+        for entity in self.game_state.entities.values():
+            if isinstance(entity, Mech):
+                link = entity.pilot.link_points if entity.pilot else 0
+                snapshot[entity.id] = (entity.controller, entity.status, link,
+                                       {slot: p.status for slot, p in entity.parts.items() if p})
+        return snapshot
+
+    def _record_changes(self):
+        """对比部件状态快照，累计双方承受的伤害，并消费本步产生的视觉事件。"""
+        new_snapshot = self._snapshot_parts()
+        for eid, (controller_name, status, link, parts) in new_snapshot.items():
+            old = self._part_snapshot.get(eid)
+            if not old:
+                continue
+            stats = self.damage_taken.setdefault(controller_name, Counter())
+            for slot, part_status in parts.items():
+                old_status = old[3].get(slot)
+                if part_status == old_status:
+                    continue
+                if part_status == 'damaged':
+                    stats['parts_damaged'] += 1
+                elif part_status == 'destroyed':
+                    stats['parts_destroyed'] += 1
+            if link < old[2]:
+                stats['link_lost'] += old[2] - link
+            if status == 'destroyed' and old[1] != 'destroyed':
+                stats['mechs_destroyed'] += 1
+        self._part_snapshot = new_snapshot
+
+        for event in self.game_state.visual_events or []:
+            if event.get('type') == 'attack_result':
+                self.attack_results[event.get('result_text')] += 1
+        self.game_state.visual_events = []
+        for entity in self.game_state.entities.values():
+            entity.last_pos = None
+
+    def _call(self, handler, *args):
+        """调用控制器函数，统一 4 元组 / 5 元组的返回格式，返回 (result_data, error)。"""
+        response = handler(*args)
+        if len(response) == 5:
+            game_state, log, _, result_data, error = response
+        else:
+            game_state, log, result_data, error = response
+        self.game_state = game_state
+        if self.keep_log:
+            self.log.extend(log)
+        self._record_changes()
+        return result_data, error
+
+    # --- 流程 ---
+
+    @property
+    def finished(self):
+        return bool(self.game_state.game_over)
+
+    def _player(self):
+        return self.game_state.get_player_mech()
+
+    def _pending_mech(self):
+        for entity in self.game_state.entities.values():
+            if isinstance(entity, Mech) and entity.pending_combat:
+                return entity
+        return None
+
+    def resolve_interrupts(self):
+        """处理所有待定的重投 / 效果选择中断 (等价于前端弹窗的提交)。"""
+        for _ in range(MAX_INTERRUPTS_PER_STEP):
+            pending_mech = self._pending_mech()
+            if not pending_mech:
+                return
+            player_mech = self._player()
+            pending = pending_mech.pending_combat
+            if pending.get('stage') == 'AWAITING_EFFECT_CHOICE' and pending_mech is player_mech:
+                choice = self.policy.choose_effect(self.game_state, player_mech,
+                                                   pending.get('available_effect_options', []))
+                _, error = self._call(controller.handle_resolve_effect_choice, self.game_state, player_mech, choice)
+            else:
+                attacker_sel, defender_sel = self.policy.choose_rerolls(self.game_state, player_mech, pending)
+                _, error = self._call(controller.handle_resolve_reroll, self.game_state, player_mech, {
+                    'reroll_selections_attacker': attacker_sel,
+                    'reroll_selections_defender': defender_sel,
+                })
+            if error:
+                self.errors += 1
+                pending_mech.pending_combat = None
+        # 达到上限仍未解决: 强制清除，避免卡死
+        pending_mech = self._pending_mech()
+        if pending_mech:
+            self.errors += 1
+            pending_mech.pending_combat = None
+
+    def _execute_main_action(self, player_mech, choice):
+        if choice['kind'] == 'move':
+            return self._call(controller.handle_move_player, self.game_state, player_mech,
+                              choice['action_name'], choice['part_slot'],
+                              choice['target_pos'], choice['final_orientation'])
+
+        data = {k: v for k, v in choice.items() if k != 'kind'}
+        result_data, error = self._call(controller.handle_execute_attack, self.game_state, player_mech, data)
+        if not error and result_data and result_data.get('action_required') == 'select_part':
+            defender = self.game_state.get_entity_by_id(data.get('target_entity_id'))
+            data['target_part_name'] = self.policy.choose_target_part(self.game_state, player_mech, defender)
+            result_data, error = self._call(controller.handle_execute_attack, self.game_state, player_mech, data)
+        return result_data, error
+
+    def play_player_turn(self):
+        """玩家回合: 时机 -> 姿态 -> 调整 -> 主动作。"""
+        gs = self.game_state
+        player_mech = self._player()
+        if not player_mech or player_mech.turn_phase != 'timing':
+            self.errors += 1
+            return
+
+        # 阶段 1: 时机 (可能触发 Ace 抢先手)
+        self._call(controller.handle_select_timing, gs, player_mech, self.policy.choose_timing(gs, player_mech))
+        _, error = self._call(controller.handle_confirm_timing, self.game_state, player_mech)
+        if error:
+            self.errors += 1
+            return
+        self.resolve_interrupts()
+        if self.finished:
+            return
+
+        # 阶段 2: 姿态
+        self._call(controller.handle_change_stance, self.game_state, player_mech,
+                   self.policy.choose_stance(self.game_state, player_mech))
+        self._call(controller.handle_confirm_stance, self.game_state, player_mech)
+
+        # 阶段 3: 调整
+        adjustment = self.policy.choose_adjustment(self.game_state, player_mech)
+        error = "skip"
+        if adjustment and adjustment[0] == 'move':
+            _, error = self._call(controller.handle_adjust_move, self.game_state, player_mech,
+                                  adjustment[1], adjustment[2])
+        elif adjustment and adjustment[0] == 'turn':
+            _, error = self._call(controller.handle_change_orientation, self.game_state, player_mech, adjustment[1])
+        if error:
+            self._call(controller.handle_skip_adjustment, self.game_state, player_mech)
+
+        # 阶段 4: 主动作
+        for _ in range(MAX_MAIN_ACTIONS_PER_TURN):
+            choice = self.policy.choose_main_action(self.game_state, player_mech)
+            if not choice:
+                break
+            _, error = self._execute_main_action(player_mech, choice)
+            if error:
+                # 与网页一致: 出错的动作不会改变回合流程，直接结束主动作阶段
+                self.errors += 1
+                break
+            self.resolve_interrupts()
+            if self.finished:
+                return
+
+    def play_enemy_turn(self):
+        """结束回合: AI 阶段 + 抛射物阶段 (与 /end_turn + /run_projectile_phase 相同)。"""
+        _, error = self._call(controller.handle_end_turn, self.game_state)
+        if error:
+            self.errors += 1
+            return
+        self.resolve_interrupts()
+        for _ in range(MAX_PROJECTILE_PHASE_STEPS):
+            if self.finished or not self.game_state.projectile_phase_active:
+                break
+            self._call(controller.handle_run_projectile_phase, self.game_state)
+            self.resolve_interrupts()
+
+    def run(self, max_turns=30):
+        """跑完整局 (或达到回合上限)，返回结果字典。"""
+        with deterministic_planning():
+            while not self.finished and self.turns < max_turns:
+                self.turns += 1
+                self.play_player_turn()
+                if self.finished:
+                    break
+                self.play_enemy_turn()
+        return self.result()
+
+    def result(self):
+        gs = self.game_state
+        if gs.game_over in ('player_win', 'ai_defeated_in_range'):
+            winner = 'player'
+        elif gs.game_over == 'ai_win':
+            winner = 'ai'
+        else:
+            winner = 'draw'
+        return {
+            'winner': winner,
+            'game_over': gs.game_over,
+            'game_mode': gs.game_mode,
+            'turns': self.turns,
+            'ai_defeat_count': gs.ai_defeat_count,
+            'player_damage_taken': dict(self.damage_taken.get('player', {})),
+            'ai_damage_taken': dict(self.damage_taken.get('ai', {})),
+            'attack_results': dict(self.attack_results),
+            'errors': self.errors,
+        }
+
+
+def simulate_match(player_selection=None, ai_loadout_key='standard', game_mode='duel',
+                   player_pilot_name=DEFAULT_PLAYER_PILOT, policy=None, seed=None, max_turns=30,
+                   keep_log=False, quiet=True, board_size=None):
+    """
+    跑一局完整的无头对局。
+
+    Args:
+        player_selection (dict): 玩家部件选择 (同机库表单)，默认 DEFAULT_PLAYER_SELECTION
+        ai_loadout_key (str): AI_LOADOUTS 中的键
+        game_mode (str): 'duel' / 'standard' / 'horde' / 'range'
+        policy (PlayerPolicy): 玩家策略，默认 GreedyPolicy
+        seed (int): 本局随机种子 (None 则随机生成)，传给 GameState.rng
+        max_turns (int): 回合上限，达到后记为平局
+        keep_log (bool): 是否在结果中附带完整战斗日志
+        quiet (bool): 屏蔽游戏逻辑中的 print 输出
+        board_size (tuple): (宽, 高)，默认 10x10
+
+    Returns:
+        dict: 对局结果 (winner / turns / 双方伤害统计 等)
+    """
+    started = time.perf_counter()
+    sink = io.StringIO() if quiet else None
+    with contextlib.redirect_stdout(sink) if quiet else contextlib.nullcontext():
+        board_width, board_height = board_size or (None, None)
+        game_state = GameState(player_selection or DEFAULT_PLAYER_SELECTION, ai_loadout_key, game_mode,
+                               player_pilot_name, seed=seed, board_width=board_width, board_height=board_height)
+        match = HeadlessMatch(game_state, policy or GreedyPolicy(), keep_log=keep_log)
+        result = match.run(max_turns)
+
+    result['ai_loadout'] = ai_loadout_key
+    result['seed'] = game_state.rng.seed
+    result['elapsed_ms'] = round((time.perf_counter() - started) * 1000, 3)
+    if keep_log:
+        result['log'] = match.log
+    return result
+
+
+def summarize_results(results):
+    """汇总多局结果: 胜率、平均回合数与平均伤害。"""
+    total = len(results)
+    if not total:
+        return {}
+    winners = Counter(r['winner'] for r in results)
+    summary = {
+        'matches': total,
+        'player_win_rate': winners['player'] / total,
+        'ai_win_rate': winners['ai'] / total,
+        'draw_rate': winners['draw'] / total,
+        'avg_turns': sum(r['turns'] for r in results) / total,
+        'avg_ms': sum(r.get('elapsed_ms', 0) for r in results) / total,
+    }
+    for side in ('player', 'ai'):
+        totals = Counter()
+        for r in results:
+            totals.update(r[f'{side}_damage_taken'])
+        for key, value in totals.items():
+            summary[f'avg_{side}_{key}'] = value / total
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="无头对局模拟器")
+    parser.add_argument('--ai', default='standard', choices=sorted(AI_LOADOUTS.keys()), help="AI 配置")
+    parser.add_argument('--mode', default='duel', choices=['duel', 'standard', 'horde', 'range'])
+    parser.add_argument('--policy', default='greedy', choices=sorted(POLICIES.keys()))
+    parser.add_argument('--matches', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--max-turns', type=int, default=30)
+    parser.add_argument('--board', default='standard', choices=list(BOARD_SIZES), help="棋盘尺寸")
+    parser.add_argument('--verbose', action='store_true', help="打印第一局的完整战斗日志")
+    args = parser.parse_args(argv)
+
+    results = []
+    for i in range(args.matches):
+        seed = None if args.seed is None else args.seed + i
+        result = simulate_match(ai_loadout_key=args.ai, game_mode=args.mode, policy=POLICIES[args.policy](),
+                                seed=seed, max_turns=args.max_turns, keep_log=args.verbose and i == 0,
+                                board_size=BOARD_SIZES[args.board])
+        if args.verbose and i == 0:
+            print("\n".join(result.pop('log')))
+        results.append(result)
+
+    for key, value in summarize_results(results).items():
+        print(f"{key}: {value:.3f}" if isinstance(value, float) else f"{key}: {value}")
+
+
+if __name__ == '__main__':
+    main()
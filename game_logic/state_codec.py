@@ -0,0 +1,403 @@
+"""
+[NEW] GameState 的紧凑二进制编码 (用于 session 持久化)。
+
+GameState.to_dict() 会把每个部件、每个动作 (名称、效果说明、图片路径……) 和驾驶员的
+全部静态数据写进 session。这些数据在对局中从不改变，且都来自 game_logic/database 的模板。
+本编码只保存可变状态:
+
+- 部件:     与模板一致时只存 (模板 ID, status)，否则回退为完整的 to_dict()
+- 驾驶员:   与模板一致时只存 (模板 ID, link_points)
+- 机甲:     位置 / 朝向 / 状态 / 姿态 / AP / TP / 回合阶段 / 已用动作 / pending_combat 等
+- 抛射物:   template_key + 可变字段 (动作列表由 Projectile 模板重建)
+- 对局:     棋盘尺寸、模式、弹药、视觉事件、抛射物队列、随机子流计数
+
+模板 ID 是模板名称的 32 位 blake2b 摘要: 与数据库中的定义顺序无关，增删模板不影响已有编码，
+也比中文名称短得多。
+
+编码分两层:
+- 快照 (snapshot_state / restore_state): 纯数据 (实体记录, 弹药, 对局字段)，与实时对象不共享可变容器
+- 字节串 (encode_state / decode_state): 3 字节头 (魔数 + 版本号) + 快照的 pickle (最高协议)
+
+[v_DELTA] diff_snapshots 比较两个快照，得到结构化的变更集 (哪些实体的哪些字段、哪些弹药键、
+哪些对局字段变了)；apply_changes 把变更集应用回快照。state_journal 用它们实现增量写入。
+
+版本号不匹配或模板缺失时抛出 StateCodecError (调用方按 session 失效处理)。
+decode_state 同时接受旧的 to_dict() 字典，已有的 session 可以无缝迁移。
+"""
+import copy
+import hashlib
+import pickle
+from functools import lru_cache
+
+from .data_models import Mech, Part, Pilot, Projectile, Drone, GameEntity
+from .game_logic import GameState
+from .entity_registry import EntityRegistry
+from .bitboard import get_geometry
+from .rng import GameRNG
+from .zobrist import AmmoLedger
+
+# 编码格式版本 (改变记录布局时递增)
+# 2: 实体记录展平为按字段排列的元组 (便于逐字段比较)
+# 3: 对局字段增加 state_version
+STATE_CODEC_VERSION = 3
+_MAGIC = b'MS'
+_HEADER = _MAGIC + bytes((STATE_CODEC_VERSION,))
+
+_MECH_SLOTS = ('core', 'legs', 'left_arm', 'right_arm', 'backpack')
+
+# 实体记录的类型标记
+_KIND_MECH = 'M'
+_KIND_PROJECTILE = 'P'
+_KIND_DRONE = 'D'
+_KIND_DICT = '*'  # 回退: 完整的 to_dict()
+
+# 各类实体记录的字段名 (记录是与之等长的元组，第 0 项是类型标记)
+_BASE_FIELDS = ('kind', 'id', 'controller', 'controller_css', 'pos', 'orientation', 'name', 'status', 'last_pos')
+RECORD_FIELDS = {
+    _KIND_MECH: _BASE_FIELDS + _MECH_SLOTS + (
+        'pilot', 'stance', 'player_ap', 'player_tp', 'turn_phase', 'timing', 'opening_move_taken',
+        'actions_used_this_turn', 'pending_combat', 'has_acted_early', 'cached_ace_plan'),
+    _KIND_PROJECTILE: _BASE_FIELDS + (
+        'template_key', 'evasion', 'stance', 'life_span', 'electronics', 'move_range', 'has_acted', 'core_status'),
+    _KIND_DRONE: _BASE_FIELDS,
+    _KIND_DICT: ('kind', 'data'),
+}
+_FIELD_INDEX = {kind: {name: i for i, name in enumerate(fields)} for kind, fields in RECORD_FIELDS.items()}
+
+# 对局字段 (快照的第三项，与之等长的元组)
+GAME_FIELDS = ('board_width', 'board_height', 'game_mode', 'ai_defeat_count', 'game_over', 'visual_events',
+               'pending_projectile_queue', 'projectile_phase_active', 'rng', 'state_version')
+_GAME_FIELD_INDEX = {name: i for i, name in enumerate(GAME_FIELDS)}
+
+# [v_VERSION] 只用于渲染的临时字段 (动画的起点、待播放的视觉事件)。
+# 只改变这些字段的保存不算新版本 (见 is_transient_change)
+TRANSIENT_RECORD_FIELDS = frozenset(('last_pos',))
+TRANSIENT_GAME_FIELDS = frozenset(('visual_events',))
+
+_MISSING = object()
+
+
+class StateCodecError(ValueError):
+    """编码数据无法解码 (版本不兼容、数据损坏或引用的模板不存在)。"""
+
+
+# --- 模板 ID ---
+
+@lru_cache(maxsize=None)
+def template_id(name):
+    """模板名称 -> 稳定的 32 位模板 ID。"""
+    return int.from_bytes(hashlib.blake2b(name.encode('utf-8'), digest_size=4).digest(), 'little')
+
+
+_template_name_cache = {}  # {模板类: {模板 ID: 模板名称}}
+
+
+def _resolve_template(cls, tid):
+    """模板 ID -> 已注册的模板 (新注册的模板在第一次未命中时纳入映射)。"""
+    names = _template_name_cache.get(cls)
+    if names is None or tid not in names:
+        names = _template_name_cache[cls] = {template_id(name): name for name in cls.template_names()}
+    name = names.get(tid)
+    template = cls.get_template(name) if name is not None else None
+    if template is None:
+        raise StateCodecError(f"未知的{cls.__name__}模板 ID: {tid}")
+    return template
+
+
+# --- 部件 / 驾驶员 ---
+
+def _encode_part(part):
+    if part is None:
+        return None
+    if part.matches_template():
+        return template_id(part.name), part.status
+    return part.to_dict()
+
+
+def _decode_part(record):
+    if record is None:
+        return None
+    if isinstance(record, dict):
+        return Part.from_dict(record)
+    tid, status = record
+    return _resolve_template(Part, tid).instantiate(status)
+
+
+def _encode_pilot(pilot):
+    if pilot is None:
+        return None
+    if pilot.matches_template():
+        return template_id(pilot.name), pilot.link_points
+    return pilot.to_dict()
+
+
+def _decode_pilot(record):
+    if record is None:
+        return None
+    if isinstance(record, dict):
+        return Pilot.from_dict(record)
+    tid, link_points = record
+    return _resolve_template(Pilot, tid).instantiate(link_points)
+
+
+# --- 实体 ---
+
+def _detached(value):
+    """可变容器 (列表 / 字典) 深拷贝一份，避免快照与实时对象互相影响。"""
+    if value is None or isinstance(value, (str, int, float, bool, tuple)):
+        return value
+    return copy.deepcopy(value)
+
+
+def _encode_entity(entity, detach):
+    keep = _detached if detach else (lambda value: value)
+    base = (entity.id, entity.controller, entity.controller_css, entity.pos, entity.orientation,
+            entity.name, entity.status, entity.last_pos)
+    if type(entity) is Mech:
+        parts = entity.parts
+        return (_KIND_MECH, *base, *(_encode_part(parts.get(slot)) for slot in _MECH_SLOTS),
+                _encode_pilot(entity.pilot),
+                entity.stance, entity.player_ap, entity.player_tp, entity.turn_phase, entity.timing,
+                entity.opening_move_taken, keep(entity.actions_used_this_turn), keep(entity.pending_combat),
+                entity.has_acted_early, keep(entity.cached_ace_plan))
+    if type(entity) is Projectile and Projectile.get_template_actions(entity.template_key) is not None:
+        core = entity.parts.get('core')
+        return (_KIND_PROJECTILE, *base, entity.template_key, entity.evasion, entity.stance, entity.life_span,
+                entity.electronics, entity.move_range, entity.has_acted, core.status if core else None)
+    if type(entity) is Drone:
+        return (_KIND_DRONE, *base)
+    return _KIND_DICT, entity.to_dict()
+
+
+def _restore_base(entity, record):
+    entity.controller_css = record[3]
+    entity.status = record[7]
+    entity.last_pos = record[8]
+
+
+def _decode_entity(record, detach):
+    kind = record[0]
+    if kind == _KIND_DICT:
+        return GameEntity.from_dict(record[1])
+    keep = _detached if detach else (lambda value: value)
+    entity_id, controller, _, pos, orientation, name = record[1:7]
+
+    if kind == _KIND_MECH:
+        core, legs, left_arm, right_arm, backpack = (_decode_part(p) for p in record[9:14])
+        (pilot, stance, player_ap, player_tp, turn_phase, timing, opening_move_taken,
+         actions_used, pending_combat, has_acted_early, cached_ace_plan) = record[14:]
+        mech = Mech(entity_id, controller, pos, orientation, name, core, legs, left_arm, right_arm, backpack,
+                    pilot=_decode_pilot(pilot))
+        mech.stance = stance
+        mech.player_ap = player_ap
+        mech.player_tp = player_tp
+        mech.turn_phase = turn_phase
+        mech.timing = timing
+        mech.opening_move_taken = opening_move_taken
+        mech.actions_used_this_turn = keep(actions_used)
+        mech.pending_combat = keep(pending_combat)
+        mech.has_acted_early = has_acted_early
+        mech.cached_ace_plan = keep(cached_ace_plan)
+        _restore_base(mech, record)
+        return mech
+
+    if kind == _KIND_PROJECTILE:
+        template_key, evasion, stance, life_span, electronics, move_range, has_acted, core_status = record[9:]
+        actions = Projectile.get_template_actions(template_key)
+        if actions is None:
+            raise StateCodecError(f"未知的抛射物模板: {template_key}")
+        projectile = Projectile(entity_id, controller, pos, name, evasion, stance, actions, life_span,
+                                electronics=electronics, move_range=move_range, template_key=template_key)
+        projectile.has_acted = has_acted
+        if core_status is not None:
+            projectile.parts['core'].status = core_status
+        _restore_base(projectile, record)
+        return projectile
+
+    if kind == _KIND_DRONE:
+        drone = Drone(entity_id, controller, pos, orientation, name)
+        _restore_base(drone, record)
+        return drone
+
+    raise StateCodecError(f"未知的实体记录类型: {kind!r}")
+
+
+# --- 快照 ---
+
+def snapshot_state(game_state, detach=True):
+    """
+    GameState -> 快照 ({实体ID: 记录}, {弹药键: 剩余}, 对局字段元组)。
+    detach=False 时快照可能与实时对象共享可变容器 (仅用于立即序列化的场合)。
+    """
+    keep = _detached if detach else (lambda value: value)
+    entities = {eid: _encode_entity(entity, detach) for eid, entity in game_state.entities.items()}
+    game = (
+        game_state.board_width,
+        game_state.board_height,
+        game_state.game_mode,
+        game_state.ai_defeat_count,
+        keep(game_state.game_over),
+        keep(game_state.visual_events),
+        keep(game_state.pending_projectile_queue),
+        game_state.projectile_phase_active,
+        game_state.rng.to_dict(),
+        game_state.state_version,
+    )
+    return entities, dict(game_state.ammo_counts), game
+
+
+def snapshot_version(snapshot):
+    """[v_VERSION] 快照中的 state_version (对局字段元组的最后一项)。"""
+    return snapshot[2][-1]
+
+
+def restore_state(snapshot, detach=True):
+    """快照 -> GameState。detach=False 时直接使用快照中的容器 (快照之后不再使用的场合)。"""
+    keep = _detached if detach else (lambda value: value)
+    entities, ammo_counts, game = snapshot
+    (board_width, board_height, game_mode, ai_defeat_count, game_over, visual_events,
+     pending_projectile_queue, projectile_phase_active, rng, state_version) = game
+
+    game_state = GameState.__new__(GameState)
+    game_state.rng = GameRNG.from_dict(rng)
+    game_state.board_width = board_width
+    game_state.board_height = board_height
+    game_state.entities = EntityRegistry(get_geometry(board_width, board_height))
+    for eid, record in entities.items():
+        game_state.entities[eid] = _decode_entity(record, detach)
+    game_state.game_mode = game_mode
+    game_state.ai_defeat_count = ai_defeat_count
+    game_state.game_over = keep(game_over)
+    game_state.ammo_counts = AmmoLedger(ammo_counts)
+    game_state.visual_events = keep(visual_events)
+    game_state.pending_projectile_queue = keep(pending_projectile_queue)
+    game_state.projectile_phase_active = projectile_phase_active
+    game_state.state_version = state_version
+    return game_state
+
+
+# --- [v_DELTA] 变更集 ---
+
+def diff_snapshots(old, new):
+    """
+    计算从快照 old 到 new 的变更集 (没有变化时返回空字典)。只包含有变化的键:
+        'entities':     {实体ID: {字段名: 新值}}   已有实体的字段变化
+        'added':        {实体ID: 完整记录}         新实体 (或类型改变的实体)
+        'removed':      [实体ID, ...]
+        'order':        [实体ID, ...]              实体顺序无法由以上推出时的完整顺序
+        'ammo':         {弹药键: 新值}
+        'ammo_removed': [弹药键, ...]
+        'game':         {对局字段名: 新值}
+    """
+    old_entities, old_ammo, old_game = old
+    new_entities, new_ammo, new_game = new
+    changes = {}
+
+    changed, added = {}, {}
+    for eid, record in new_entities.items():
+        old_record = old_entities.get(eid)
+        if old_record == record:
+            continue
+        if old_record is None or old_record[0] != record[0] or len(old_record) != len(record):
+            added[eid] = record
+        else:
+            fields = RECORD_FIELDS[record[0]]
+            changed[eid] = {fields[i]: value for i, value in enumerate(record) if value != old_record[i]}
+    removed = [eid for eid in old_entities if eid not in new_entities]
+    if changed:
+        changes['entities'] = changed
+    if added:
+        changes['added'] = added
+    if removed:
+        changes['removed'] = removed
+    # apply_changes 的默认顺序: 保留的旧实体在前 (原顺序)，新实体在后
+    expected_order = [eid for eid in old_entities if eid in new_entities]
+    expected_order.extend(eid for eid in new_entities if eid not in old_entities)
+    if list(new_entities) != expected_order:
+        changes['order'] = list(new_entities)
+
+    ammo = {key: value for key, value in new_ammo.items() if old_ammo.get(key, _MISSING) != value}
+    ammo_removed = [key for key in old_ammo if key not in new_ammo]
+    if ammo:
+        changes['ammo'] = ammo
+    if ammo_removed:
+        changes['ammo_removed'] = ammo_removed
+
+    game = {name: value for name, value, old_value in zip(GAME_FIELDS, new_game, old_game) if value != old_value}
+    if game:
+        changes['game'] = game
+    return changes
+
+
+def apply_changes(snapshot, changes):
+    """把 diff_snapshots 的变更集应用到快照上，返回新快照 (不修改原快照)。"""
+    entities, ammo, game = snapshot
+    if not changes:
+        return snapshot
+    entities = dict(entities)
+    for eid in changes.get('removed', ()):
+        entities.pop(eid, None)
+    for eid, fields in changes.get('entities', {}).items():
+        record = list(entities[eid])
+        index = _FIELD_INDEX[record[0]]
+        for name, value in fields.items():
+            record[index[name]] = value
+        entities[eid] = tuple(record)
+    entities.update(changes.get('added', {}))
+    if 'order' in changes:
+        entities = {eid: entities[eid] for eid in changes['order']}
+
+    ammo = dict(ammo)
+    for key in changes.get('ammo_removed', ()):
+        ammo.pop(key, None)
+    ammo.update(changes.get('ammo', {}))
+
+    if 'game' in changes:
+        game = list(game)
+        for name, value in changes['game'].items():
+            game[_GAME_FIELD_INDEX[name]] = value
+        game = tuple(game)
+    return entities, ammo, game
+
+
+def is_transient_change(changes):
+    """[v_VERSION] 变更集是否只涉及临时字段 (TRANSIENT_RECORD_FIELDS / TRANSIENT_GAME_FIELDS)。"""
+    if set(changes) - {'entities', 'game'}:
+        return False
+    if not TRANSIENT_GAME_FIELDS.issuperset(changes.get('game', ())):
+        return False
+    return all(TRANSIENT_RECORD_FIELDS.issuperset(fields) for fields in changes.get('entities', {}).values())
+
+
+# --- 字节串 ---
+
+def encode_snapshot(snapshot):
+    """快照 -> 带版本头的字节串。"""
+    return _HEADER + pickle.dumps(snapshot, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def decode_snapshot(data):
+    """encode_snapshot / encode_state 的结果 -> 快照。"""
+    if not isinstance(data, (bytes, bytearray)) or data[:2] != _MAGIC:
+        raise StateCodecError("不是有效的状态编码。")
+    if data[2] != STATE_CODEC_VERSION:
+        raise StateCodecError(f"不支持的状态编码版本: {data[2]} (当前: {STATE_CODEC_VERSION})")
+    try:
+        return pickle.loads(data[3:])
+    except (pickle.UnpicklingError, EOFError, TypeError, ValueError) as e:
+        raise StateCodecError(f"状态编码已损坏: {e}") from e
+
+
+def encode_state(game_state):
+    """将 GameState 编码为紧凑的二进制串 (只包含可变状态)。"""
+    return encode_snapshot(snapshot_state(game_state, detach=False))
+
+
+def decode_state(data):
+    """
+    从 encode_state() 的结果重建 GameState。
+    也接受旧格式 (GameState.to_dict() 的字典) 和 None (与 GameState.from_dict 的行为一致)。
+    """
+    if data is None or isinstance(data, dict):
+        return GameState.from_dict(data)
+    return restore_state(decode_snapshot(data), detach=False)
@@ -0,0 +1,391 @@
+"""
+[NEW] 对局状态日志: 基准快照 + 追加写入的增量 (变更集)。
+
+每局游戏的日志是一串帧:
+    'B' 基准帧: encode_snapshot() 的结果 (带版本头)
+    'D' 增量帧: diff_snapshots() 变更集的 pickle
+
+保存时只把本次请求改变的内容 (哪些实体的哪些字段、哪些弹药键) 追加到日志末尾，
+写入量与变化量成正比，而不是与对局规模成正比。增量帧过多 (或累计超过基准帧大小) 时
+压缩: 以当前状态写一个新的基准帧，替换整个日志。读取时从基准帧开始依次应用增量帧。
+
+[v_STORE] 帧的存储是可替换的持久层 (StateStore 的持久层，见 state_store.py):
+- FileStateJournal:   目录中每局一个文件 (帧 = 1 字节类型 + 4 字节长度 + 8 字节版本 + 内容)
+- SqliteStateJournal: 单个 SQLite 数据库 (多个 worker 进程可以共享)
+公共逻辑 (重放、变更集、压缩策略) 在 StateJournal 中；子类只实现四个存储原语。
+
+[v_VERSION] 写入是基于版本的比较并交换: 每帧记录写入后的 state_version，写帧前在持久层的锁内
+(文件锁 / SQLite 的 BEGIN IMMEDIATE) 检查日志中最新的版本是否等于本次写入所基于的版本
+(游标的版本)。不一致说明另一个 worker 进程已经保存了这局游戏，抛出 StateConflictError，
+不写入任何内容 (两个进程基于同一版本的修改不会被合并进同一个日志)。
+"""
+import contextlib
+import os
+import pickle
+import sqlite3
+import struct
+import threading
+import uuid
+
+try:
+    import fcntl
+except ImportError:  # Windows: 文件日志的写锁只在进程内有效
+    fcntl = None
+
+from .state_codec import (StateCodecError, snapshot_state, restore_state, diff_snapshots, apply_changes,
+                          is_transient_change, encode_snapshot, decode_snapshot, snapshot_version)
+
+# 增量帧达到该数量时压缩
+JOURNAL_MAX_DELTAS = 32
+
+FRAME_BASE = b'B'
+FRAME_DELTA = b'D'
+_KEY_CHARS = frozenset('0123456789abcdef')
+
+
+class StateConflictError(Exception):
+    """[v_VERSION] 日志中的最新版本与本次写入所基于的版本不一致 (另一个 worker 已经保存了这局游戏)。"""
+
+
+class StateUnavailableError(Exception):
+    """
+    [v_VERSION] 对局暂时无法读取 (持久层读取出错、版本仍落后于已知的版本，或等待其他请求超时)。
+    与日志不存在 / 已损坏不同，对局本身完好，稍后重试即可。
+    """
+
+
+class JournalCursor:
+    """一局游戏在内存中的日志位置: 最后写入的快照，以及用于判断压缩时机的计数。"""
+
+    __slots__ = ('key', 'snapshot', 'deltas', 'base_bytes', 'delta_bytes')
+
+    def __init__(self, key, snapshot, deltas=0, base_bytes=0, delta_bytes=0):
+        self.key = key
+        self.snapshot = snapshot  # 与实时对象不共享可变容器 (见 state_codec._detached)
+        self.deltas = deltas
+        self.base_bytes = base_bytes
+        self.delta_bytes = delta_bytes
+
+
+class StateJournal:
+    """日志的公共逻辑。子类实现存储原语: read_frames / write_base / append_delta / discard。"""
+
+    def __init__(self, max_deltas=JOURNAL_MAX_DELTAS):
+        self.max_deltas = max_deltas
+
+    @staticmethod
+    def _check_key(key):
+        if not key or not _KEY_CHARS.issuperset(key):
+            raise ValueError(f"无效的日志键: {key!r}")
+        return key
+
+    @staticmethod
+    def _check_version(key, latest_version, expected_version):
+        """[v_VERSION] 日志中的最新版本 (日志不存在时为 None) 不等于 expected_version 时抛出 StateConflictError。"""
+        if expected_version is not None and latest_version != expected_version:
+            raise StateConflictError(
+                f"对局 {key} 的日志版本为 {latest_version}，本次写入基于版本 {expected_version}")
+
+    # --- 存储原语 ---
+    # [v_VERSION] version: 帧写入后的 state_version；expected_version: 写入所基于的版本，
+    # 与日志中最新的版本不一致时抛出 StateConflictError (None 表示不检查，仅用于新对局)。
+    # 检查和写入必须在同一个锁 / 事务内完成。
+
+    def read_frames(self, key):
+        """按写入顺序返回 [(帧类型, 内容), ...]；日志不存在时返回 None。"""
+        raise NotImplementedError
+
+    def write_base(self, key, payload, version, expected_version=None):
+        """用一个基准帧替换整个日志。"""
+        raise NotImplementedError
+
+    def append_delta(self, key, payload, version, expected_version):
+        """在日志末尾追加一个增量帧。"""
+        raise NotImplementedError
+
+    def discard(self, key):
+        """删除一局游戏的日志 (不存在时忽略)。"""
+        raise NotImplementedError
+
+    def close(self):
+        """释放持久层占用的资源。"""
+
+    # --- 读写 ---
+
+    def create(self, game_state):
+        """为一局新游戏创建日志 (立即写入基准帧)，返回其游标。"""
+        cursor, frame = self.new_cursor(game_state)
+        self.write(cursor.key, frame)
+        return cursor
+
+    def new_cursor(self, game_state):
+        """为一局新游戏分配日志键和游标，返回 (游标, 待写入的基准帧)。"""
+        snapshot = snapshot_state(game_state)
+        payload = encode_snapshot(snapshot)
+        frame = (FRAME_BASE, payload, game_state.state_version, None)
+        return JournalCursor(uuid.uuid4().hex, snapshot, base_bytes=len(payload)), frame
+
+    def open(self, key):
+        """
+        读取日志并重放所有增量，返回游标；日志不存在、已损坏或版本不兼容时返回 None。
+        持久层读取出错 (文件系统 / 数据库暂时不可用) 时抛出 StateUnavailableError。
+        """
+        try:
+            frames = self.read_frames(self._check_key(key))
+        except ValueError as e:
+            print(f"[状态日志] 无法读取日志 {key}: {e}")
+            return None
+        except (OSError, sqlite3.Error) as e:
+            raise StateUnavailableError(f"无法读取日志 {key}: {e}") from e
+        if not frames:
+            return None
+
+        cursor = None
+        try:
+            for kind, payload in frames:
+                if kind == FRAME_BASE:
+                    cursor = JournalCursor(key, decode_snapshot(payload), base_bytes=len(payload))
+                elif kind == FRAME_DELTA and cursor is not None:
+                    cursor.snapshot = apply_changes(cursor.snapshot, pickle.loads(payload))
+                    cursor.deltas += 1
+                    cursor.delta_bytes += len(payload)
+                else:
+                    raise StateCodecError(f"无效的日志帧: {kind!r}")
+        except (StateCodecError, pickle.UnpicklingError, EOFError, KeyError, IndexError, TypeError) as e:
+            print(f"[状态日志] 无法读取日志 {key}: {e}")
+            return None
+        return cursor
+
+    def restore(self, cursor):
+        """由游标重建 GameState (不与游标的快照共享可变容器)。"""
+        return restore_state(cursor.snapshot)
+
+    def prepare(self, cursor, game_state):
+        """
+        计算 game_state 相对于游标快照的变更集，并推进游标。
+        [v_VERSION] 有非临时字段的变化时递增 game_state.state_version (新版本号包含在变更集中)。
+        game_state 不是基于游标的版本时抛出 StateConflictError。
+        返回 (变更集, 待写入的帧)；没有变化时为 ({}, None)。帧由 write() 写入，
+        写入时检查日志仍停留在游标原来的版本。
+        """
+        base_version = snapshot_version(cursor.snapshot)
+        if game_state.state_version != base_version:
+            raise StateConflictError(
+                f"对局 {cursor.key} 的状态版本为 {game_state.state_version}，日志游标的版本为 {base_version}")
+        snapshot = snapshot_state(game_state)
+        changes = diff_snapshots(cursor.snapshot, snapshot)
+        if not changes:
+            return changes, None
+        if not is_transient_change(changes):
+            # [v_VERSION] 新版本号随变更集一起写入
+            game_state.state_version += 1
+            version_change = {'game': {'state_version': game_state.state_version}}
+            changes.setdefault('game', {}).update(version_change['game'])
+            snapshot = apply_changes(snapshot, version_change)
+
+        payload = pickle.dumps(changes, protocol=pickle.HIGHEST_PROTOCOL)
+        if cursor.deltas + 1 >= self.max_deltas or cursor.delta_bytes + len(payload) > cursor.base_bytes:
+            frame = (FRAME_BASE, encode_snapshot(snapshot), game_state.state_version, base_version)
+            cursor.base_bytes = len(frame[1])
+            cursor.deltas = cursor.delta_bytes = 0
+        else:
+            frame = (FRAME_DELTA, payload, game_state.state_version, base_version)
+            cursor.deltas += 1
+            cursor.delta_bytes += len(payload)
+        cursor.snapshot = snapshot
+        return changes, frame
+
+    def write(self, key, frame):
+        """写入 prepare() / create() 产生的帧。日志已被其他进程推进时抛出 StateConflictError。"""
+        kind, payload, version, expected_version = frame
+        if kind == FRAME_BASE:
+            self.write_base(self._check_key(key), payload, version, expected_version)
+        else:
+            self.append_delta(self._check_key(key), payload, version, expected_version)
+
+    def commit(self, cursor, game_state):
+        """把 game_state 的变化同步写入日志 (需要时压缩)，返回变更集 (没有变化时不写入)。"""
+        changes, frame = self.prepare(cursor, game_state)
+        if frame is not None:
+            self.write(cursor.key, frame)
+        return changes
+
+
+class FileStateJournal(StateJournal):
+    """
+    目录中每局一个日志文件 (<key>.journal)。末尾被截断的帧 (写入中途崩溃) 会被忽略。
+    [v_VERSION] 写入时持有 <key>.lock 上的文件锁 (fcntl.flock)，多个 worker 进程之间互斥。
+    """
+
+    _FRAME_HEADER = struct.Struct('>cIQ')
+
+    def __init__(self, directory, max_deltas=JOURNAL_MAX_DELTAS):
+        super().__init__(max_deltas)
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self._write_lock = threading.Lock()  # 没有 fcntl 时使用
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.journal")
+
+    def _lock_path(self, key):
+        return os.path.join(self.directory, f"{key}.lock")
+
+    def _frame(self, kind, payload, version):
+        return self._FRAME_HEADER.pack(kind, len(payload), version) + payload
+
+    @contextlib.contextmanager
+    def _locked(self, key):
+        """一局游戏的写锁 (关闭锁文件时释放)。"""
+        if fcntl is None:
+            with self._write_lock:
+                yield
+            return
+        with open(self._lock_path(key), 'ab') as lock_file:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            yield
+
+    def _last_version(self, key):
+        """日志中最后一个完整帧的版本 (只读帧头)；日志不存在或为空时返回 None。"""
+        try:
+            f = open(self._path(key), 'rb')
+        except FileNotFoundError:
+            return None
+        with f:
+            size = os.fstat(f.fileno()).st_size
+            header_size = self._FRAME_HEADER.size
+            version = None
+            offset = 0
+            while offset + header_size <= size:
+                f.seek(offset)
+                _, length, frame_version = self._FRAME_HEADER.unpack(f.read(header_size))
+                offset += header_size + length
+                if offset > size:
+                    break  # 末尾的帧没有写完整
+                version = frame_version
+        return version
+
+    def read_frames(self, key):
+        try:
+            with open(self._path(key), 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+
+        frames = []
+        offset = 0
+        header_size = self._FRAME_HEADER.size
+        while offset + header_size <= len(data):
+            kind, length, _ = self._FRAME_HEADER.unpack_from(data, offset)
+            start = offset + header_size
+            if start + length > len(data):
+                break  # 末尾的帧没有写完整
+            frames.append((kind, data[start:start + length]))
+            offset = start + length
+        return frames
+
+    def write_base(self, key, payload, version, expected_version=None):
+        # 先写临时文件再原子替换，读者不会看到写了一半的基准帧
+        path = self._path(key)
+        with self._locked(key):
+            self._check_version(key, self._last_version(key), expected_version)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(self._frame(FRAME_BASE, payload, version))
+            os.replace(tmp_path, path)
+
+    def append_delta(self, key, payload, version, expected_version):
+        with self._locked(key):
+            self._check_version(key, self._last_version(key), expected_version)
+            with open(self._path(key), 'ab') as f:
+                f.write(self._frame(FRAME_DELTA, payload, version))
+
+    def discard(self, key):
+        try:
+            self._check_key(key)
+        except ValueError:
+            return
+        for path in (self._path(key), self._lock_path(key)):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+class SqliteStateJournal(StateJournal):
+    """
+    所有日志存放在一个 SQLite 数据库中 (WAL 模式，多个 worker 进程可以共享同一个文件)。
+    [v_VERSION] 版本检查和写入在同一个 BEGIN IMMEDIATE 事务中完成。
+    """
+
+    def __init__(self, path, max_deltas=JOURNAL_MAX_DELTAS):
+        super().__init__(max_deltas)
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            with self._transaction():
+                self._conn.execute(
+                    "CREATE TABLE IF NOT EXISTS frames (seq INTEGER PRIMARY KEY AUTOINCREMENT,"
+                    " key TEXT NOT NULL, kind BLOB NOT NULL, payload BLOB NOT NULL, version INTEGER)")
+                columns = {row[1] for row in self._conn.execute("PRAGMA table_info(frames)")}
+                if 'version' not in columns:
+                    # 旧数据库: 已有的帧没有版本 (NULL)，这些对局在下一个基准帧之前不做版本检查
+                    self._conn.execute("ALTER TABLE frames ADD COLUMN version INTEGER")
+                self._conn.execute("CREATE INDEX IF NOT EXISTS frames_key ON frames (key, seq)")
+
+    @contextlib.contextmanager
+    def _transaction(self):
+        """写事务 (BEGIN IMMEDIATE: 开始时即取得写锁，事务内读到的就是最新内容)。调用方持有 self._lock。"""
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+            self._conn.execute("COMMIT")
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+
+    def _check_latest(self, key, expected_version):
+        """在事务内检查日志中最新一帧的版本。"""
+        if expected_version is None:
+            return
+        row = self._conn.execute(
+            "SELECT version FROM frames WHERE key = ? ORDER BY seq DESC LIMIT 1", (key,)).fetchone()
+        if row is not None and row[0] is None:
+            return  # 旧数据库中没有版本的帧
+        self._check_version(key, row[0] if row else None, expected_version)
+
+    def read_frames(self, key):
+        with self._lock:
+            rows = self._conn.execute("SELECT kind, payload FROM frames WHERE key = ? ORDER BY seq", (key,)).fetchall()
+        return [(bytes(kind), bytes(payload)) for kind, payload in rows] or None
+
+    def write_base(self, key, payload, version, expected_version=None):
+        with self._lock, self._transaction():
+            self._check_latest(key, expected_version)
+            self._conn.execute("DELETE FROM frames WHERE key = ?", (key,))
+            self._conn.execute("INSERT INTO frames (key, kind, payload, version) VALUES (?, ?, ?, ?)",
+                               (key, FRAME_BASE, payload, version))
+
+    def append_delta(self, key, payload, version, expected_version):
+        with self._lock, self._transaction():
+            self._check_latest(key, expected_version)
+            self._conn.execute("INSERT INTO frames (key, kind, payload, version) VALUES (?, ?, ?, ?)",
+                               (key, FRAME_DELTA, payload, version))
+
+    def discard(self, key):
+        try:
+            self._check_key(key)
+        except ValueError:
+            return
+        with self._lock:
+            self._conn.execute("DELETE FROM frames WHERE key = ?", (key,))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,231 @@
+"""
+[NEW] 对局状态存储: 进程内 LRU 热层 + 持久层。
+
+- 热层: {日志键: (实时 GameState, 日志游标)}，同一玩家的后续请求直接拿到驻留的对象，
+  完全跳过读文件 / 反序列化 / 重建对象
+- 持久层: 任意 StateJournal (FileStateJournal / SqliteStateJournal)，接口相同可以互换
+- 保存时在请求线程里计算变更集 (与游标快照比较) 并同步写帧 (需要版本检查的结果，见下)；
+  新对局的基准帧也同步写入 (重定向后的下一个请求可能落在另一个 worker 上，必须能读到它)；
+  只有删除操作交给后台线程按顺序完成 (write-behind)，
+  热层未命中且该局还有未完成的删除时先等待完成，再从持久层读取
+
+请求没有保存 (例如控制器返回错误) 时调用 release(): 如果驻留对象已被改动，
+就从游标快照重建，丢弃这些改动 (与以前每次请求都从 session 重建的语义一致)。
+
+[v_VERSION] 每次保存都会递增 GameState.state_version。调用方把最后保存的版本号传给 get():
+- 驻留对象的版本落后 (另一个 worker 进程已经保存了更新的状态) 时视为未命中，从持久层重新读取
+- 持久层也落后 (另一个进程的写入还没完成) 时稍等重试，仍然落后则抛出 StateUnavailableError
+  (对局完好，调用方应让请求稍后重试，而不是当作对局丢失)
+同一局游戏的请求用 game_lock() 串行化，避免两个页面同时修改同一个驻留对象。
+不同 worker 进程之间由持久层的比较并交换写入兜底: put() 基于的版本已被另一个进程推进时
+丢弃驻留对象并抛出 StateConflictError (见 state_journal.py)，两边的修改不会被合并。
+"""
+import atexit
+import queue
+import threading
+import time
+from collections import OrderedDict
+
+from .state_codec import snapshot_state, diff_snapshots
+from .state_journal import StateUnavailableError
+
+# 每个 worker 进程驻留的对局数
+STATE_CACHE_SIZE = 256
+# [v_VERSION] 持久层版本落后时的重试次数和间隔 (秒)
+STALE_READ_RETRIES = 20
+STALE_READ_DELAY = 0.025
+
+_DISCARD = object()  # 写入队列中的 "删除日志" 操作
+_STOP = object()
+
+
+class StateStore:
+    """对局状态存储 (线程安全)。"""
+
+    def __init__(self, journal, capacity=STATE_CACHE_SIZE, write_behind=True):
+        self.journal = journal
+        self.capacity = capacity
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # {key: (game_state, cursor)}
+        self._lock = threading.RLock()
+        self._written = threading.Condition(self._lock)
+        self._pending = {}  # {key: 尚未写入持久层的操作数}
+        self._game_locks = {}  # {key: threading.Lock}
+        self._queue = None
+        self._worker = None
+        if write_behind:
+            self._queue = queue.Queue()
+            self._worker = threading.Thread(target=self._write_loop, name='state-store-writer', daemon=True)
+            self._worker.start()
+            atexit.register(self.close)
+
+    # --- 热层 ---
+
+    def _remember(self, key, game_state, cursor):
+        entries = self._entries
+        entries[key] = (game_state, cursor)
+        entries.move_to_end(key)
+        while len(entries) > self.capacity:
+            evicted, _ = entries.popitem(last=False)
+            lock = self._game_locks.get(evicted)
+            if lock is not None and not lock.locked():
+                del self._game_locks[evicted]
+
+    # --- 持久层写入 ---
+
+    def _submit(self, key, operation):
+        if self._queue is None:
+            self._apply(key, operation)
+            return
+        with self._lock:
+            self._pending[key] = self._pending.get(key, 0) + 1
+        self._queue.put((key, operation))
+
+    def _apply(self, key, operation):
+        try:
+            if operation is _DISCARD:
+                self.journal.discard(key)
+            else:
+                self.journal.write(key, operation)
+        except Exception as e:
+            print(f"[状态存储] 写入日志 {key} 失败: {e}")
+
+    def _write_loop(self):
+        while True:
+            key, operation = self._queue.get()
+            try:
+                if operation is _STOP:
+                    return
+                self._apply(key, operation)
+            finally:
+                with self._lock:
+                    if operation is not _STOP:
+                        remaining = self._pending.get(key, 1) - 1
+                        if remaining:
+                            self._pending[key] = remaining
+                        else:
+                            self._pending.pop(key, None)
+                    self._written.notify_all()
+                self._queue.task_done()
+
+    def _wait_for_writes(self, key):
+        with self._lock:
+            while self._pending.get(key):
+                self._written.wait()
+
+    # --- 接口 ---
+
+    def create(self, game_state):
+        """保存一局新游戏 (同步写入基准帧)，返回其日志键。"""
+        cursor, frame = self.journal.new_cursor(game_state)
+        self.journal.write(cursor.key, frame)
+        with self._lock:
+            self._remember(cursor.key, game_state, cursor)
+        return cursor.key
+
+    def game_lock(self, key):
+        """[v_VERSION] 一局游戏的请求锁 (同一进程内串行化对同一个驻留对象的修改)。"""
+        with self._lock:
+            lock = self._game_locks.get(key)
+            if lock is None:
+                lock = self._game_locks[key] = threading.Lock()
+            return lock
+
+    def get(self, key, version=None):
+        """
+        日志键对应的实时 GameState；日志不存在或已损坏时返回 None。
+        version: 调用方已知的最新版本号，版本更旧的驻留对象 / 持久层状态不会被返回；
+        重试后持久层仍然落后时抛出 StateUnavailableError。
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (version is None or entry[0].state_version >= version):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        for attempt in range(STALE_READ_RETRIES + 1):
+            self._wait_for_writes(key)
+            cursor = self.journal.open(key)
+            if cursor is None:
+                return None
+            game_state = self.journal.restore(cursor)
+            if version is None or game_state.state_version >= version:
+                break
+            if attempt == STALE_READ_RETRIES:
+                raise StateUnavailableError(
+                    f"对局 {key} 的持久层版本 {game_state.state_version} 落后于 {version}")
+            time.sleep(STALE_READ_DELAY)
+
+        with self._lock:
+            self._remember(key, game_state, cursor)
+        return game_state
+
+    def put(self, key, game_state):
+        """
+        保存 game_state，返回变更集 (见 state_codec.diff_snapshots)。没有变化时不写入持久层。
+        [v_VERSION] 帧在调用线程中同步写入。持久层中的版本已不是 game_state 所基于的版本
+        (另一个 worker 已经保存了这局游戏) 时抛出 StateConflictError，并丢弃驻留对象，
+        下一个请求从持久层重新读取。
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+        # 先完成排队中的删除，版本检查才能看到它们
+        self._wait_for_writes(key)
+        if entry is not None:
+            cursor = entry[1]
+        else:
+            # 已被挤出热层: 以持久层的最新内容为基准
+            cursor = self.journal.open(key)
+            if cursor is None:
+                cursor, frame = self.journal.new_cursor(game_state)
+                cursor.key = key
+                self.journal.write(key, frame)
+                with self._lock:
+                    self._remember(key, game_state, cursor)
+                return None
+
+        try:
+            with self._lock:
+                changes, frame = self.journal.prepare(cursor, game_state)
+            if frame is not None:
+                self.journal.write(key, frame)
+        except BaseException:
+            # 冲突或写入失败: 游标可能已经推进，驻留对象不再与持久层一致
+            with self._lock:
+                self._entries.pop(key, None)
+            raise
+        with self._lock:
+            self._remember(key, game_state, cursor)
+        return changes
+
+    def release(self, key, game_state):
+        """请求结束但没有保存: 丢弃对驻留对象的未保存改动。"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] is not game_state:
+                return
+            cursor = entry[1]
+            if diff_snapshots(cursor.snapshot, snapshot_state(game_state, detach=False)):
+                self._entries[key] = (self.journal.restore(cursor), cursor)
+
+    def discard(self, key):
+        """删除一局游戏 (热层和持久层)。"""
+        with self._lock:
+            self._entries.pop(key, None)
+            self._game_locks.pop(key, None)
+        self._submit(key, _DISCARD)
+
+    def flush(self):
+        """等待所有延后的写入完成。"""
+        if self._queue is not None:
+            self._queue.join()
+
+    def close(self):
+        """写完所有延后的写入，停止后台线程并关闭持久层。"""
+        if self._worker is not None and self._worker.is_alive():
+            self._queue.put((None, _STOP))
+            self._worker.join()
+        self.journal.close()
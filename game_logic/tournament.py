@@ -0,0 +1,249 @@
+"""
+[NEW] 平衡性锦标赛 (Tournament)。
+
+在无头模拟器 (game_logic.simulator) 之上，用 multiprocessing 进程池批量跑对局，覆盖
+PLAYER_CORES / LEGS / LEFT_ARMS / RIGHT_ARMS / BACKPACKS × PLAYER_PILOTS × AI_LOADOUTS × 游戏模式
+的笛卡尔积。
+
+- 每局的种子由 (基础种子, 对局编号) 确定性派生，任意进程数下结果可复现
+- 对局按完成顺序流式写入 CSV (每行带 match_index，可事后排序)，内存占用与总局数无关
+- 结束时报告吞吐量；--scaling 会用同一批对局测量 1/2/4/... 个进程的扩展效率
+
+用法:
+    python -m game_logic.tournament --output bench_output.csv --modes duel --repeats 1
+    python -m game_logic.tournament --limit 200 --scaling
+"""
+import argparse
+import csv
+import hashlib
+import itertools
+import multiprocessing
+import os
+import sys
+import time
+
+from .database import (
+    PLAYER_CORES, PLAYER_LEGS, PLAYER_LEFT_ARMS, PLAYER_RIGHT_ARMS, PLAYER_BACKPACKS,
+    PLAYER_PILOTS, AI_LOADOUTS
+)
+from .simulator import simulate_match, POLICIES
+
+SLOTS = ('core', 'legs', 'left_arm', 'right_arm', 'backpack')
+GAME_MODES = ('duel', 'standard', 'horde', 'range')
+
+CSV_COLUMNS = (
+    'match_index', 'seed', *SLOTS, 'pilot', 'ai_loadout', 'game_mode', 'repeat',
+    'winner', 'game_over', 'turns', 'ai_defeat_count',
+    'player_parts_damaged', 'player_parts_destroyed', 'player_link_lost',
+    'ai_parts_damaged', 'ai_parts_destroyed', 'ai_link_lost',
+    'attacks', 'penetrations', 'errors', 'elapsed_ms',
+)
+
+# 每批提交给进程池的任务数 = 进程数 * chunksize * _SLAB_FACTOR (避免一次性展开整个笛卡尔积)
+_SLAB_FACTOR = 32
+
+
+def _selectable(parts):
+    """与机库页面一致: 过滤掉（弃置）部件。"""
+    return [name for name in parts if '（弃置）' not in name]
+
+
+def derive_seed(base_seed, match_index):
+    """由基础种子和对局编号确定性地派生 63 位种子 (与进程数、调度顺序无关)。"""
+    digest = hashlib.blake2b(f"{base_seed}:{match_index}".encode(), digest_size=8).digest()
+    return int.from_bytes(digest, 'little') >> 1
+
+
+def iter_matchups(modes=('duel',), ai_keys=None, pilots=None, repeats=1):
+    """
+    惰性生成全部对局的描述 (不展开成列表)。
+
+    Yields:
+        tuple: (match_index, selection_tuple, pilot, ai_loadout, game_mode, repeat)
+    """
+    loadouts = itertools.product(
+        _selectable(PLAYER_CORES), _selectable(PLAYER_LEGS), _selectable(PLAYER_LEFT_ARMS),
+        _selectable(PLAYER_RIGHT_ARMS), _selectable(PLAYER_BACKPACKS)
+    )
+    combos = itertools.product(
+        loadouts, pilots or list(PLAYER_PILOTS), ai_keys or list(AI_LOADOUTS), modes, range(repeats)
+    )
+    for index, (selection, pilot, ai_key, mode, repeat) in enumerate(combos):
+        yield index, selection, pilot, ai_key, mode, repeat
+
+
+def count_matchups(modes=('duel',), ai_keys=None, pilots=None, repeats=1):
+    total = 1
+    for parts in (PLAYER_CORES, PLAYER_LEGS, PLAYER_LEFT_ARMS, PLAYER_RIGHT_ARMS, PLAYER_BACKPACKS):
+        total *= len(_selectable(parts))
+    return total * len(pilots or PLAYER_PILOTS) * len(ai_keys or AI_LOADOUTS) * len(modes) * repeats
+
+
+# --- 进程池工作函数 (必须是模块级函数才能被 pickle) ---
+
+_WORKER_CONFIG = {}
+
+
+def _init_worker(config):
+    _WORKER_CONFIG.update(config)
+
+
+def _run_job(job):
+    """在工作进程中跑一局，返回一行 CSV 数据。"""
+    index, selection, pilot, ai_key, mode, repeat = job
+    seed = derive_seed(_WORKER_CONFIG['base_seed'], index)
+    result = simulate_match(
+        player_selection=dict(zip(SLOTS, selection)),
+        ai_loadout_key=ai_key,
+        game_mode=mode,
+        player_pilot_name=pilot,
+        policy=POLICIES[_WORKER_CONFIG['policy']](),
+        seed=seed,
+        max_turns=_WORKER_CONFIG['max_turns'],
+    )
+    player_damage = result['player_damage_taken']
+    ai_damage = result['ai_damage_taken']
+    attack_results = result['attack_results']
+    return (
+        index, seed, *selection, pilot, ai_key, mode, repeat,
+        result['winner'], result['game_over'] or '', result['turns'], result['ai_defeat_count'],
+        player_damage.get('parts_damaged', 0), player_damage.get('parts_destroyed', 0),
+        player_damage.get('link_lost', 0),
+        ai_damage.get('parts_damaged', 0), ai_damage.get('parts_destroyed', 0), ai_damage.get('link_lost', 0),
+        sum(v for k, v in attack_results.items() if not str(k).endswith('_required')),
+        attack_results.get('penetration', 0), result['errors'], result['elapsed_ms'],
+    )
+
+
+def run_tournament(jobs, output_path=None, processes=None, chunksize=8, base_seed=0, policy='greedy',
+                   max_turns=30, progress_every=0):
+    """
+    用进程池跑完 jobs 并流式写出 CSV。
+
+    Args:
+        jobs (iterable): iter_matchups 生成的对局描述
+        output_path (str): CSV 路径，None 则不写文件 (用于扩展性测量)
+        processes (int): 进程数，默认 os.cpu_count()
+
+    Returns:
+        dict: {'matches', 'elapsed_s', 'matches_per_s', 'processes', 'wins': {...}}
+    """
+    processes = processes or os.cpu_count() or 1
+    config = {'base_seed': base_seed, 'policy': policy, 'max_turns': max_turns}
+    slab_size = processes * chunksize * _SLAB_FACTOR
+    wins = {'player': 0, 'ai': 0, 'draw': 0}
+    done = 0
+
+    out_file = open(output_path, 'w', newline='', encoding='utf-8') if output_path else None
+    writer = csv.writer(out_file) if out_file else None
+    if writer:
+        writer.writerow(CSV_COLUMNS)
+
+    started = time.perf_counter()
+    try:
+        with multiprocessing.Pool(processes, initializer=_init_worker, initargs=(config,)) as pool:
+            jobs = iter(jobs)
+            while True:
+                slab = list(itertools.islice(jobs, slab_size))
+                if not slab:
+                    break
+                for row in pool.imap_unordered(_run_job, slab, chunksize):
+                    done += 1
+                    wins[row[CSV_COLUMNS.index('winner')]] += 1
+                    if writer:
+                        writer.writerow(row)
+                    if progress_every and done % progress_every == 0:
+                        rate = done / (time.perf_counter() - started)
+                        print(f"  已完成 {done} 局 ({rate:.1f} 局/秒)", file=sys.stderr)
+                if out_file:
+                    out_file.flush()
+    finally:
+        if out_file:
+            out_file.close()
+
+    elapsed = time.perf_counter() - started
+    return {
+        'matches': done,
+        'elapsed_s': elapsed,
+        'matches_per_s': done / elapsed if elapsed > 0 else 0.0,
+        'processes': processes,
+        'wins': wins,
+    }
+
+
+def measure_scaling(jobs, max_processes=None, **kwargs):
+    """
+    用同一批对局分别以 1, 2, 4, ... 个进程运行，返回每档的吞吐量和并行效率。
+    """
+    jobs = list(jobs)
+    max_processes = max_processes or os.cpu_count() or 1
+    counts = []
+    n = 1
+    while n < max_processes:
+        counts.append(n)
+        n *= 2
+    counts.append(max_processes)
+
+    report = []
+    baseline = None
+    for processes in counts:
+        stats = run_tournament(jobs, output_path=None, processes=processes, **kwargs)
+        baseline = baseline or stats['matches_per_s']
+        speedup = stats['matches_per_s'] / baseline if baseline else 0.0
+        report.append({
+            'processes': processes,
+            'matches_per_s': stats['matches_per_s'],
+            'speedup': speedup,
+            'efficiency': speedup / processes,
+        })
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="平衡性锦标赛: 多进程批量无头对局")
+    parser.add_argument('--output', default='tournament_results.csv', help="CSV 输出路径")
+    parser.add_argument('--modes', default='duel', help="逗号分隔的游戏模式 (duel,standard,horde,range)")
+    parser.add_argument('--ai', default='', help="逗号分隔的 AI 配置键，默认全部")
+    parser.add_argument('--repeats', type=int, default=1, help="每个组合重复的局数")
+    parser.add_argument('--limit', type=int, default=0, help="只跑前 N 局 (0 = 全部)")
+    parser.add_argument('--processes', type=int, default=0, help="进程数，默认 CPU 核数")
+    parser.add_argument('--chunksize', type=int, default=8)
+    parser.add_argument('--seed', type=int, default=0, help="基础种子")
+    parser.add_argument('--policy', default='greedy', choices=sorted(POLICIES.keys()))
+    parser.add_argument('--max-turns', type=int, default=30)
+    parser.add_argument('--scaling', action='store_true', help="测量 1..N 进程的扩展效率 (不写 CSV)")
+    args = parser.parse_args(argv)
+
+    modes = tuple(m for m in args.modes.split(',') if m)
+    unknown = [m for m in modes if m not in GAME_MODES]
+    if unknown:
+        parser.error(f"未知的游戏模式: {unknown}")
+    ai_keys = [k for k in args.ai.split(',') if k] or None
+    if ai_keys and any(k not in AI_LOADOUTS for k in ai_keys):
+        parser.error(f"未知的 AI 配置: {[k for k in ai_keys if k not in AI_LOADOUTS]}")
+
+    total = count_matchups(modes, ai_keys, repeats=args.repeats)
+    jobs = iter_matchups(modes, ai_keys, repeats=args.repeats)
+    if args.limit:
+        total = min(total, args.limit)
+        jobs = itertools.islice(jobs, args.limit)
+    common = dict(chunksize=args.chunksize, base_seed=args.seed, policy=args.policy, max_turns=args.max_turns)
+
+    if args.scaling:
+        print(f"扩展性测量: {total} 局 × 每档进程数")
+        for row in measure_scaling(jobs, args.processes or None, **common):
+            print(f"  进程 {row['processes']:>3}: {row['matches_per_s']:8.1f} 局/秒  "
+                  f"加速比 {row['speedup']:.2f}  效率 {row['efficiency']:.0%}")
+        return
+
+    print(f"锦标赛: {total} 局，输出 -> {args.output}")
+    stats = run_tournament(jobs, args.output, args.processes or None, progress_every=max(1, total // 20),
+                           **common)
+    print(f"完成 {stats['matches']} 局，用时 {stats['elapsed_s']:.1f}s，"
+          f"{stats['matches_per_s']:.1f} 局/秒 ({stats['processes']} 进程，"
+          f"每核 {stats['matches_per_s'] / stats['processes']:.1f} 局/秒)")
+    print(f"胜负: {stats['wins']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+"""
+[NEW] 回合上下文: 一次算出玩家所有动作的有效范围 (前端高亮用)。
+
+以前前端每选择一个动作就请求一次 /api/get_move_range 或 /api/get_attack_range，
+每次都要寻路或扫描射界。build_turn_context() 一次算出:
+- 调整移动和每个 [移动] 动作的可达格 (包括【喷射冲刺】straight_line_bonus 的直线加成)
+- 每个攻击动作 (近战 / 射击 / 抛射 / 快速) 的可攻击目标和可发射格
+
+get_turn_context() 按 GameState.state_version 缓存结果 (与 Mech._get_action_index 的做法相同，
+缓存在对象上并带签名)。驻留的 GameState (见 state_store.py) 在保存出新版本之前一直复用同一份结果。
+"""
+
+ADJUST_MOVE = '调整移动'
+# 需要射界扫描的动作类型 (与 game.js selectAction 的分派一致)
+RANGE_ATTACK_TYPES = ('近战', '射击', '抛射', '快速')
+
+_DIRECTIONS = ((0, -1), (0, 1), (-1, 0), (1, 0))  # N, S, W, E
+
+
+def _straight_line_moves(game_state, mech, distance):
+    """从 mech 出发沿四个方向直线前进 distance 格内的格子 (撞墙或撞到单位为止)。"""
+    moves = []
+    start_x, start_y = mech.pos
+    occupied_tiles = game_state.get_occupied_tiles(exclude_id=mech.id)
+    for dx, dy in _DIRECTIONS:
+        for i in range(1, distance + 1):
+            next_pos = (start_x + dx * i, start_y + dy * i)
+            if not (1 <= next_pos[0] <= game_state.board_width and 1 <= next_pos[1] <= game_state.board_height):
+                break  # 撞墙
+            if next_pos in occupied_tiles:
+                break  # 撞到单位
+            moves.append(next_pos)
+    return moves
+
+
+def move_range(game_state, mech, action_name, part_slot):
+    """
+    [移动] 动作 (或调整移动) 的可达格 (去重后的列表)。
+    不是移动动作或移动距离为 0 时返回 []。
+    """
+    move_distance = 0
+    is_flight_action = False
+    action = None
+
+    if action_name == ADJUST_MOVE:
+        legs_part = mech.parts.get('legs')
+        if legs_part and legs_part.status != 'destroyed':
+            move_distance = legs_part.adjust_move
+        if mech.stance == 'agile':
+            move_distance *= 2
+    else:
+        action = mech.get_action_by_name_and_slot(action_name, part_slot)
+        if action and action.action_type == '移动':
+            move_distance = action.range_val
+            if action.effects.get("flight_movement"):
+                is_flight_action = True
+
+    if move_distance <= 0:
+        return []
+
+    valid_moves = game_state.calculate_move_range(mech, move_distance, is_flight=is_flight_action)
+    # 【喷射冲刺】的直线移动加成
+    if action and action.effects.get("straight_line_bonus"):
+        bonus_distance = action.effects.get("straight_line_bonus", 0)
+        valid_moves.extend(_straight_line_moves(game_state, mech, move_distance + bonus_distance))
+    return list(set(valid_moves))
+
+
+def attack_range(game_state, mech, action_name, part_slot):
+    """攻击动作的 {'valid_targets': [...], 'valid_launch_cells': [...]} (目标已转换为可序列化的字典)。"""
+    action = mech.get_action_by_name_and_slot(action_name, part_slot)
+    if not action:
+        return {'valid_targets': [], 'valid_launch_cells': []}
+
+    valid_targets_list, valid_launch_cells_list = game_state.calculate_attack_range(mech, action)
+    return {
+        'valid_targets': [
+            {
+                'entity_id': t['entity'].id,
+                'pos': t['pos'],
+                'is_back_attack': t['is_back_attack']
+            } for t in valid_targets_list
+        ],
+        'valid_launch_cells': valid_launch_cells_list
+    }
+
+
+def build_turn_context(game_state, mech):
+    """
+    mech 所有动作的有效范围:
+        {'state_version': 版本,
+         'adjust_move': [可达格, ...],
+         'actions': {槽位: {动作名: {'valid_moves': [...]} 或 {'valid_targets': [...], 'valid_launch_cells': [...]}}}}
+    游戏结束或有待处理的中断时所有范围为空 (与单个范围 API 一致)。
+    """
+    context = {'state_version': game_state.state_version, 'adjust_move': [], 'actions': {}}
+    if game_state.game_over or mech.pending_combat:
+        return context
+
+    context['adjust_move'] = move_range(game_state, mech, ADJUST_MOVE, 'legs')
+    actions = context['actions']
+    for action, part_slot in mech.get_all_actions():
+        if action.name in actions.get(part_slot, ()):
+            continue  # 同名动作以第一个为准 (与 get_action_by_name_and_slot 一致)
+        if action.action_type == '移动':
+            entry = {'valid_moves': move_range(game_state, mech, action.name, part_slot)}
+        elif action.action_type in RANGE_ATTACK_TYPES:
+            entry = attack_range(game_state, mech, action.name, part_slot)
+        else:
+            continue
+        actions.setdefault(part_slot, {})[action.name] = entry
+    return context
+
+
+def get_turn_context(game_state, mech):
+    """
+    build_turn_context 的缓存版本: 同一个 GameState 对象在 state_version 改变之前复用结果。
+    只应在状态与其版本一致时调用 (即请求开始时，修改状态之前)。
+    """
+    cache = getattr(game_state, '_turn_context_cache', None)
+    if cache is None:
+        cache = game_state._turn_context_cache = {}
+    context = cache.get(mech.id)
+    if context is None or context['state_version'] != game_state.state_version:
+        context = cache[mech.id] = build_turn_context(game_state, mech)
+    return context
+
+
+def lookup_range(context, action_name, part_slot):
+    """回合上下文中一个动作的范围条目；上下文中没有该动作时返回 None。"""
+    if action_name == ADJUST_MOVE:
+        return {'valid_moves': context['adjust_move']}
+    return context['actions'].get(part_slot, {}).get(action_name)
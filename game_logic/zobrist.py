@@ -0,0 +1,147 @@
+"""
+[NEW] 局面哈希 (Zobrist) 与置换表。
+
+局面哈希 = 所有 "特征" 随机键的异或和。特征是 (类别, 所属实体, 取值) 三元组，例如
+('pos', 'ai_1', (5, 8))、('stance', 'player_1', 'agile')、('part', 'ai_1', ('core', '...', 'damaged'))。
+异或可以增量维护: 某个属性从 old 变为 new 时，只需
+    hash ^= zobrist_key(类别, 实体, old) ^ zobrist_key(类别, 实体, new)
+
+随机键由 blake2b 确定性派生 (与 PYTHONHASHSEED 无关)，因此同一个局面在任何进程中
+得到相同的哈希，可以安全地写进 session 或跨 worker 比较。
+
+增量维护的分工:
+- 实体的 pos / orientation / status (以及 Mech 的 stance / AP / TP) 是属性，
+  赋值时更新所属 EntityRegistry 的 zobrist 字段
+- 弹药: GameState.ammo_counts 是 AmmoLedger，写入时更新自身的 zobrist 字段
+- 部件状态: 由 Mech.parts_zobrist() 按部件签名缓存 (与 ActionIndex 相同的失效方式)
+GameState.position_hash() 把以上几部分合并成完整的局面哈希。
+"""
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+
+from .rng import _derive_key
+
+# 随机键缓存: 每局只有几十个实体、上百个格子，这个容量足以覆盖多局并发
+ZOBRIST_KEY_CACHE_SIZE = 1 << 16
+# 置换表默认容量 (条目数)
+TRANSPOSITION_TABLE_SIZE = 1 << 14
+
+_MISSING = object()
+
+
+@lru_cache(maxsize=ZOBRIST_KEY_CACHE_SIZE)
+def zobrist_key(feature, owner, value):
+    """特征 (类别, 所属实体, 取值) 的 64 位随机键。"""
+    return _derive_key('zobrist', feature, owner, value)
+
+
+class AmmoLedger(dict):
+    """
+    {(entity_id, part_slot, action_name): 剩余弹药}，并增量维护弹药部分的局面哈希 (self.zobrist)。
+    所有写操作都经过 __setitem__ / __delitem__，现有的 `ammo_counts[key] -= 1` 等代码照常工作。
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__()
+        self.zobrist = 0
+        self.update(*args, **kwargs)
+
+    def __setitem__(self, key, value):
+        old = self.get(key, _MISSING)
+        if old is not _MISSING:
+            self.zobrist ^= zobrist_key('ammo', key, old)
+        super().__setitem__(key, value)
+        self.zobrist ^= zobrist_key('ammo', key, value)
+
+    def __delitem__(self, key):
+        self.zobrist ^= zobrist_key('ammo', key, self[key])
+        super().__delitem__(key)
+
+    def pop(self, key, *default):
+        if key not in self:
+            return super().pop(key, *default)
+        value = self[key]
+        del self[key]
+        return value
+
+    def popitem(self):
+        key, value = super().popitem()
+        self.zobrist ^= zobrist_key('ammo', key, value)
+        return key, value
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+    def clear(self):
+        super().clear()
+        self.zobrist = 0
+
+    def copy(self):
+        return self.__class__(self)
+
+    def __reduce__(self):
+        # 反序列化时 pickle 会先调用 __setitem__ 再恢复属性，改为通过构造函数重建
+        return self.__class__, (dict(self),)
+
+
+class TranspositionTable:
+    """
+    有界 LRU 置换表: {(局面哈希, 附加键...): 评估结果}。
+    通过不同动作顺序到达的同一局面只评估一次；超出容量时淘汰最久未使用的条目。
+    线程安全: 同一张表可以被多个请求线程共享 (见 ace_ai_system.ACE_TRANSPOSITION_TABLE)，
+    每次读写都在锁内完成；lookup() 的 compute() 在锁外执行 (可以递归使用同一张表)。
+    """
+
+    __slots__ = ('maxsize', '_entries', '_lock', 'hits', 'misses')
+
+    def __init__(self, maxsize=TRANSPOSITION_TABLE_SIZE):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            value = self._entries.get(key, _MISSING)
+            if value is _MISSING:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            entries = self._entries
+            entries[key] = value
+            entries.move_to_end(key)
+            if len(entries) > self.maxsize:
+                entries.popitem(last=False)
+
+    def lookup(self, key, compute):
+        """命中则返回缓存结果，否则调用 compute() 计算并存入。"""
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def __len__(self):
+        return len(self._entries)
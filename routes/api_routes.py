@@ -1,7 +1,9 @@
 from flask import Blueprint, jsonify, request, session
-from game_logic.game_logic import GameState
+from routes.session_state import (load_game_state, save_game_state, stale_state_response, state_etag,
+                                  not_modified_response, conditional_response)
 from game_logic.data_models import Mech
 import game_logic.game_controller as controller
+from game_logic.turn_context import get_turn_context, lookup_range, attack_range
 
 #
 # 这个蓝图包含了所有的玩家动作 API (由 game.js 中的 AJAX/fetch 调用)
@@ -15,16 +17,20 @@ MAX_LOG_ENTRIES = 50
 
 # === 辅助函数 ===
 
-def _get_game_state_and_player(data):
+def _get_game_state_and_player(data, check_version=True):
     """
     (辅助函数) 安全地从 session 中获取当前的 game_state 和 player_mech 实例。
     这是所有 API 路由的第一步。
+    check_version: [v_VERSION] 拒绝来自过期页面 (另一个标签页已经行动) 的请求；只读的查询可以关闭。
     """
-    game_state_dict = session.get('game_state')
-    if not game_state_dict:
-        # 如果 session 中没有游戏状态，返回错误
+    game_state_obj = load_game_state()
+    if game_state_obj is None:
+        # 如果 session 中没有游戏状态 (或状态已失效)，返回错误
         return None, None, jsonify({'success': False, 'message': '游戏状态丢失，请刷新。'})
-    game_state_obj = GameState.from_dict(game_state_dict)
+    if check_version:
+        stale_response = stale_state_response(game_state_obj)
+        if stale_response:
+            return game_state_obj, None, stale_response
 
     player_id = data.get('player_id', 'player_1')
     player_mech = game_state_obj.get_entity_by_id(player_id)
@@ -47,16 +53,17 @@ def _handle_controller_response(game_state, log_entries, result_data, error):
         # 直接返回包含错误信息的 JSON 响应。
         return jsonify({'success': False, 'message': error})
 
-    # 1. 更新日志
+    # 1. [关键] 保存控制器返回的、已经更新过的游戏状态 (只追加本次的变更集)
+    #    [v_VERSION] 先保存再写日志: 保存因版本冲突失败 (409) 时本次的日志不会进入 session
+    save_game_state(game_state)
+
+    # 2. 更新日志
     log = session.get('combat_log', [])
     log.extend(log_entries)
     if len(log) > MAX_LOG_ENTRIES:
         log = log[-MAX_LOG_ENTRIES:]
     session['combat_log'] = log
 
-    # 2. [关键] 保存控制器返回的、已经更新过的游戏状态
-    session['game_state'] = game_state.to_dict()
-
     # 3. 准备 JSON 响应
     response = {'success': True}
     if result_data:
@@ -270,109 +277,68 @@ def resolve_reroll():
 
 
 # === 范围获取 API (高亮) ===
+# [v_CONTEXT] 范围都来自回合上下文 (见 game_logic/turn_context.py)，按状态版本缓存
+# [v_ETAG] 也可以用 GET (参数放在查询字符串中)，响应带 ETag，状态未变时返回 304
+
+def _range_request_data():
+    """(辅助函数) 范围 API 的请求参数: GET 取查询字符串，POST 取 JSON。"""
+    if request.method == 'GET':
+        return request.args.to_dict()
+    return request.get_json()
+
+
+@api_bp.route('/turn_context', methods=['GET', 'POST'])
+def turn_context():
+    """API: 一次获取玩家所有动作的有效范围 (移动格 / 攻击目标 / 发射格)"""
+    data = _range_request_data()
+    game_state, player_mech, error_response = _get_game_state_and_player(data, check_version=False)
+    if error_response: return error_response
 
-@api_bp.route('/get_move_range', methods=['POST'])
+    etag = state_etag(game_state, 'turn_context', player_mech.id)
+    return not_modified_response(etag) or conditional_response(
+        jsonify(get_turn_context(game_state, player_mech)), etag)
+
+
+@api_bp.route('/get_move_range', methods=['GET', 'POST'])
 def get_move_range():
     """API: 获取 [移动] 动作的有效范围 (用于前端高亮)"""
-    data = request.get_json()
-    game_state, player_mech, error_response = _get_game_state_and_player(data)
+    data = _range_request_data()
+    game_state, player_mech, error_response = _get_game_state_and_player(data, check_version=False)
     if error_response: return error_response
 
-    # 游戏结束或中断时，不允许获取范围
-    if game_state.game_over: return jsonify({'valid_moves': []})
-    # [核心修复] 检查 'pending_combat'
-    if player_mech.pending_combat:
-        return jsonify({'valid_moves': []})
-
     action_name = data.get('action_name')
     part_slot = data.get('part_slot')
-    move_distance = 0
-    is_flight_action = False
-    action = None  # 用于获取 action 对象
-
-    if action_name == '调整移动':
-        legs_part = player_mech.parts.get('legs')
-        if legs_part and legs_part.status != 'destroyed':
-            move_distance = legs_part.adjust_move
-        if player_mech.stance == 'agile':
-            move_distance *= 2
-    else:
-        action = player_mech.get_action_by_name_and_slot(action_name, part_slot)
-        if action and action.action_type == '移动':
-            move_distance = action.range_val
-            if action.effects.get("flight_movement"):
-                is_flight_action = True
-
-    if move_distance > 0:
-        # 1. 首先获取所有常规可达的格子
-        valid_moves = game_state.calculate_move_range(
-            player_mech, move_distance, is_flight=is_flight_action
-        )
-
-        # 2. 处理【喷射冲刺】的直线移动加成
-        if action and action.effects.get("straight_line_bonus"):
-            bonus_distance = action.effects.get("straight_line_bonus", 0)
-            total_straight_distance = move_distance + bonus_distance
-
-            start_pos = player_mech.pos
-            occupied_tiles = game_state.get_occupied_tiles(exclude_id=player_mech.id)
-
-            # 检查所有四个方向: (dx, dy)
-            for dx, dy in [(0, -1), (0, 1), (-1, 0), (1, 0)]:  # N, S, W, E
-                for i in range(1, total_straight_distance + 1):
-                    next_x = start_pos[0] + dx * i
-                    next_y = start_pos[1] + dy * i
-                    next_pos = (next_x, next_y)
-
-                    if not (1 <= next_x <= game_state.board_width and 1 <= next_y <= game_state.board_height):
-                        break  # 撞墙
-                    if next_pos in occupied_tiles:
-                        break  # 撞到单位
-
-                    valid_moves.append(next_pos)
-
-        # 返回去重后的列表
-        return jsonify({'valid_moves': list(set(valid_moves))})
-
-    return jsonify({'valid_moves': []})
-
-
-@api_bp.route('/get_attack_range', methods=['POST'])
+    etag = state_etag(game_state, 'move_range', player_mech.id, action_name, part_slot)
+    not_modified = not_modified_response(etag)
+    if not_modified: return not_modified
+
+    # 游戏结束或中断时，不允许获取范围 (回合上下文中的范围为空)
+    context = get_turn_context(game_state, player_mech)
+    entry = lookup_range(context, action_name, part_slot)
+    return conditional_response(jsonify({'valid_moves': entry.get('valid_moves', []) if entry else []}), etag)
+
+
+@api_bp.route('/get_attack_range', methods=['GET', 'POST'])
 def get_attack_range():
     """API: 获取 [攻击] 动作的有效范围 (用于前端高亮)"""
-    data = request.get_json()
-    game_state, player_mech, error_response = _get_game_state_and_player(data)
+    data = _range_request_data()
+    game_state, player_mech, error_response = _get_game_state_and_player(data, check_version=False)
     if error_response: return error_response
 
+    action_name = data.get('action_name')
+    part_slot = data.get('part_slot')
+    etag = state_etag(game_state, 'attack_range', player_mech.id, action_name, part_slot)
+    not_modified = not_modified_response(etag)
+    if not_modified: return not_modified
+
     if game_state.game_over:
-        return jsonify({'valid_targets': [], 'valid_launch_cells': []})
+        return conditional_response(jsonify({'valid_targets': [], 'valid_launch_cells': []}), etag)
     # [核心修复] 检查 'pending_combat'
     if player_mech.pending_combat:
-        return jsonify({'valid_targets': [], 'valid_launch_cells': []})
+        return conditional_response(jsonify({'valid_targets': [], 'valid_launch_cells': []}), etag)
 
-    action_name = data.get('action_name')
-    part_slot = data.get('part_slot')
-    action = player_mech.get_action_by_name_and_slot(action_name, part_slot)
-
-    if action:
-        # 1. 从游戏逻辑核心获取可攻击目标和可发射单元格
-        valid_targets_list, valid_launch_cells_list = game_state.calculate_attack_range(
-            player_mech, action
-        )
-
-        # 2. 将实体对象转换为可序列化的 ID
-        serializable_targets = [
-            {
-                'entity_id': t['entity'].id,
-                'pos': t['pos'],
-                'is_back_attack': t['is_back_attack']
-            } for t in valid_targets_list
-        ]
-
-        # 3. 返回 JSON 数据
-        return jsonify({
-            'valid_targets': serializable_targets,
-            'valid_launch_cells': valid_launch_cells_list
-        })
-
-    return jsonify({'valid_targets': [], 'valid_launch_cells': []})
\ No newline at end of file
+    entry = lookup_range(get_turn_context(game_state, player_mech), action_name, part_slot)
+    if entry is None or 'valid_targets' not in entry:
+        # 不在上下文中的动作类型: 直接计算
+        entry = attack_range(game_state, player_mech, action_name, part_slot)
+    return conditional_response(jsonify(entry), etag)
@@ -1,8 +1,11 @@
 import os
 from flask import Blueprint, render_template, session, redirect, url_for, make_response, jsonify
-from game_logic.game_logic import GameState, get_player_lock_status
+from game_logic.game_logic import get_player_lock_status
 from game_logic.data_models import Mech, Projectile
+from game_logic.state_journal import StateConflictError, StateUnavailableError
 import game_logic.game_controller as controller
+from routes.session_state import (load_game_state, save_game_state, discard_game_state, stale_state_response,
+                                  state_etag, not_modified_response, conditional_response)
 
 #
 # 这个蓝图 (Blueprint) 负责处理所有与主游戏界面相关的、
@@ -31,12 +34,14 @@ def game():
     """
     # 如果 session 中没有游戏状态 (例如服务器重启或 session 过期)，
     # 将玩家重定向回机库页面。
-    if 'game_state' not in session:
+    # 从 session 加载对局状态 (编码版本不兼容或日志丢失时同样回到机库)
+    # [v_VERSION] 对局只是暂时无法读取 (其他请求占用 / 持久层落后) 时 load_game_state 抛出
+    # StateUnavailableError (503，页面自动刷新)，不会走到这里删除对局
+    game_state_obj = load_game_state()
+    if game_state_obj is None:
+        discard_game_state()
         return redirect(url_for('main.hangar'))
 
-    # 从 session 加载字典，并将其反序列化为 GameState 对象
-    game_state_obj = GameState.from_dict(session['game_state'])
-
     # 为模板准备核心实体
     player_mech = game_state_obj.get_player_mech()
     ai_mech = game_state_obj.get_ai_mech()
@@ -47,9 +52,21 @@ def game():
         # 如果玩家机甲不存在 (数据损坏)，也重定向回机库
         return redirect(url_for('main.hangar'))
 
-    # 检查玩家是否被AI锁定，并获取日志
-    is_player_locked, locker_pos = get_player_lock_status(game_state_obj, player_mech)
     log = session.get('combat_log', [])
+    run_projectile_phase_flag = session.get('run_projectile_phase', False)
+
+    # [v_ETAG] 页面只由对局状态、日志和抛射物阶段标志决定时，带 ETag 并支持 304。
+    # 带有一次性内容 (动画起点、视觉事件、待注入的中断、登场动画) 的页面不缓存。
+    etag = None
+    if not (game_state_obj.visual_events or session.get('pending_interrupt_data') or session.get('show_raven_intro')
+            or any(entity.last_pos for entity in game_state_obj.entities.values())):
+        etag = state_etag(game_state_obj, 'game', log, run_projectile_phase_flag)
+        not_modified = not_modified_response(etag)
+        if not_modified:
+            return not_modified
+
+    # 检查玩家是否被AI锁定
+    is_player_locked, locker_pos = get_player_lock_status(game_state_obj, player_mech)
 
     # 1. 从 game_state 中获取由控制器(controller)生成的、需要前端显示的视觉事件
     visual_events = game_state_obj.visual_events or []
@@ -71,8 +88,7 @@ def game():
 
     # 2. 检查 session 中是否有 'run_projectile_phase' 标志
     #    (由 /end_turn 路由设置)
-    #    这会告诉 game.js 在页面加载后立即触发 AJAX 调用
-    run_projectile_phase_flag = session.get('run_projectile_phase', False)
+    #    这会告诉 game.js 在页面加载后立即触发 AJAX 调用 (标志已在上面读取)
 
     # [FIX] 使用 projectile_phase_active 来判断是否需要继续运行抛射物阶段
     # 这比仅仅检查队列更健壮，因为它覆盖了队列被清空但阶段未结束的情况
@@ -149,10 +165,15 @@ def game():
             state_modified = True
 
     if state_modified:
-        session['game_state'] = game_state_obj.to_dict()
+        try:
+            save_game_state(game_state_obj)
+        except StateConflictError:
+            pass  # [v_VERSION] 另一个 worker 已保存更新的状态，这里只是清理瞬时状态，页面照常返回
 
-    # 5. 返回响应，并设置HTTP头，禁止浏览器缓存游戏页面
+    # 5. 返回响应。[v_ETAG] 可缓存的页面每次使用前重新验证，其余页面禁止浏览器缓存
     response = make_response(html_to_render)
+    if etag is not None:
+        return conditional_response(response, etag)
     response.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate'
     response.headers['Pragma'] = 'no-cache'
     response.headers['Expires'] = '0'
@@ -164,7 +185,7 @@ def reset_game():
     """
     (POST) 清除会话数据，重置游戏并返回机库。
     """
-    session.pop('game_state', None)
+    discard_game_state()
     session.pop('combat_log', None)
     session.pop('visual_feedback_events', None)
     session.pop('run_projectile_phase', None)
@@ -178,8 +199,13 @@ def end_turn():
     (POST) 结束玩家回合。
     此路由将所有逻辑委托给 game_controller.handle_end_turn。
     """
-    game_state_obj = GameState.from_dict(session.get('game_state'))
-    log = session.get('combat_log', [])
+    game_state_obj = load_game_state()
+    if game_state_obj is None:
+        return redirect(url_for('main.hangar'))
+    stale_response = stale_state_response(game_state_obj)
+    if stale_response:
+        return stale_response
+    log = list(session.get('combat_log', []))
 
     # 1. 调用控制器处理回合结束逻辑 (包括AI回合)
     updated_state, new_logs, result_data, error = controller.handle_end_turn(game_state_obj)
@@ -189,7 +215,10 @@ def end_turn():
     if error:
         log.append(error)
 
-    # 3. 检查控制器是否要求立即运行抛射物阶段
+    # 3. 保存状态。[v_VERSION] 先保存再写 session: 版本冲突 (409) 时本次的日志和标志不会写入
+    save_game_state(updated_state)
+
+    # 4. 检查控制器是否要求立即运行抛射物阶段
     if result_data and result_data.get('run_projectile_phase'):
         # 设置一个标志，让 /game 路由在加载时知道要自动触发 JS
         session['run_projectile_phase'] = True
@@ -202,13 +231,12 @@ def end_turn():
         # 同时，确保我们不运行抛射物阶段，因为中断优先
         session.pop('run_projectile_phase', None)
 
-    # 4. 保存所有状态回 session
-    session['game_state'] = updated_state.to_dict()
+    # 5. 保存日志
     if len(log) > MAX_LOG_ENTRIES:
         log = log[-MAX_LOG_ENTRIES:]
     session['combat_log'] = log
 
-    # 5. 重定向回游戏界面 (将触发 /game 的GET请求)
+    # 6. 重定向回游戏界面 (将触发 /game 的GET请求)
     return redirect(url_for('game.game'))
 
 
@@ -221,16 +249,22 @@ def run_projectile_phase():
     它返回 JSON 而不是重定向。
     """
     # [FIX] 防御性编程：检查 session 是否有效
-    raw_state = session.get('game_state')
-    if not raw_state:
+    if not session.get('game_state'):
         return jsonify({'success': False, 'message': 'Session expired', 'redirect': url_for('main.hangar')}), 401
 
     try:
-        game_state_obj = GameState.from_dict(raw_state)
+        game_state_obj = load_game_state()
+    except StateUnavailableError:
+        raise  # [v_VERSION] 对局完好，只是暂时无法读取: 由错误处理返回可重试的 503
     except Exception as e:
         return jsonify({'success': False, 'message': f'State corrupted: {e}', 'redirect': url_for('main.hangar')}), 500
+    if game_state_obj is None:
+        return jsonify({'success': False, 'message': 'State corrupted', 'redirect': url_for('main.hangar')}), 500
+    stale_response = stale_state_response(game_state_obj)
+    if stale_response:
+        return stale_response
 
-    log = session.get('combat_log', [])
+    log = list(session.get('combat_log', []))
 
     # 1. 消耗 'run_projectile_phase' 标志，防止重复运行
     session.pop('run_projectile_phase', None)
@@ -246,8 +280,8 @@ def run_projectile_phase():
     if error:
         log.append(error)
 
-    # 4. 保存所有状态回 session
-    session['game_state'] = updated_state.to_dict()
+    # 4. 保存所有状态回 session。[v_VERSION] 先保存再写日志: 版本冲突 (409) 时本次的日志不会写入
+    save_game_state(updated_state)
     if len(log) > MAX_LOG_ENTRIES:
         log = log[-MAX_LOG_ENTRIES:]
     session['combat_log'] = log
@@ -267,8 +301,13 @@ def respawn_ai():
     (POST) 在靶场模式下重生 AI。
     调用 game_controller 来处理。
     """
-    game_state_obj = GameState.from_dict(session.get('game_state'))
-    log = session.get('combat_log', [])
+    game_state_obj = load_game_state()
+    if game_state_obj is None:
+        return redirect(url_for('main.hangar'))
+    stale_response = stale_state_response(game_state_obj)
+    if stale_response:
+        return stale_response
+    log = list(session.get('combat_log', []))
 
     # 1. 调用控制器
     updated_state, new_logs, result_data, error = controller.handle_respawn_ai(game_state_obj)
@@ -278,8 +317,8 @@ def respawn_ai():
     if error:
         log.append(error)
 
-    # 3. 保存状态
-    session['game_state'] = updated_state.to_dict()
+    # 3. 保存状态。[v_VERSION] 先保存再写日志: 版本冲突 (409) 时本次的日志不会写入
+    save_game_state(updated_state)
     if len(log) > MAX_LOG_ENTRIES:
         log = log[-MAX_LOG_ENTRIES:]
     session['combat_log'] = log
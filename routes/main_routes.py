@@ -5,7 +5,8 @@ import json  # 用于解析 Firebase 配置文件
 from flask import Blueprint, render_template, request, session, redirect, url_for
 
 # 导入游戏核心状态
-from game_logic.game_logic import GameState
+from game_logic.game_logic import GameState, BOARD_SIZES, DEFAULT_BOARD_SIZE
+from routes.session_state import save_game_state
 
 # 从新的 game_logic.database 包导入机库所需的数据
 from game_logic.database import (
@@ -149,6 +150,7 @@ def hangar():
         backpacks=player_backpacks,
         player_pilots=PLAYER_PILOTS,  # 传递驾驶员列表
         ai_loadouts=AI_LOADOUTS,
+        board_sizes=BOARD_SIZES,  # [NEW] 可选棋盘尺寸
         firebase_config=firebase_config_dict,
         app_id=app_id,
         initial_auth_token=auth_token
@@ -172,6 +174,7 @@ def start_game():
     game_mode = request.form.get('game_mode', 'duel')
     ai_opponent_key = request.form.get('ai_opponent')
     player_pilot_name = request.form.get('pilot')  # 获取玩家选择的驾驶员
+    board_width, board_height = BOARD_SIZES.get(request.form.get('board_size'), DEFAULT_BOARD_SIZE)
 
     # [NEW] 检测 Raven 登场：设置 Session 标志
     if ai_opponent_key == 'raven':
@@ -182,11 +185,13 @@ def start_game():
         player_mech_selection=selection,
         ai_loadout_key=ai_opponent_key,
         game_mode=game_mode,
-        player_pilot_name=player_pilot_name  # 传递给 GameState
+        player_pilot_name=player_pilot_name,  # 传递给 GameState
+        board_width=board_width,
+        board_height=board_height
     )
 
-    # 3. 将游戏状态序列化并存入服务器 session
-    session['game_state'] = game.to_dict()
+    # 3. 将游戏状态写入新的对局日志，session 中只保存日志键
+    save_game_state(game)
 
     # 4. 初始化战斗日志
     log = [f"> 玩家机甲组装完毕。"]
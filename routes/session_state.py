@@ -0,0 +1,233 @@
+"""
+[NEW] 对局状态在 session 中的存取。
+
+session['game_state'] 只保存对局的日志键；状态本身由 StateStore 管理
+(进程内 LRU 热层 + 持久层，见 game_logic/state_store.py)。每个请求:
+    load_game_state()  从热层取出驻留的 GameState (未命中时从持久层重建)
+    save_game_state()  计算变更集，只把变化追加到持久层
+请求结束时如果读取过状态却没有保存，其中的改动会被丢弃 (见 StateStore.release)。
+
+持久层由配置选择:
+    STATE_STORE_BACKEND  'file' (默认, 每局一个日志文件) 或 'sqlite'
+    STATE_STORE_PATH     日志目录 / SQLite 数据库文件
+    STATE_CACHE_SIZE     每个 worker 驻留的对局数
+    STATE_WRITE_BEHIND   删除对局是否由后台线程延后完成 (默认 True；新对局和保存总是同步写入)
+
+旧 session 中的 to_dict() 字典 / encode_state() 字节串仍可读取，下次保存时迁移到存储。
+
+[v_VERSION] 版本检查:
+- session['game_state_version'] 记录最后保存的 GameState.state_version，
+  驻留对象落后于它时 (另一个 worker 已保存更新的状态) 从持久层重新读取
+- 同一局游戏的请求在 worker 内串行执行 (StateStore.game_lock)
+- 响应头 X-State-Version 返回当前版本；页面在请求头中带上它所知道的版本，
+  版本不一致 (同一局游戏在另一个标签页中已经行动) 时拒绝请求 (见 stale_state_response)
+- 不同 worker 基于同一版本同时保存时，后保存的一方在持久层的版本检查中失败
+  (StateConflictError)，返回与 stale_state_response 相同的 409 响应，本次请求的改动作废
+- 对局暂时无法读取 (等待对局锁超时 / 持久层版本落后 / 持久层读取出错) 时抛出
+  StateUnavailableError，返回可重试的 503 响应，不改动 session 和日志
+  (load_game_state 返回 None 只表示对局确实不存在或已损坏)
+
+[v_ETAG] 条件请求: 只由对局状态决定的 GET 响应 (高亮范围、游戏页面) 带上由对局键 + 状态版本
+得出的 ETag (state_etag)。浏览器重新验证时 If-None-Match 匹配则直接返回 304 (not_modified_response)，
+不再计算范围或渲染页面。
+"""
+import hashlib
+
+from flask import current_app, g, jsonify, request, session
+
+from game_logic.state_codec import StateCodecError, decode_state
+from game_logic.state_journal import (FileStateJournal, SqliteStateJournal, StateConflictError,
+                                     StateUnavailableError)
+from game_logic.state_store import StateStore, STATE_CACHE_SIZE
+
+STATE_STORE_BACKENDS = {
+    'file': FileStateJournal,
+    'sqlite': SqliteStateJournal,
+}
+
+STATE_VERSION_HEADER = 'X-State-Version'
+# 等待同一局游戏的其他请求完成的最长时间 (秒)
+GAME_LOCK_TIMEOUT = 10
+# 对局暂时无法读取时建议客户端重试的间隔 (秒, Retry-After)
+STATE_RETRY_AFTER = 1
+
+
+def init_app(app):
+    """按 app.config 创建对局状态存储，并注册请求结束时的清理。"""
+    backend = app.config.get('STATE_STORE_BACKEND', 'file')
+    journal_cls = STATE_STORE_BACKENDS.get(backend)
+    if journal_cls is None:
+        raise ValueError(f"未知的 STATE_STORE_BACKEND: {backend}")
+    app.extensions['state_store'] = StateStore(
+        journal_cls(app.config['STATE_STORE_PATH']),
+        capacity=app.config.get('STATE_CACHE_SIZE', STATE_CACHE_SIZE),
+        write_behind=app.config.get('STATE_WRITE_BEHIND', True)
+    )
+    app.after_request(_add_state_version_header)
+    app.teardown_request(_release_unsaved_state)
+    app.register_error_handler(StateConflictError, _state_conflict_response)
+    app.register_error_handler(StateUnavailableError, _state_unavailable_response)
+
+
+def _store():
+    return current_app.extensions['state_store']
+
+
+def _add_state_version_header(response):
+    game_state = g.get('state_obj')
+    if game_state is not None:
+        response.headers[STATE_VERSION_HEADER] = str(game_state.state_version)
+    return response
+
+
+def _release_unsaved_state(exc=None):
+    key = g.pop('state_key', None)
+    game_state = g.pop('state_obj', None)
+    lock = g.pop('state_lock', None)
+    try:
+        if key is not None and not g.pop('state_saved', False):
+            _store().release(key, game_state)
+    finally:
+        if lock is not None:
+            lock.release()
+
+
+def load_game_state():
+    """
+    当前 session 的对局状态；没有对局、日志不存在或已损坏时返回 None。
+    [v_VERSION] 对局暂时无法读取 (等待其他请求超时 / 持久层版本落后) 时抛出 StateUnavailableError，
+    调用方不应把它当作对局丢失 (由 init_app 注册的错误处理返回 503)。
+    """
+    raw = session.get('game_state')
+    if raw is None:
+        return None
+    if isinstance(raw, str):
+        if g.get('state_key') == raw:
+            return g.state_obj
+        store = _store()
+        lock = store.game_lock(raw)
+        if not lock.acquire(timeout=GAME_LOCK_TIMEOUT):
+            raise StateUnavailableError(f"等待对局 {raw} 的其他请求超时")
+        try:
+            game_state = store.get(raw, session.get('game_state_version'))
+        except BaseException:
+            lock.release()
+            raise
+        if game_state is None:
+            lock.release()
+            return None
+        g.state_key, g.state_obj, g.state_saved, g.state_lock = raw, game_state, False, lock
+        return game_state
+    try:
+        return decode_state(raw)
+    except StateCodecError:
+        return None
+
+
+def save_game_state(game_state):
+    """
+    保存对局状态，返回结构化的变更集 (见 state_codec.diff_snapshots)。
+    本请求没有读取过存储中的对局 (新对局 / 旧格式 session) 时保存为一局新游戏，返回 None。
+    [v_VERSION] 另一个 worker 已经保存了更新的状态时抛出 StateConflictError (由 init_app 注册的
+    错误处理返回 409)。调用方应在保存成功之后再把日志等内容写入 session。
+    """
+    store = _store()
+    key = g.get('state_key')
+    if key is None or session.get('game_state') != key:
+        discard_game_state()
+        key = store.create(game_state)
+        session['game_state'] = key
+        changes = None
+    else:
+        try:
+            changes = store.put(key, game_state)
+        except StateConflictError:
+            # [v_VERSION] 另一个 worker 已经保存了更新的状态: 本请求的改动作废 (存储已丢弃驻留对象)，
+            # 请求结束时只释放对局锁
+            g.pop('state_key', None)
+            g.pop('state_obj', None)
+            raise
+    session['game_state_version'] = game_state.state_version
+    g.state_key, g.state_obj, g.state_saved = key, game_state, True
+    return changes
+
+
+def state_etag(game_state, *parts):
+    """
+    [v_ETAG] 响应的 ETag: 由对局键、状态版本和 parts (响应依赖的其他请求参数) 得出。
+    本请求没有从存储中读取该对局 (旧格式 session) 时返回 None，不做条件响应。
+    """
+    key = g.get('state_key')
+    if key is None or g.get('state_obj') is not game_state:
+        return None
+    digest = hashlib.blake2b(repr((key, parts)).encode(), digest_size=8).hexdigest()
+    return f"{game_state.state_version}-{digest}"
+
+
+def not_modified_response(etag):
+    """[v_ETAG] GET / HEAD 请求的 If-None-Match 包含 etag 时返回 304 响应，否则返回 None。"""
+    if etag is None or request.method not in ('GET', 'HEAD') or not request.if_none_match.contains(etag):
+        return None
+    return conditional_response(current_app.response_class(status=304), etag)
+
+
+def conditional_response(response, etag):
+    """[v_ETAG] 给响应加上 etag 和缓存头 (只在本浏览器缓存，每次使用前重新验证)。etag 为 None 时不改动。"""
+    if etag is not None:
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'private, no-cache'
+        response.vary.add('Cookie')
+    return response
+
+
+def _stale_state_json():
+    return jsonify({'success': False, 'stale_state': True,
+                    'message': '对局状态已在其他页面更新，请刷新。'}), 409
+
+
+def _state_conflict_response(error):
+    """[v_VERSION] save_game_state 在持久层的版本检查中失败 (StateConflictError) 时的响应。"""
+    print(f"[状态存储] {error}")
+    return _stale_state_json()
+
+
+def _state_unavailable_response(error):
+    """
+    [v_VERSION] 对局暂时无法读取 (StateUnavailableError) 时的 503 响应 (带 Retry-After)。
+    浏览器直接打开的页面返回一段文字并自动刷新，其余请求返回 JSON。
+    """
+    print(f"[状态存储] {error}")
+    message = '对局正忙，请稍后重试。'
+    if request.accept_mimetypes.best == 'text/html':
+        response = current_app.response_class(message, status=503, mimetype='text/plain')
+        response.headers['Refresh'] = str(STATE_RETRY_AFTER)
+    else:
+        response = jsonify({'success': False, 'retry': True, 'message': message})
+        response.status_code = 503
+    response.headers['Retry-After'] = str(STATE_RETRY_AFTER)
+    return response
+
+
+def stale_state_response(game_state):
+    """
+    [v_VERSION] 请求头中页面所知的版本与 game_state 不一致时返回 409 响应，否则返回 None。
+    没有该请求头 (普通表单提交 / 旧页面) 时不检查。
+    """
+    sent = request.headers.get(STATE_VERSION_HEADER)
+    if sent is None or sent == str(game_state.state_version):
+        return None
+    return _stale_state_json()
+
+
+def discard_game_state():
+    """从 session 中移除对局状态并删除其存储。"""
+    raw = session.pop('game_state', None)
+    session.pop('game_state_version', None)
+    if isinstance(raw, str):
+        _store().discard(raw)
+    g.pop('state_key', None)
+    g.pop('state_obj', None)
+    g.pop('state_saved', None)
+    lock = g.pop('state_lock', None)
+    if lock is not None:
+        lock.release()
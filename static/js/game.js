@@ -19,6 +19,11 @@ const orientationMap = data.orientationMap; // 方向映射 ( 'N': '↑' )
 const apiUrls = data.apiUrls; // 所有后端 API 的 URL
 const playerLoadout = data.playerLoadout; // 玩家的装备配置 (用于分析)
 const aiOpponentName = data.aiOpponentName; // 对手AI的名称 (用于分析)
+let stateVersion = data.stateVersion; // [v_VERSION] 本页面所知的对局状态版本 (随每个响应更新)
+let apiQueue = Promise.resolve(); // [v_VERSION] 按顺序发送的 API 请求队列
+const API_BUSY_RETRIES = 5; // [v_VERSION] 对局暂时无法读取 (503) 时的最大重试次数
+let turnContext = null; // [v_CONTEXT] 回合上下文请求 (Promise)，见 loadTurnContext
+let turnContextVersion = null; // [v_CONTEXT] turnContext 对应的状态版本
 
 // 这是我们将引用的主要前端状态机，用于管理UI
 const gameState = {
@@ -382,10 +387,16 @@ function selectAction(name, range, type, cost, partSlot) {
         return;
     }
 
-    // 向后端请求有效范围
+    // [v_CONTEXT] 从回合上下文中取有效范围；上下文中没有该动作时退回到单个范围 API
     if(url) {
-        fetch(url, { method: 'POST', headers: {'Content-Type': 'application/json'}, body: JSON.stringify(body) })
-        .then(res => res.json())
+        loadTurnContext()
+        .then(context => {
+            let entry = null;
+            if (context) {
+                entry = (name === '调整移动') ? { valid_moves: context.adjust_move } : (context.actions[partSlot] || {})[name];
+            }
+            return entry || apiGet(url, body).then(res => res.json());
+        })
         .then(data => {
             // 高亮移动格
             if(data.valid_moves) data.valid_moves.forEach(([x,y]) => {
@@ -418,6 +429,26 @@ function selectAction(name, range, type, cost, partSlot) {
     }
 }
 
+/**
+ * [v_CONTEXT] 获取回合上下文: 玩家所有动作的有效范围 (一次请求)。
+ * 同一个状态版本只请求一次；状态版本改变后 (例如乐观 UI 函数同步了姿态) 重新请求。
+ * @returns {Promise<object|null>} 请求失败时为 null
+ */
+function loadTurnContext() {
+    if (!turnContext || turnContextVersion !== stateVersion) {
+        turnContextVersion = stateVersion;
+        turnContext = apiGet(apiUrls.turnContext, { player_id: playerID })
+            .then(res => res.json())
+            .then(context => {
+                if (!context || !context.actions) return null;
+                turnContextVersion = context.state_version;
+                return context;
+            })
+            .catch(e => { console.error("Fetch error:", e); return null; });
+    }
+    return turnContext;
+}
+
 /**
  * 玩家点击【弃置】动作时调用。
  * @param {string} partSlot - 要弃置的部件槽位
@@ -572,6 +603,66 @@ function setFinalOrientation(o) {
     executeMove();
 }
 
+/**
+ * [v_VERSION] 向后端 API 发送请求 (所有 fetch 调用都经过 apiPost / apiGet)。
+ * 请求按顺序发送，并在请求头中带上本页面所知的状态版本；
+ * 响应头中的新版本会被记录下来。对局已在其他页面更新时 (409) 直接刷新页面；
+ * 对局暂时无法读取时 (503, 此时后端没有改动任何状态) 按 Retry-After 等待后重发。
+ * @param {string} url - 目标 URL
+ * @param {object} init - fetch 选项
+ * @returns {Promise<Response>}
+ */
+function apiRequest(url, init) {
+    const send = (attempt) => fetch(url, {
+        ...init,
+        headers: {...(init.headers || {}), 'X-State-Version': String(stateVersion)}
+    }).then(res => {
+        const version = res.headers.get('X-State-Version');
+        if (version !== null) stateVersion = Number(version);
+        if (res.status === 409) {
+            console.warn('对局状态已在其他页面更新, 刷新页面。');
+            window.location.reload();
+            return new Promise(() => {}); // 不再继续处理这个响应
+        }
+        if (res.status === 503 && attempt < API_BUSY_RETRIES) {
+            const delay = (Number(res.headers.get('Retry-After')) || 1) * 1000;
+            console.warn(`对局正忙, ${delay}ms 后重试。`);
+            return new Promise(resolve => setTimeout(resolve, delay)).then(() => send(attempt + 1));
+        }
+        return res;
+    });
+    const request = apiQueue.then(() => send(0), () => send(0));
+    apiQueue = request.catch(() => {});
+    return request;
+}
+
+/**
+ * 向后端 API 发送 JSON POST 请求 (改变游戏状态的操作)。
+ * @param {string} url - 目标 API URL
+ * @param {object} body - 发送到后端的 JSON 数据
+ * @returns {Promise<Response>}
+ */
+function apiPost(url, body) {
+    return apiRequest(url, {
+        method: 'POST',
+        headers: {'Content-Type': 'application/json'},
+        body: JSON.stringify(body)
+    });
+}
+
+/**
+ * [v_ETAG] 向后端 API 发送 GET 请求 (只读查询，参数放在查询字符串中)。
+ * 响应带 ETag，浏览器会用 If-None-Match 重新验证缓存，状态未变时后端只返回 304。
+ * @param {string} url - 目标 API URL
+ * @param {object} params - 查询参数
+ * @returns {Promise<Response>}
+ */
+function apiGet(url, params) {
+    // 与 JSON.stringify 一致: 省略值为 undefined 的参数
+    const query = new URLSearchParams(Object.entries(params).filter(([, value]) => value !== undefined));
+    return apiRequest(`${url}?${query}`, { method: 'GET' });
+}
+
 /**
  * [核心API函数] 向后端发送 POST 请求，并期望页面重载或处理中断。
  * 这是所有改变游戏状态的主要途径。
@@ -582,7 +673,7 @@ function postAndReload(url, body = {}) {
     body.player_id = playerID;
     console.log("Calling postAndReload for:", url, body);
 
-    fetch(url, { method: 'POST', headers: {'Content-Type': 'application/json'}, body: JSON.stringify(body) })
+    apiPost(url, body)
     .then(async res => { // 标记为 async 以便读取 .json()
         if (res.redirected) {
             // 如果后端重定向 (例如 /end_turn)，则跟随重定向
@@ -678,10 +769,7 @@ function selectTiming(t) {
     // playerEntity.timing = t;
     // updateUIForPhase();
 
-    fetch(apiUrls.selectTiming, {
-        method: 'POST', headers: {'Content-Type': 'application/json'},
-        body: JSON.stringify({ timing: t, player_id: playerID })
-    }).then(res => res.json()).then(data => {
+    apiPost(apiUrls.selectTiming, { timing: t, player_id: playerID }).then(res => res.json()).then(data => {
         if (!data.success) {
             console.warn('时机同步失败, 强制刷新。');
             window.location.reload();
@@ -694,10 +782,7 @@ function selectTiming(t) {
 
 function confirmTiming() {
     if (gameState.pendingEffect || gameState.pendingReroll) return;
-    fetch(apiUrls.confirmTiming, {
-        method: 'POST', headers: {'Content-Type': 'application/json'},
-        body: JSON.stringify({ player_id: playerID })
-    }).then(res => res.json()).then(data => {
+    apiPost(apiUrls.confirmTiming, { player_id: playerID }).then(res => res.json()).then(data => {
         if (data.success) {
             // [NEW] 检查是否有拼点发生
             if (data.clash_occurred) {
@@ -717,20 +802,14 @@ function changeStance(s) {
     if (gameState.pendingEffect || gameState.pendingReroll) return;
     playerEntity.stance = s;
     updateUIForPhase();
-    fetch(apiUrls.changeStance, {
-        method: 'POST', headers: {'Content-Type': 'application/json'},
-        body: JSON.stringify({ stance: s, player_id: playerID })
-    }).then(res => res.json()).then(data => {
+    apiPost(apiUrls.changeStance, { stance: s, player_id: playerID }).then(res => res.json()).then(data => {
         if (!data.success) { console.warn('姿态同步失败, 强制刷新。'); window.location.reload(); }
     }).catch(e => { console.error("Fetch error:", e); window.location.reload(); });
 }
 
 function confirmStance() {
     if (gameState.pendingEffect || gameState.pendingReroll) return;
-    fetch(apiUrls.confirmStance, {
-        method: 'POST', headers: {'Content-Type': 'application/json'},
-        body: JSON.stringify({ player_id: playerID })
-    }).then(res => res.json()).then(data => {
+    apiPost(apiUrls.confirmStance, { player_id: playerID }).then(res => res.json()).then(data => {
         if (data.success) {
             gameState.turnPhase = 'adjustment';
             playerEntity.turn_phase = 'adjustment';
@@ -741,10 +820,7 @@ function confirmStance() {
 
 function skipAdjustment() {
     if (gameState.pendingEffect || gameState.pendingReroll) return;
-    fetch(apiUrls.skipAdjustment, {
-        method: 'POST', headers: {'Content-Type': 'application/json'},
-        body: JSON.stringify({ player_id: playerID })
-    }).then(res => res.json()).then(data => {
+    apiPost(apiUrls.skipAdjustment, { player_id: playerID }).then(res => res.json()).then(data => {
         if (data.success) {
             gameState.turnPhase = 'main';
             playerEntity.turn_phase = 'main';
@@ -1148,6 +1224,12 @@ document.addEventListener('DOMContentLoaded', () => {
         showGameOverModal(gameState.gameOver);
     }
 
+    // [v_CONTEXT] 预取回合上下文，选择动作时直接高亮
+    if (!gameState.gameOver && !gameState.runProjectilePhase &&
+        (gameState.turnPhase === 'adjustment' || gameState.turnPhase === 'main')) {
+        loadTurnContext();
+    }
+
     // [BUG 2 修复] 移除此处的 pendingEffect 检查，
     // 因为它现在和 rerollEvent 一起在 "视觉事件处理" 部分被处理，
     // 以确保正确的显示优先级。
@@ -1168,11 +1250,7 @@ document.addEventListener('DOMContentLoaded', () => {
         });
         // 延迟2秒，让玩家看到AI的移动
         setTimeout(() => {
-            fetch(apiUrls.runProjectilePhase, {
-                method: 'POST',
-                headers: {'Content-Type': 'application/json'},
-                body: JSON.stringify({ player_id: playerID }) // [健壮性] 始终发送 playerID
-            })
+            apiPost(apiUrls.runProjectilePhase, { player_id: playerID }) // [健壮性] 始终发送 playerID
             .then(res => res.json())
             .then(data => {
                 // [BUG 2 修复] 检查返回的 JSON 中是否包含中断！